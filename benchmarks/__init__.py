@@ -0,0 +1 @@
+# Benchmark del GestoreImmobiliare
@@ -0,0 +1,85 @@
+"""
+Benchmark delle ricerche per raggio con e senza indice R*Tree.
+
+Per database di dimensione crescente misura il tempo medio di
+get_proprieta_nel_raggio (raggio di 2 km attorno a punti casuali) con:
+
+- scansione: indice_geografico=False, la tabella proprieta viene letta per intero;
+- r*tree: indice_geografico=True, i candidati vengono dall'indice.
+
+La scansione cresce linearmente con il numero di proprietà, l'R*Tree resta
+quasi costante (cresce solo con il numero di risultati).
+
+Uso
+---
+python -m benchmarks.bench_geografico [--proprieta 10000 100000 1000000] [--query 50]
+"""
+
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from immobiliare_manager import (
+    Agenzia,
+    Agente,
+    Proprieta,
+    GestoreImmobiliare,
+)
+
+
+# Rettangolo che contiene l'Italia continentale
+LATITUDINI = (37.0, 46.5)
+LONGITUDINI = (7.0, 18.5)
+RAGGIO_KM = 2.0
+
+
+def popola(db_path: str, n_proprieta: int, generatore: random.Random) -> None:
+    gestore = GestoreImmobiliare(db_path, profilo="bulk-load", indice_geografico=True)
+    gestore.add_agenzia(Agenzia(1, "Agenzia benchmark", "Via del Benchmark 1"))
+    gestore.add_agente(Agente(1, "Agente benchmark", "agente@example.com", 1))
+    gestore.add_proprieta_many(
+        Proprieta(
+            i, f"Via {i}", 100000.0 + i, "In vendita", 1,
+            generatore.uniform(*LATITUDINI), generatore.uniform(*LONGITUDINI),
+        )
+        for i in range(1, n_proprieta + 1)
+    )
+    gestore.close()
+
+
+def millisecondi_per_query(gestore, punti) -> float:
+    inizio = time.perf_counter()
+    for latitudine, longitudine in punti:
+        gestore.get_proprieta_nel_raggio(latitudine, longitudine, RAGGIO_KM)
+    return (time.perf_counter() - inizio) * 1000 / len(punti)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--proprieta", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--query", type=int, default=50)
+    args = parser.parse_args()
+
+    generatore = random.Random(42)
+    punti = [
+        (generatore.uniform(*LATITUDINI), generatore.uniform(*LONGITUDINI))
+        for _ in range(args.query)
+    ]
+    print(f"{'proprietà':>12}{'scansione':>14}{'r*tree':>14}   ms/query")
+    with tempfile.TemporaryDirectory() as cartella:
+        for n_proprieta in args.proprieta:
+            db_path = str(Path(cartella) / f"geo_{n_proprieta}.db")
+            popola(db_path, n_proprieta, generatore)
+            scansione = GestoreImmobiliare(db_path, profilo="balanced")
+            indice = GestoreImmobiliare(db_path, profilo="balanced", indice_geografico=True)
+            risultati = [millisecondi_per_query(scansione, punti), millisecondi_per_query(indice, punti)]
+            print(f"{n_proprieta:>12,}" + "".join(f"{r:>14.3f}" for r in risultati)
+                  + f"   x{risultati[0] / risultati[1]:.0f}")
+            scansione.close()
+            indice.close()
+
+
+if __name__ == "__main__":
+    main()
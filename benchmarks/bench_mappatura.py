@@ -0,0 +1,118 @@
+"""
+Micro-benchmark della conversione riga → dataclass nei metodi get_*.
+
+Confronta, per ogni metodo di lettura, le righe al secondo ottenute con:
+
+- prima: fetchall() seguito dalla costruzione per parole chiave
+  (`Proprieta(id_proprieta=row[0], ...)`), come nella versione originale;
+- dopo: il metodo del gestore, con la row_factory posizionale;
+- dopo (compatte): il metodo del gestore con entita_compatte=True.
+
+Uso
+---
+python -m benchmarks.bench_mappatura [--proprieta 200000] [--ripetizioni 5]
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from immobiliare_manager import (
+    Agenzia,
+    Agente,
+    Proprieta,
+    GestoreImmobiliare,
+)
+
+
+AGENTI = 50
+
+
+def popola(db_path: str, n_proprieta: int) -> None:
+    gestore = GestoreImmobiliare(db_path, profilo="bulk-load")
+    gestore.add_agenzia(Agenzia(1, "Agenzia benchmark", "Via del Benchmark 1"))
+    gestore.add_agenti(
+        Agente(i, f"Agente {i}", f"agente{i}@example.com", 1) for i in range(1, AGENTI + 1)
+    )
+    gestore.add_proprieta_many(
+        Proprieta(i, f"Via {i}", 100000.0 + i, "In vendita", i % AGENTI + 1)
+        for i in range(1, n_proprieta + 1)
+    )
+    gestore.close()
+
+
+def prima_proprieta_per_agenzia(gestore, id_agenzia):
+    rows = gestore.conn.execute(
+        "SELECT p.id_proprieta, p.indirizzo, p.prezzo, p.stato, p.id_agente "
+        "FROM proprieta p JOIN agenti a ON p.id_agente = a.id_agente WHERE a.id_agenzia = ?",
+        (id_agenzia,),
+    ).fetchall()
+    return [Proprieta(id_proprieta=row[0], indirizzo=row[1], prezzo=row[2], stato=row[3],
+                      id_agente=row[4]) for row in rows]
+
+
+def prima_proprieta_per_agente(gestore, id_agente):
+    rows = gestore.conn.execute(
+        "SELECT id_proprieta, indirizzo, prezzo, stato, id_agente FROM proprieta "
+        "WHERE id_agente = ?",
+        (id_agente,),
+    ).fetchall()
+    return [Proprieta(id_proprieta=row[0], indirizzo=row[1], prezzo=row[2], stato=row[3],
+                      id_agente=row[4]) for row in rows]
+
+
+def prima_agenti_per_agenzia(gestore, id_agenzia):
+    rows = gestore.conn.execute(
+        "SELECT id_agente, nome, email, id_agenzia FROM agenti WHERE id_agenzia = ?",
+        (id_agenzia,),
+    ).fetchall()
+    return [Agente(id_agente=row[0], nome=row[1], email=row[2], id_agenzia=row[3])
+            for row in rows]
+
+
+CASI = [
+    ("get_proprieta_per_agenzia", prima_proprieta_per_agenzia, 1),
+    ("get_proprieta_per_agente", prima_proprieta_per_agente, 1),
+    ("get_agenti_per_agenzia", prima_agenti_per_agenzia, 1),
+]
+
+
+def righe_al_secondo(funzione, ripetizioni: int) -> float:
+    migliore = float("inf")
+    righe = 0
+    for _ in range(ripetizioni):
+        inizio = time.perf_counter()
+        righe = len(funzione())
+        migliore = min(migliore, time.perf_counter() - inizio)
+    return righe / migliore
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--proprieta", type=int, default=200_000)
+    parser.add_argument("--ripetizioni", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as cartella:
+        db_path = str(Path(cartella) / "bench.db")
+        popola(db_path, args.proprieta)
+        normale = GestoreImmobiliare(db_path)
+        compatto = GestoreImmobiliare(db_path, entita_compatte=True)
+
+        print(f"{'metodo':<28}{'prima':>14}{'dopo':>14}{'compatte':>14}   righe/s")
+        for nome, prima, argomento in CASI:
+            risultati = [
+                righe_al_secondo(lambda: prima(normale, argomento), args.ripetizioni),
+                righe_al_secondo(lambda: getattr(normale, nome)(argomento), args.ripetizioni),
+                righe_al_secondo(lambda: getattr(compatto, nome)(argomento), args.ripetizioni),
+            ]
+            print(f"{nome:<28}" + "".join(f"{r:>14,.0f}" for r in risultati)
+                  + f"   x{risultati[1] / risultati[0]:.2f} / x{risultati[2] / risultati[0]:.2f}")
+
+        normale.close()
+        compatto.close()
+
+
+if __name__ == "__main__":
+    main()
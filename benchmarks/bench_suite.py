@@ -0,0 +1,239 @@
+"""
+Suite di benchmark dei metodi pubblici di GestoreImmobiliare.
+
+Per ogni dimensione richiesta (da 10^3 a 10^7 proprietà) crea un database con
+i dati sintetici di benchmarks.dati_sintetici e misura:
+
+- i caricamenti massivi (add_agenzie, add_agenti, add_proprieta_many), compreso
+  il tempo del generatore (circa 120.000 proprietà al secondo);
+- gli inserimenti singoli (add_agenzia, add_agente, add_proprieta);
+- get_agenti_per_agenzia, get_proprieta_per_agente e get_proprieta_per_agenzia,
+  con ID estratti sia secondo la distribuzione di Zipf dei dati ("zipf") sia
+  in modo uniforme ("uniforme");
+- aggiorna_stato_proprieta e get_best_agente_per_agenzia.
+
+I risultati (tempi in millisecondi: media, mediana, p95, minimo, massimo) si
+possono salvare in JSON con --output e confrontare con un'esecuzione
+precedente con --confronta: le operazioni la cui mediana peggiora oltre
+--soglia vengono segnalate e il processo termina con codice 1.
+
+Uso
+---
+python -m benchmarks.bench_suite [--proprieta 1000 10000 100000] [--query 200]
+    [--output risultati.json] [--confronta precedente.json] [--soglia 0.2]
+"""
+
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Iterable, Optional
+import argparse
+import json
+import platform
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+from immobiliare_manager import (
+    Agenzia,
+    Agente,
+    Proprieta,
+    GestoreImmobiliare,
+)
+
+from benchmarks.dati_sintetici import ESPONENTE_ZIPF, DatiSintetici
+
+
+VERSIONE_FORMATO = 1
+SOGLIA_REGRESSIONE = 0.2
+# Parametri che devono coincidere perché due esecuzioni misurino lo stesso lavoro
+PARAMETRI_CONFRONTABILI = ("seme", "esponente", "profilo", "query", "ripetizioni")
+
+
+def riassumi(tempi: list[float], righe: Optional[int] = None) -> dict:
+    """Statistiche in millisecondi di una serie di tempi espressi in secondi."""
+    millisecondi = sorted(t * 1000 for t in tempi)
+    risultato = {
+        "chiamate": len(millisecondi),
+        "media_ms": statistics.fmean(millisecondi),
+        "mediana_ms": statistics.median(millisecondi),
+        "p95_ms": millisecondi[min(len(millisecondi) - 1, round(0.95 * (len(millisecondi) - 1)))],
+        "minimo_ms": millisecondi[0],
+        "massimo_ms": millisecondi[-1],
+    }
+    if righe is not None:
+        risultato["righe"] = righe
+        risultato["righe_al_secondo"] = righe / sum(tempi) if sum(tempi) else float("inf")
+    return risultato
+
+
+def cronometra(funzione: Callable, argomenti: Iterable[tuple]) -> dict:
+    """Chiama `funzione` una volta per ogni tupla di argomenti e ne riassume i tempi."""
+    tempi = []
+    for argomento in argomenti:
+        inizio = time.perf_counter()
+        funzione(*argomento)
+        tempi.append(time.perf_counter() - inizio)
+    return riassumi(tempi)
+
+
+def cronometra_caricamento(funzione: Callable, elementi: Iterable, righe: int) -> dict:
+    inizio = time.perf_counter()
+    funzione(elementi)
+    return riassumi([time.perf_counter() - inizio], righe)
+
+
+def esegui(db_path: str, dati: DatiSintetici, n_query: int, ripetizioni: int,
+           profilo: str) -> dict:
+    """Popola `db_path` con `dati` e misura ogni metodo pubblico del gestore."""
+    risultati = {}
+    gestore = GestoreImmobiliare(db_path, profilo)
+    try:
+        risultati["add_agenzie"] = cronometra_caricamento(
+            gestore.add_agenzie, dati.agenzie(), dati.n_agenzie)
+        risultati["add_agenti"] = cronometra_caricamento(
+            gestore.add_agenti, dati.agenti(), dati.n_agenti)
+        risultati["add_proprieta_many"] = cronometra_caricamento(
+            gestore.add_proprieta_many, dati.proprieta(), dati.n_proprieta)
+        gestore.analyze()
+
+        # Gli inserimenti singoli usano ID oltre quelli generati, così non
+        # alterano le letture misurate dopo in modo apprezzabile.
+        risultati["add_agenzia"] = cronometra(gestore.add_agenzia, (
+            (Agenzia(dati.n_agenzie + i, f"Agenzia extra {i}", f"Via Extra {i}"),)
+            for i in range(1, n_query + 1)
+        ))
+        risultati["add_agente"] = cronometra(gestore.add_agente, (
+            (Agente(dati.n_agenti + i, f"Agente extra {i}", f"extra{i}@example.com",
+                    dati.n_agenzie + i),)
+            for i in range(1, n_query + 1)
+        ))
+        risultati["add_proprieta"] = cronometra(gestore.add_proprieta, (
+            (Proprieta(dati.n_proprieta + i, f"Via Extra {i}", 150000.0, "In vendita",
+                       dati.n_agenti + i),)
+            for i in range(1, n_query + 1)
+        ))
+
+        letture = (
+            ("get_agenti_per_agenzia", dati.n_agenzie),
+            ("get_proprieta_per_agente", dati.n_agenti),
+            ("get_proprieta_per_agenzia", dati.n_agenzie),
+        )
+        for nome, n in letture:
+            for zipf, etichetta in ((True, "zipf"), (False, "uniforme")):
+                ids = dati.richieste(n_query, n, nome, zipf)
+                risultati[f"{nome}[{etichetta}]"] = cronometra(
+                    getattr(gestore, nome), ((i,) for i in ids))
+
+        stati = ("Venduto", "In vendita")
+        ids = dati.richieste(n_query, dati.n_proprieta, "aggiorna_stato_proprieta", zipf=False)
+        risultati["aggiorna_stato_proprieta"] = cronometra(
+            gestore.aggiorna_stato_proprieta,
+            ((i, stati[n % 2]) for n, i in enumerate(ids)),
+        )
+        risultati["get_best_agente_per_agenzia"] = cronometra(
+            gestore.get_best_agente_per_agenzia, (() for _ in range(ripetizioni)))
+    finally:
+        gestore.close()
+    return risultati
+
+
+def confronta(attuali: dict, precedenti: dict, soglia: float = SOGLIA_REGRESSIONE) -> list[tuple]:
+    """Confronta due risultati della suite operazione per operazione.
+
+    Parametri
+    ---------
+    attuali, precedenti : dict
+        Documenti JSON prodotti dalla suite
+    soglia : float
+        Peggioramento relativo della mediana oltre il quale si segnala una regressione
+
+    Ritorno
+    -------
+    list[tuple]
+        (dimensione, operazione, mediana precedente, mediana attuale, rapporto,
+        regressione) per ogni operazione misurata in entrambe le esecuzioni.
+    """
+    righe = []
+    for dimensione, operazioni in attuali["risultati"].items():
+        vecchie = precedenti["risultati"].get(dimensione, {})
+        for operazione, misura in operazioni.items():
+            if operazione not in vecchie:
+                continue
+            prima = vecchie[operazione]["mediana_ms"]
+            dopo = misura["mediana_ms"]
+            rapporto = dopo / prima if prima else float("inf")
+            righe.append((dimensione, operazione, prima, dopo, rapporto, rapporto > 1 + soglia))
+    return righe
+
+
+def metadati(args) -> dict:
+    return {
+        "formato": VERSIONE_FORMATO,
+        "data": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "piattaforma": platform.platform(),
+        "seme": args.seme,
+        "esponente": args.esponente,
+        "profilo": args.profilo,
+        "query": args.query,
+        "ripetizioni": args.ripetizioni,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--proprieta", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--query", type=int, default=200,
+                        help="chiamate per ogni metodo di lettura e aggiornamento")
+    parser.add_argument("--ripetizioni", type=int, default=5,
+                        help="chiamate di get_best_agente_per_agenzia")
+    parser.add_argument("--seme", type=int, default=42)
+    parser.add_argument("--esponente", type=float, default=ESPONENTE_ZIPF)
+    parser.add_argument("--profilo", default="balanced")
+    parser.add_argument("--cartella", help="dove creare i database (default: temporanea)")
+    parser.add_argument("--output", help="file JSON in cui salvare i risultati")
+    parser.add_argument("--confronta", help="file JSON di un'esecuzione precedente")
+    parser.add_argument("--soglia", type=float, default=SOGLIA_REGRESSIONE)
+    args = parser.parse_args()
+
+    documento = {"metadati": metadati(args), "risultati": {}}
+    with tempfile.TemporaryDirectory(dir=args.cartella) as cartella:
+        for n_proprieta in args.proprieta:
+            dati = DatiSintetici(n_proprieta, args.seme, args.esponente)
+            risultati = esegui(str(Path(cartella) / f"suite_{n_proprieta}.db"), dati,
+                               args.query, args.ripetizioni, args.profilo)
+            documento["risultati"][str(n_proprieta)] = risultati
+
+            print(f"\n{n_proprieta:,} proprietà, {dati.n_agenti:,} agenti, "
+                  f"{dati.n_agenzie:,} agenzie")
+            print(f"{'operazione':<40}{'mediana':>12}{'p95':>12}{'righe/s':>14}   ms")
+            for nome, misura in risultati.items():
+                righe_al_secondo = misura.get("righe_al_secondo")
+                print(f"{nome:<40}{misura['mediana_ms']:>12.3f}{misura['p95_ms']:>12.3f}"
+                      + (f"{righe_al_secondo:>14,.0f}" if righe_al_secondo else f"{'':>14}"))
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(documento, indent=2) + "\n", encoding="utf-8")
+        print(f"\nRisultati salvati in {args.output}")
+
+    if args.confronta:
+        precedenti = json.loads(Path(args.confronta).read_text(encoding="utf-8"))
+        righe = confronta(documento, precedenti, args.soglia)
+        print(f"\nConfronto con {args.confronta} (soglia +{args.soglia:.0%} sulla mediana)")
+        for chiave in PARAMETRI_CONFRONTABILI:
+            if precedenti["metadati"].get(chiave) != documento["metadati"][chiave]:
+                print(f"Attenzione: {chiave} diverso ({precedenti['metadati'].get(chiave)} "
+                      f"→ {documento['metadati'][chiave]}), i tempi non sono confrontabili")
+        print(f"{'proprietà':>10}  {'operazione':<40}{'prima':>12}{'dopo':>12}{'rapporto':>10}")
+        for dimensione, operazione, prima, dopo, rapporto, regressione in righe:
+            print(f"{int(dimensione):>10,}  {operazione:<40}{prima:>12.3f}{dopo:>12.3f}"
+                  f"{rapporto:>9.2f}x" + ("  REGRESSIONE" if regressione else ""))
+        if any(riga[-1] for riga in righe):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
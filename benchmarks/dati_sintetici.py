@@ -0,0 +1,147 @@
+"""
+Generatore deterministico di agenzie, agenti e proprietà per i benchmark.
+
+Le dimensioni reali non sono uniformi: poche agenzie hanno molti agenti e
+pochi agenti gestiscono gran parte delle proprietà. Il generatore assegna
+quindi gli agenti alle agenzie e le proprietà agli agenti secondo una
+distribuzione di Zipf (il k-esimo elemento è scelto con probabilità
+proporzionale a 1 / k^esponente), con gli ID più bassi come i più popolari.
+
+A parità di seme e di parametri i dati prodotti sono identici, quindi due
+esecuzioni della suite misurano esattamente lo stesso database. Le proprietà
+sono prodotte da un generatore e non vengono mai tenute tutte in memoria,
+così si arriva a 10^7 righe.
+
+Esempio
+-------
+dati = DatiSintetici(100_000, seme=42)
+gestore.add_agenzie(dati.agenzie())
+gestore.add_agenti(dati.agenti())
+gestore.add_proprieta_many(dati.proprieta())
+"""
+
+from bisect import bisect_left
+from itertools import accumulate
+from typing import Iterator
+import random
+
+from immobiliare_manager import (
+    Agenzia,
+    Agente,
+    Proprieta,
+)
+
+
+ESPONENTE_ZIPF = 1.1
+PROPRIETA_PER_AGENZIA = 1000
+PROPRIETA_PER_AGENTE = 25
+
+# Stati con pesi realistici: la maggior parte del portafoglio è in vendita.
+STATI = ("In vendita", "Venduto", "In trattativa", "Affittato")
+PESI_STATI = (60, 25, 10, 5)
+CITTA = ("Roma", "Milano", "Napoli", "Torino", "Bologna", "Firenze", "Bari", "Palermo")
+VIE = ("Via Roma", "Via Garibaldi", "Corso Italia", "Via Mazzini", "Viale Dante",
+       "Piazza Cavour", "Via Verdi", "Via Manzoni")
+
+
+class DistribuzioneZipf:
+    """Estrae indici in [0, n) con probabilità proporzionale a 1 / (indice + 1)^esponente.
+
+    Parametri
+    ---------
+    n : int
+        Numero di elementi
+    esponente : float
+        Asimmetria della distribuzione; 0 equivale a quella uniforme
+    generatore : random.Random
+        Sorgente dei numeri casuali, da cui dipende la sequenza estratta
+    """
+
+    def __init__(self, n: int, esponente: float, generatore: random.Random):
+        if n < 1:
+            raise ValueError("La distribuzione richiede almeno un elemento")
+        self._cumulati = list(accumulate(1 / k ** esponente for k in range(1, n + 1)))
+        self._generatore = generatore
+
+    def __len__(self) -> int:
+        return len(self._cumulati)
+
+    def estrai(self) -> int:
+        """Restituisce il prossimo indice, in tempo logaritmico."""
+        soglia = self._generatore.random() * self._cumulati[-1]
+        return min(bisect_left(self._cumulati, soglia), len(self._cumulati) - 1)
+
+
+class DatiSintetici:
+    """Descrive un database sintetico di `n_proprieta` proprietà.
+
+    Parametri
+    ---------
+    n_proprieta : int
+        Numero di proprietà; agenzie e agenti sono ricavati in proporzione
+    seme : int
+        Seme dei numeri casuali
+    esponente : float
+        Esponente della distribuzione di Zipf usata per agenti e proprietà
+
+    Comportamento
+    -------------
+    Ogni metodo usa un proprio generatore derivato dal seme, quindi il
+    risultato non dipende dall'ordine in cui i metodi vengono chiamati.
+    """
+
+    def __init__(self, n_proprieta: int, seme: int = 42, esponente: float = ESPONENTE_ZIPF):
+        self.n_proprieta = n_proprieta
+        self.n_agenzie = max(1, n_proprieta // PROPRIETA_PER_AGENZIA)
+        self.n_agenti = max(1, n_proprieta // PROPRIETA_PER_AGENTE)
+        self.seme = seme
+        self.esponente = esponente
+
+    def _generatore(self, scopo: str) -> random.Random:
+        return random.Random(f"{self.seme}:{scopo}")
+
+    def agenzie(self) -> Iterator[Agenzia]:
+        """Genera le agenzie, con ID da 1 a n_agenzie."""
+        generatore = self._generatore("agenzie")
+        for id_agenzia in range(1, self.n_agenzie + 1):
+            citta = generatore.choice(CITTA)
+            yield Agenzia(
+                id_agenzia, f"Immobiliare {citta} {id_agenzia}",
+                f"{generatore.choice(VIE)} {generatore.randint(1, 200)}, {citta}",
+            )
+
+    def agenti(self) -> Iterator[Agente]:
+        """Genera gli agenti; le agenzie con ID basso ne ricevono di più."""
+        generatore = self._generatore("agenti")
+        agenzie = DistribuzioneZipf(self.n_agenzie, self.esponente, generatore)
+        for id_agente in range(1, self.n_agenti + 1):
+            yield Agente(
+                id_agente, f"Agente {id_agente}", f"agente{id_agente}@example.com",
+                agenzie.estrai() + 1,
+            )
+
+    def proprieta(self) -> Iterator[Proprieta]:
+        """Genera le proprietà; gli agenti con ID basso ne ricevono di più."""
+        generatore = self._generatore("proprieta")
+        agenti = DistribuzioneZipf(self.n_agenti, self.esponente, generatore)
+        for id_proprieta in range(1, self.n_proprieta + 1):
+            stato = generatore.choices(STATI, PESI_STATI)[0]
+            prezzo = round(generatore.lognormvariate(12.2, 0.5), -3)
+            yield Proprieta(
+                id_proprieta,
+                f"{generatore.choice(VIE)} {generatore.randint(1, 300)}, {generatore.choice(CITTA)}",
+                prezzo, stato, agenti.estrai() + 1,
+            )
+
+    def richieste(self, quante: int, n: int, scopo: str, zipf: bool = True) -> list[int]:
+        """Restituisce `quante` ID in [1, n] da interrogare.
+
+        Con zipf=True gli ID seguono la stessa asimmetria dei dati (si
+        interrogano soprattutto le agenzie e gli agenti più grandi), altrimenti
+        sono uniformi.
+        """
+        generatore = self._generatore(f"richieste:{scopo}:{zipf}")
+        if not zipf:
+            return [generatore.randint(1, n) for _ in range(quante)]
+        distribuzione = DistribuzioneZipf(n, self.esponente, generatore)
+        return [distribuzione.estrai() + 1 for _ in range(quante)]
@@ -0,0 +1,257 @@
+"""
+Interfaccia asyncio per GestoreImmobiliare.
+
+GestoreImmobiliareAsync espone gli stessi metodi di GestoreImmobiliare come
+coroutine, senza bloccare l'event loop mentre SQLite lavora:
+
+- le letture girano su un ThreadPoolExecutor dedicato e usano il pool di
+  connessioni di lettura del gestore, quindi più coroutine possono
+  interrogare il database in parallelo;
+- le scritture passano da un executor con un solo thread, che fa da coda
+  per l'unica connessione di scrittura;
+- `async with gestore.transaction():` riserva la connessione di scrittura
+  al task che ha aperto la transazione; le scritture degli altri task
+  (compresi quelli creati dentro il blocco) attendono che venga confermata
+  o annullata.
+
+Esempio
+-------
+gestore = await GestoreImmobiliareAsync.apri("real_estate.db")
+async with gestore.transaction():
+    await gestore.add_agenzia(agenzia)
+    await gestore.add_agente(agente)
+async for proprieta in gestore.iter_proprieta_per_agenzia(1):
+    ...
+await gestore.close()
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import partial
+from itertools import islice
+from typing import AsyncIterator, Optional, Union
+import asyncio
+
+from immobiliare_manager import (
+    DIMENSIONE_BATCH_LETTURA,
+    GestoreImmobiliare,
+    ProfiloPrestazioni,
+)
+
+
+__all__ = [
+    "GestoreImmobiliareAsync",
+]
+
+
+def _lettura(nome: str):
+    async def metodo(self, *args, **kwargs):
+        return await self._leggi(getattr(self.gestore, nome), *args, **kwargs)
+
+    metodo.__name__ = nome
+    metodo.__doc__ = f"Versione asincrona di GestoreImmobiliare.{nome}."
+    return metodo
+
+
+def _scrittura(nome: str):
+    async def metodo(self, *args, **kwargs):
+        return await self._scrivi(getattr(self.gestore, nome), *args, **kwargs)
+
+    metodo.__name__ = nome
+    metodo.__doc__ = f"Versione asincrona di GestoreImmobiliare.{nome}."
+    return metodo
+
+
+def _iterazione(nome: str):
+    async def metodo(self, *args, dimensione_batch: int = DIMENSIONE_BATCH_LETTURA, **kwargs):
+        iteratore = getattr(self.gestore, nome)(*args, dimensione_batch=dimensione_batch, **kwargs)
+        try:
+            while blocco := await self._leggi(list, islice(iteratore, dimensione_batch)):
+                for elemento in blocco:
+                    yield elemento
+        finally:
+            await self._leggi(iteratore.close)
+
+    metodo.__name__ = nome
+    metodo.__doc__ = (
+        f"Versione asincrona di GestoreImmobiliare.{nome}, da usare con `async for`.\n\n"
+        "Ogni gruppo di `dimensione_batch` righe viene letto in un thread del pool."
+    )
+    return metodo
+
+
+class GestoreImmobiliareAsync:
+    """Facciata asyncio di un GestoreImmobiliare con pool di connessioni di lettura.
+
+    Parametri
+    ----------
+    gestore : GestoreImmobiliare
+        Il gestore sincrono da usare; deve essere stato creato con
+        `connessioni_lettura` maggiore di zero. Di norma si usa `apri()`.
+    """
+
+    def __init__(self, gestore: GestoreImmobiliare):
+        pool = gestore.statistiche_pool()
+        if pool is None:
+            raise ValueError("Il gestore asincrono richiede connessioni_lettura > 0")
+        self.gestore = gestore
+        self._lettori = ThreadPoolExecutor(pool.dimensione, thread_name_prefix="immobiliare-lettura")
+        self._scrittore = ThreadPoolExecutor(1, thread_name_prefix="immobiliare-scrittura")
+        self._lock_transazione = asyncio.Lock()
+        self._task_transazione: Optional[asyncio.Task] = None
+        self._contesti: list = []
+
+    @classmethod
+    async def apri(
+        cls,
+        db_path: str,
+        profilo: Union[str, ProfiloPrestazioni, None] = "balanced",
+        *,
+        connessioni_lettura: int = 4,
+        **opzioni,
+    ) -> "GestoreImmobiliareAsync":
+        """Crea il GestoreImmobiliare sottostante senza bloccare l'event loop.
+
+        Parametri
+        ---------
+        db_path : str
+            Percorso al file database SQLite
+        profilo : str | ProfiloPrestazioni | None
+            Profilo di prestazioni; per default "balanced", che usa il WAL
+        connessioni_lettura : int
+            Numero di connessioni (e di thread) dedicate alle letture
+        **opzioni
+            Altri argomenti per GestoreImmobiliare (cache, conteggi_proprieta, ...)
+        """
+        gestore = await asyncio.get_running_loop().run_in_executor(
+            None,
+            partial(
+                GestoreImmobiliare, db_path, profilo,
+                connessioni_lettura=connessioni_lettura, **opzioni,
+            ),
+        )
+        return cls(gestore)
+
+    def _in_transazione(self) -> bool:
+        task = asyncio.current_task()
+        return task is not None and task is self._task_transazione
+
+    async def _leggi(self, funzione, *args, **kwargs):
+        # Dentro una transazione si legge dalla connessione di scrittura, così
+        # la coroutine vede le proprie modifiche non ancora confermate.
+        executor = self._scrittore if self._in_transazione() else self._lettori
+        return await asyncio.get_running_loop().run_in_executor(
+            executor, partial(funzione, *args, **kwargs)
+        )
+
+    async def _esegui_scrittore(self, funzione, *args, **kwargs):
+        return await asyncio.get_running_loop().run_in_executor(
+            self._scrittore, partial(funzione, *args, **kwargs)
+        )
+
+    async def _scrivi(self, funzione, *args, **kwargs):
+        if self._in_transazione():
+            return await self._esegui_scrittore(funzione, *args, **kwargs)
+        async with self._lock_transazione:
+            return await self._esegui_scrittore(funzione, *args, **kwargs)
+
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator["GestoreImmobiliareAsync"]:
+        """Versione asincrona di GestoreImmobiliare.transaction.
+
+        Le transazioni annidate nello stesso task diventano SAVEPOINT.
+        """
+        if self._in_transazione():
+            async with self._transazione_sincrona():
+                yield self
+            return
+        async with self._lock_transazione:
+            self._task_transazione = asyncio.current_task()
+            try:
+                async with self._transazione_sincrona():
+                    yield self
+            finally:
+                self._task_transazione = None
+
+    @asynccontextmanager
+    async def _transazione_sincrona(self) -> AsyncIterator[None]:
+        """Apre e chiude gestore.transaction() sul thread di scrittura."""
+        contesto = self.gestore.transaction()
+        await self._esegui_scrittore(contesto.__enter__)
+        try:
+            yield
+        except BaseException as exc:
+            await self._esegui_scrittore(contesto.__exit__, type(exc), exc, exc.__traceback__)
+            raise
+        await self._esegui_scrittore(contesto.__exit__, None, None, None)
+
+    async def __aenter__(self) -> "GestoreImmobiliareAsync":
+        """Equivale a `async with gestore.transaction():`."""
+        contesto = self.transaction()
+        await contesto.__aenter__()
+        self._contesti.append(contesto)
+        return self
+
+    async def __aexit__(self, tipo, valore, traceback) -> Optional[bool]:
+        return await self._contesti.pop().__aexit__(tipo, valore, traceback)
+
+    add_agenzia = _scrittura("add_agenzia")
+    add_agente = _scrittura("add_agente")
+    add_proprieta = _scrittura("add_proprieta")
+    add_agenzie = _scrittura("add_agenzie")
+    add_agenti = _scrittura("add_agenti")
+    add_proprieta_many = _scrittura("add_proprieta_many")
+    aggiorna_stato_proprieta = _scrittura("aggiorna_stato_proprieta")
+    aggiorna_prezzo_proprieta = _scrittura("aggiorna_prezzo_proprieta")
+    aggiorna_stato_proprieta_many = _scrittura("aggiorna_stato_proprieta_many")
+    aggiorna_stato_proprieta_dove = _scrittura("aggiorna_stato_proprieta_dove")
+    analyze = _scrittura("analyze")
+    optimize = _scrittura("optimize")
+    pota_modifiche = _scrittura("pota_modifiche")
+
+    get_proprieta_per_agente = _lettura("get_proprieta_per_agente")
+    get_agenti_per_agenzia = _lettura("get_agenti_per_agenzia")
+    get_proprieta_per_agenzia = _lettura("get_proprieta_per_agenzia")
+    get_proprieta_per_agenti = _lettura("get_proprieta_per_agenti")
+    get_agenti_per_agenzie = _lettura("get_agenti_per_agenzie")
+    get_agenzia_completa = _lettura("get_agenzia_completa")
+    get_agenzie_complete = _lettura("get_agenzie_complete")
+    cerca_proprieta = _lettura("cerca_proprieta")
+    cerca_agenzie = _lettura("cerca_agenzie")
+    get_proprieta_in_area = _lettura("get_proprieta_in_area")
+    get_proprieta_nel_raggio = _lettura("get_proprieta_nel_raggio")
+    ultima_modifica = _lettura("ultima_modifica")
+    get_portafoglio_al = _lettura("get_portafoglio_al")
+    get_tempi_sul_mercato = _lettura("get_tempi_sul_mercato")
+    get_pagina_proprieta = _lettura("get_pagina_proprieta")
+    get_best_agente_per_agenzia = _lettura("get_best_agente_per_agenzia")
+    get_colonne_proprieta = _lettura("get_colonne_proprieta")
+    get_statistiche_prezzi = _lettura("get_statistiche_prezzi")
+    crea_snapshot = _lettura("crea_snapshot")
+
+    iter_proprieta_per_agente = _iterazione("iter_proprieta_per_agente")
+    iter_agenti_per_agenzia = _iterazione("iter_agenti_per_agenzia")
+    iter_proprieta_per_agenzia = _iterazione("iter_proprieta_per_agenzia")
+    changes_since = _iterazione("changes_since")
+
+    def statistiche_cache(self):
+        """Vedi GestoreImmobiliare.statistiche_cache (non accede al database)."""
+        return self.gestore.statistiche_cache()
+
+    def statistiche_pool(self):
+        """Vedi GestoreImmobiliare.statistiche_pool (non accede al database)."""
+        return self.gestore.statistiche_pool()
+
+    def stats(self, azzera: bool = False):
+        """Vedi GestoreImmobiliare.stats (non accede al database)."""
+        return self.gestore.stats(azzera)
+
+    async def close(self) -> None:
+        """Attende le scritture in coda, chiude il gestore e ferma gli executor."""
+        async with self._lock_transazione:
+            await asyncio.get_running_loop().run_in_executor(None, self._chiudi)
+
+    def _chiudi(self) -> None:
+        self._scrittore.shutdown(wait=True)
+        self._lettori.shutdown(wait=True)
+        self.gestore.close()
@@ -0,0 +1,536 @@
+"""
+Importazione parallela di agenzie, agenti e proprietà da file CSV o JSONL.
+
+Con feed da milioni di righe il collo di bottiglia non è SQLite ma la
+conversione e la validazione dei record, che in un solo processo occupano
+un'unica CPU. `importa` divide il lavoro così:
+
+- un thread legge i file a lotti di `righe_per_lotto` record e li affida a un
+  pool di processi, che li converte in Agenzia/Agente/Proprieta e scarta
+  (registrandole) le righe non valide;
+- i lotti convertiti passano, nell'ordine del file, da una coda limitata a
+  `lotti_in_coda` elementi: se la scrittura è più lenta della conversione la
+  coda si riempie e la lettura si ferma (backpressure), quindi la memoria
+  resta limitata anche con file enormi;
+- il thread chiamante è l'unico a scrivere: inserisce ogni lotto con
+  add_agenzie/add_agenti/add_proprieta_many in un'unica transazione e, con
+  `indici_differiti=True`, elimina gli indici secondari prima del
+  caricamento e li ricostruisce alla fine, una volta sola;
+- dopo ogni lotto `progresso` riceve righe lette, inserite e scartate e la
+  velocità in righe al secondo.
+
+I file CSV hanno un'intestazione con i nomi dei campi delle dataclass
+(`id_proprieta,indirizzo,prezzo,stato,id_agente,latitudine,longitudine`); i
+file JSONL un oggetto per riga con le stesse chiavi. Le coordinate sono
+facoltative.
+
+Uso
+---
+python -m immobiliare_import immobiliare.db --agenzie agenzie.csv \\
+    --agenti agenti.csv --proprieta proprieta.jsonl [--processi 8] [--profilo bulk-load]
+"""
+
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+import argparse
+import csv
+import json
+import math
+import multiprocessing
+import os
+import queue
+import threading
+import time
+
+from immobiliare_manager import (
+    DIMENSIONE_BLOCCO,
+    Agenzia,
+    Agente,
+    Proprieta,
+    ErroreBlocco,
+    GestoreImmobiliare,
+)
+
+
+__all__ = [
+    "RigaNonValida",
+    "EsitoTabella",
+    "RisultatoImportazione",
+    "importa",
+]
+
+
+RIGHE_PER_LOTTO = 5000
+# Righe non valide conservate per tabella; le altre vengono solo contate
+RIGHE_NON_VALIDE_CONSERVATE = 1000
+
+# Tabelle nell'ordine di caricamento (le chiavi esterne puntano alle precedenti)
+_TABELLE = {
+    "agenzie": (Agenzia, "add_agenzie"),
+    "agenti": (Agente, "add_agenti"),
+    "proprieta": (Proprieta, "add_proprieta_many"),
+}
+_CAMPI_FACOLTATIVI = frozenset({"latitudine", "longitudine"})
+_FINE = object()
+
+
+@dataclass
+class RigaNonValida:
+    """Una riga del file scartata durante la validazione.
+
+    Attributi
+    ---------
+    riga : int
+        Numero della riga nel file (a partire da 1, intestazione compresa)
+    messaggio : str
+        Il motivo dello scarto
+    """
+    riga: int
+    messaggio: str
+
+
+@dataclass
+class EsitoTabella:
+    """Avanzamento ed esito dell'importazione di un file.
+
+    Attributi
+    ---------
+    percorso : str
+        Il file importato
+    righe_lette : int
+        Record letti dal file
+    inseriti, scartati : int
+        Righe inserite e righe dei blocchi scartati per vincoli (vedi RisultatoCaricamento)
+    non_valide : int
+        Righe scartate dalla validazione prima di arrivare al database
+    righe_non_valide : list[RigaNonValida]
+        Le prime RIGHE_NON_VALIDE_CONSERVATE righe non valide
+    errori : list[ErroreBlocco]
+        I blocchi scartati dal database; `blocco` è l'indice (da 0) del lotto
+        del file che li conteneva, perché la suddivisione di un lotto in
+        blocchi dipende dal gestore (con GestoreImmobiliareSharded ogni shard
+        ha i propri blocchi)
+    secondi : float
+        Tempo trascorso dall'inizio della tabella
+    """
+    percorso: str
+    righe_lette: int = 0
+    inseriti: int = 0
+    scartati: int = 0
+    non_valide: int = 0
+    righe_non_valide: list[RigaNonValida] = field(default_factory=list)
+    errori: list[ErroreBlocco] = field(default_factory=list)
+    secondi: float = 0.0
+
+    @property
+    def righe_al_secondo(self) -> float:
+        return self.righe_lette / self.secondi if self.secondi else 0.0
+
+
+@dataclass
+class RisultatoImportazione:
+    """Esito di `importa`.
+
+    Attributi
+    ---------
+    tabelle : dict[str, EsitoTabella]
+        Un esito per ogni tabella importata ("agenzie", "agenti", "proprieta")
+    secondi : float
+        Durata complessiva
+    secondi_indici : float
+        Tempo speso a ricostruire gli indici secondari (0 senza indici_differiti)
+    """
+    tabelle: dict[str, EsitoTabella] = field(default_factory=dict)
+    secondi: float = 0.0
+    secondi_indici: float = 0.0
+
+
+def _intero(valore, campo: str) -> int:
+    if isinstance(valore, bool) or isinstance(valore, float):
+        raise ValueError(f"{campo}: atteso un intero, trovato {valore!r}")
+    try:
+        return int(valore)
+    except (TypeError, ValueError):
+        raise ValueError(f"{campo}: atteso un intero, trovato {valore!r}") from None
+
+
+def _decimale(valore, campo: str, minimo: float, massimo: float) -> float:
+    try:
+        numero = float(valore)
+    except (TypeError, ValueError):
+        raise ValueError(f"{campo}: atteso un numero, trovato {valore!r}") from None
+    if isinstance(valore, bool) or not math.isfinite(numero) or not minimo <= numero <= massimo:
+        raise ValueError(f"{campo}: {valore!r} fuori dall'intervallo [{minimo}, {massimo}]")
+    return numero
+
+
+def _testo(valore, campo: str) -> str:
+    if not isinstance(valore, str) or not valore.strip():
+        raise ValueError(f"{campo}: testo mancante")
+    return valore.strip()
+
+
+def _coordinata(record: dict, campo: str, limite: float) -> Optional[float]:
+    valore = record.get(campo)
+    if valore is None or valore == "":
+        return None
+    return _decimale(valore, campo, -limite, limite)
+
+
+def _converti(tabella: str, record: dict):
+    """Valida un record (dict di stringhe o valori JSON) e lo converte nella dataclass."""
+    if tabella == "agenzie":
+        return Agenzia(
+            _intero(record["id_agenzia"], "id_agenzia"),
+            _testo(record["nome"], "nome"),
+            _testo(record["indirizzo"], "indirizzo"),
+        )
+    if tabella == "agenti":
+        email = _testo(record["email"], "email")
+        if "@" not in email:
+            raise ValueError(f"email: indirizzo non valido {email!r}")
+        return Agente(
+            _intero(record["id_agente"], "id_agente"),
+            _testo(record["nome"], "nome"),
+            email,
+            _intero(record["id_agenzia"], "id_agenzia"),
+        )
+    latitudine = _coordinata(record, "latitudine", 90.0)
+    longitudine = _coordinata(record, "longitudine", 180.0)
+    if (latitudine is None) != (longitudine is None):
+        raise ValueError("latitudine e longitudine vanno indicate insieme")
+    return Proprieta(
+        _intero(record["id_proprieta"], "id_proprieta"),
+        _testo(record["indirizzo"], "indirizzo"),
+        _decimale(record["prezzo"], "prezzo", 0.0, math.inf),
+        _testo(record["stato"], "stato"),
+        _intero(record["id_agente"], "id_agente"),
+        latitudine,
+        longitudine,
+    )
+
+
+def _converti_lotto(
+    tabella: str, intestazione: Optional[list[str]], numeri: list[int], testi: list[str]
+) -> tuple[list, list[RigaNonValida]]:
+    """Eseguita nei processi del pool: converte un lotto di record grezzi.
+
+    Con `intestazione` i testi sono record CSV, altrimenti righe JSON.
+    """
+    validi, non_validi = [], []
+    for numero, testo in zip(numeri, testi):
+        try:
+            if intestazione is not None:
+                record = dict(zip(intestazione, next(csv.reader([testo]))))
+            else:
+                record = json.loads(testo)
+                if not isinstance(record, dict):
+                    raise ValueError("atteso un oggetto JSON")
+            validi.append(_converti(tabella, record))
+        except KeyError as exc:
+            non_validi.append(RigaNonValida(numero, f"campo mancante: {exc.args[0]}"))
+        except (ValueError, TypeError, csv.Error) as exc:
+            # json.JSONDecodeError è una ValueError
+            non_validi.append(RigaNonValida(numero, str(exc)))
+    return validi, non_validi
+
+
+def _records(file, formato: str) -> Iterator[tuple[int, str]]:
+    """Restituisce (numero della prima riga, testo) per ogni record non vuoto del file.
+
+    Nei CSV un campo tra virgolette può contenere a capo: le righe vengono
+    unite finché le virgolette non sono bilanciate.
+    """
+    inizio, parti, virgolette = 0, [], 0
+    for numero, riga in enumerate(file, 1):
+        if not parti:
+            if not riga.strip():
+                continue
+            inizio = numero
+        parti.append(riga)
+        if formato == "csv":
+            virgolette += riga.count('"')
+            if virgolette % 2:
+                continue
+        yield inizio, "".join(parti)
+        parti, virgolette = [], 0
+    if parti:
+        yield inizio, "".join(parti)
+
+
+def _formato(percorso: str, formato: Optional[str]) -> str:
+    formato = formato or Path(percorso).suffix.lstrip(".").lower()
+    if formato in ("jsonl", "ndjson"):
+        return "jsonl"
+    if formato != "csv":
+        raise ValueError(f"Formato di {percorso} non riconosciuto: usare .csv o .jsonl")
+    return formato
+
+
+def _in_linea(funzione: Callable, *args) -> Future:
+    """Esegue subito `funzione` e restituisce il risultato in un Future già completato."""
+    futuro = Future()
+    try:
+        futuro.set_result(funzione(*args))
+    except BaseException as exc:
+        futuro.set_exception(exc)
+    return futuro
+
+
+def _leggi(
+    tabella: str,
+    percorso: str,
+    formato: str,
+    pool: Optional[ProcessPoolExecutor],
+    righe_per_lotto: int,
+    coda: queue.Queue,
+    fermati: threading.Event,
+) -> None:
+    """Corpo del thread di lettura: mette in coda un Future per ogni lotto, poi _FINE.
+
+    Un errore di lettura viene messo in coda al posto del lotto successivo.
+    """
+    def metti(elemento) -> bool:
+        # put con attesa limitata, per accorgersi se la scrittura si è fermata
+        while not fermati.is_set():
+            try:
+                coda.put(elemento, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    try:
+        with open(percorso, encoding="utf-8-sig", newline="") as file:
+            records = _records(file, formato)
+            intestazione = None
+            if formato == "csv":
+                prima = next(records, None)
+                intestazione = next(csv.reader([prima[1]])) if prima else []
+                intestazione = [nome.strip() for nome in intestazione]
+                mancanti = [
+                    nome for nome in _TABELLE[tabella][0].__dataclass_fields__
+                    if nome not in intestazione and nome not in _CAMPI_FACOLTATIVI
+                ]
+                if mancanti and prima is not None:
+                    raise ValueError(f"{percorso}: colonne mancanti {', '.join(mancanti)}")
+            while lotto := [r for _, r in zip(range(righe_per_lotto), records)]:
+                numeri = [numero for numero, _ in lotto]
+                testi = [testo for _, testo in lotto]
+                argomenti = (tabella, intestazione, numeri, testi)
+                futuro = (
+                    pool.submit(_converti_lotto, *argomenti) if pool is not None
+                    else _in_linea(_converti_lotto, *argomenti)
+                )
+                if not metti(futuro):
+                    futuro.cancel()
+                    return
+    except Exception as exc:
+        metti(exc)
+        return
+    metti(_FINE)
+
+
+def _rimuovi_indici(connessioni: list) -> list[tuple]:
+    """Elimina gli indici secondari di agenti e proprieta e ne restituisce le definizioni."""
+    rimossi = []
+    for conn in connessioni:
+        indici = conn.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL "
+            "AND tbl_name IN ('agenzie', 'agenti', 'proprieta')"
+        ).fetchall()
+        for nome, sql in indici:
+            conn.execute(f'DROP INDEX "{nome}"')
+            rimossi.append((conn, sql))
+    return rimossi
+
+
+def importa(
+    gestore: GestoreImmobiliare,
+    *,
+    agenzie: Optional[str] = None,
+    agenti: Optional[str] = None,
+    proprieta: Optional[str] = None,
+    formato: Optional[str] = None,
+    processi: Optional[int] = None,
+    righe_per_lotto: int = RIGHE_PER_LOTTO,
+    lotti_in_coda: Optional[int] = None,
+    dimensione_blocco: int = DIMENSIONE_BLOCCO,
+    indici_differiti: bool = True,
+    progresso: Optional[Callable[[str, EsitoTabella], None]] = None,
+) -> RisultatoImportazione:
+    """Importa agenzie, agenti e proprietà da file CSV o JSONL.
+
+    Parametri
+    ---------
+    gestore : GestoreImmobiliare
+        Il gestore in cui scrivere (va bene anche un GestoreImmobiliareSharded)
+    agenzie, agenti, proprieta : str | None
+        I file da importare; vengono caricati in quest'ordine, così le chiavi
+        esterne puntano a righe già inserite
+    formato : str | None
+        "csv" o "jsonl"; per default dall'estensione di ogni file
+    processi : int | None
+        Processi che convertono e validano i record; per default uno per CPU.
+        Con 0 la conversione avviene nel thread di lettura.
+    righe_per_lotto : int
+        Record per ogni lotto affidato a un processo e scritto in una volta
+    lotti_in_coda : int | None
+        Lotti convertiti o in conversione che possono attendere la scrittura;
+        per default due per processo
+    dimensione_blocco : int
+        Come in add_proprieta_many: righe annullate insieme se violano un vincolo
+    indici_differiti : bool
+        Se True gli indici secondari vengono eliminati prima del caricamento e
+        ricostruiti alla fine, dentro la stessa transazione
+    progresso : Callable[[str, EsitoTabella], None] | None
+        Chiamata dopo ogni lotto scritto con il nome della tabella e il suo
+        esito parziale (righe lette, inserite, scartate, righe_al_secondo)
+
+    Ritorno
+    -------
+    RisultatoImportazione
+        Esito di ogni tabella e tempi complessivi.
+
+    Comportamento
+    -------------
+    Le righe non valide (campi mancanti, numeri non validi, coordinate fuori
+    scala) vengono scartate e registrate senza interrompere l'importazione;
+    i vincoli del database (ID duplicati, agenti inesistenti) scartano il
+    blocco come in add_proprieta_many. Un errore di lettura (file mancante,
+    colonne assenti) annulla invece l'intera importazione, indici compresi.
+    """
+    file = [(nome, percorso) for nome, percorso in
+            (("agenzie", agenzie), ("agenti", agenti), ("proprieta", proprieta))
+            if percorso is not None]
+    formati = {nome: _formato(percorso, formato) for nome, percorso in file}
+    if righe_per_lotto < 1:
+        raise ValueError("righe_per_lotto deve essere positivo")
+    if processi is None:
+        processi = os.cpu_count() or 1
+    if processi < 0:
+        raise ValueError("processi non può essere negativo")
+    if lotti_in_coda is None:
+        lotti_in_coda = 2 * max(processi, 1)
+
+    risultato = RisultatoImportazione()
+    inizio = time.perf_counter()
+    pool = (
+        ProcessPoolExecutor(processi, mp_context=multiprocessing.get_context("spawn"))
+        if processi else None
+    )
+    try:
+        with gestore.transaction():
+            connessioni = [shard.conn for shard in getattr(gestore, "shard", [gestore])]
+            indici = _rimuovi_indici(connessioni) if indici_differiti else []
+            for nome, percorso in file:
+                risultato.tabelle[nome] = _importa_file(
+                    gestore, nome, percorso, formati[nome], pool, righe_per_lotto,
+                    lotti_in_coda, dimensione_blocco, progresso,
+                )
+            inizio_indici = time.perf_counter()
+            for conn, sql in indici:
+                conn.execute(sql)
+            risultato.secondi_indici = time.perf_counter() - inizio_indici
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+    if indici:
+        gestore.analyze()
+    risultato.secondi = time.perf_counter() - inizio
+    return risultato
+
+
+def _importa_file(
+    gestore,
+    tabella: str,
+    percorso: str,
+    formato: str,
+    pool: Optional[ProcessPoolExecutor],
+    righe_per_lotto: int,
+    lotti_in_coda: int,
+    dimensione_blocco: int,
+    progresso: Optional[Callable[[str, EsitoTabella], None]],
+) -> EsitoTabella:
+    """Scrive i lotti di un file man mano che il thread di lettura li mette in coda."""
+    esito = EsitoTabella(percorso)
+    inserisci = getattr(gestore, _TABELLE[tabella][1])
+    coda: queue.Queue = queue.Queue(lotti_in_coda)
+    fermati = threading.Event()
+    lettore = threading.Thread(
+        target=_leggi, name=f"importa-{tabella}",
+        args=(tabella, percorso, formato, pool, righe_per_lotto, coda, fermati),
+    )
+    inizio = time.perf_counter()
+    lotto = -1
+    lettore.start()
+    try:
+        while (elemento := coda.get()) is not _FINE:
+            if isinstance(elemento, Exception):
+                raise elemento
+            validi, non_validi = elemento.result()
+            lotto += 1
+            esito.righe_lette += len(validi) + len(non_validi)
+            esito.non_valide += len(non_validi)
+            spazio = RIGHE_NON_VALIDE_CONSERVATE - len(esito.righe_non_valide)
+            esito.righe_non_valide.extend(non_validi[:max(spazio, 0)])
+            if validi:
+                parziale = inserisci(validi, dimensione_blocco)
+                esito.inseriti += parziale.inseriti
+                esito.scartati += parziale.scartati
+                esito.errori.extend(
+                    ErroreBlocco(lotto, e.righe, e.messaggio) for e in parziale.errori
+                )
+            esito.secondi = time.perf_counter() - inizio
+            if progresso is not None:
+                progresso(tabella, esito)
+    finally:
+        fermati.set()
+        lettore.join()
+    esito.secondi = time.perf_counter() - inizio
+    return esito
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("database")
+    parser.add_argument("--agenzie", help="file CSV o JSONL delle agenzie")
+    parser.add_argument("--agenti", help="file CSV o JSONL degli agenti")
+    parser.add_argument("--proprieta", help="file CSV o JSONL delle proprietà")
+    parser.add_argument("--formato", choices=("csv", "jsonl"))
+    parser.add_argument("--processi", type=int)
+    parser.add_argument("--righe-per-lotto", type=int, default=RIGHE_PER_LOTTO)
+    parser.add_argument("--profilo", default="bulk-load")
+    parser.add_argument("--indici-immediati", action="store_true",
+                        help="mantiene gli indici durante il caricamento")
+    args = parser.parse_args()
+
+    def stampa(tabella: str, esito: EsitoTabella) -> None:
+        print(f"\r{tabella:<10}{esito.righe_lette:>14,} righe{esito.righe_al_secondo:>12,.0f} righe/s"
+              f"{esito.non_valide:>10,} non valide{esito.scartati:>10,} scartate",
+              end="", flush=True)
+
+    gestore = GestoreImmobiliare(args.database, args.profilo)
+    try:
+        risultato = importa(
+            gestore, agenzie=args.agenzie, agenti=args.agenti, proprieta=args.proprieta,
+            formato=args.formato, processi=args.processi, righe_per_lotto=args.righe_per_lotto,
+            indici_differiti=not args.indici_immediati, progresso=stampa,
+        )
+    finally:
+        gestore.close()
+    print()
+    for tabella, esito in risultato.tabelle.items():
+        print(f"{tabella}: {esito.inseriti:,} inserite, {esito.scartati:,} scartate dal database, "
+              f"{esito.non_valide:,} non valide in {esito.secondi:.1f} s")
+        for riga in esito.righe_non_valide[:10]:
+            print(f"  riga {riga.riga}: {riga.messaggio}")
+        for errore in esito.errori[:10]:
+            print(f"  lotto {errore.blocco} ({errore.righe} righe): {errore.messaggio}")
+    print(f"Indici ricostruiti in {risultato.secondi_indici:.1f} s, totale {risultato.secondi:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -14,15 +14,52 @@ Le classi principali sono:
 Mantieni le classi esattamente come definite: i test automatici le importano direttamente.
 """
 
-from dataclasses import dataclass
-from typing import Optional
+from bisect import bisect_left
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import date, datetime, timezone
+from itertools import islice
+from pathlib import Path
+from types import GeneratorType
+from typing import Any, Callable, Hashable, Iterable, Iterator, Optional, Union
+from array import array
+import base64
+import copy
+import json
+import math
+import queue
+import re
 import sqlite3
+import threading
+import time
+
+try:
+    import numpy
+except ImportError:  # NumPy è opzionale: senza, le colonne sono array.array
+    numpy = None
 
 
 __all__ = [
     "Agenzia",
     "Agente",
     "Proprieta",
+    "AgenteCompatto",
+    "ProprietaCompatta",
+    "ErroreBlocco",
+    "RisultatoCaricamento",
+    "PaginaProprieta",
+    "AgenziaCompleta",
+    "Modifica",
+    "ColonneProprieta",
+    "StatistichePrezzi",
+    "StatisticheCache",
+    "StatistichePool",
+    "StatisticheOperazione",
+    "QueryLenta",
+    "StatisticheStrumentazione",
+    "ProfiloPrestazioni",
+    "PROFILI_PRESTAZIONI",
     "GestoreImmobiliare",
 ]
 
@@ -70,158 +107,2836 @@ class Agente:
 class Proprieta:
     """Rappresenta una proprietà immobiliare.
     
-    Attributi
-    ---------
-    id_proprieta : int
-        Identificatore univoco della proprietà
-    indirizzo : str
-        Indirizzo della proprietà
-    prezzo : float
-        Prezzo della proprietà
-    stato : str
-        Stato corrente (es. "In vendita", "Venduto", "In affitto")
-    id_agente : int
-        Chiave esterna che collega la proprietà a un agente
-    """
-    id_proprieta: int
-    indirizzo: str
-    prezzo: float
-    stato: str
-    id_agente: int
-
-
-class GestoreImmobiliare:
-    """Gestisce tutte le operazioni sul database per l'agenzia immobiliare.
+    Attributi
+    ---------
+    id_proprieta : int
+        Identificatore univoco della proprietà
+    indirizzo : str
+        Indirizzo della proprietà
+    prezzo : float
+        Prezzo della proprietà
+    stato : str
+        Stato corrente (es. "In vendita", "Venduto", "In affitto")
+    id_agente : int
+        Chiave esterna che collega la proprietà a un agente
+    latitudine, longitudine : float | None
+        Coordinate in gradi decimali (WGS84), se note
+    """
+    id_proprieta: int
+    indirizzo: str
+    prezzo: float
+    stato: str
+    id_agente: int
+    latitudine: Optional[float] = None
+    longitudine: Optional[float] = None
+
+
+@dataclass(slots=True)
+class AgenteCompatto:
+    """Variante di Agente con __slots__, restituita con entita_compatte=True.
+    
+    Ha gli stessi campi di Agente ma occupa circa un terzo di memoria in meno
+    ed è più rapida da costruire. Non è una sottoclasse di Agente.
+    """
+    id_agente: int
+    nome: str
+    email: str
+    id_agenzia: int
+
+
+@dataclass(slots=True)
+class ProprietaCompatta:
+    """Variante di Proprieta con __slots__, restituita con entita_compatte=True.
+    
+    Ha gli stessi campi di Proprieta ma occupa circa un terzo di memoria in meno
+    ed è più rapida da costruire. Non è una sottoclasse di Proprieta.
+    """
+    id_proprieta: int
+    indirizzo: str
+    prezzo: float
+    stato: str
+    id_agente: int
+    latitudine: Optional[float] = None
+    longitudine: Optional[float] = None
+
+
+@dataclass
+class ErroreBlocco:
+    """Descrive un blocco scartato durante un caricamento massivo.
+    
+    Attributi
+    ---------
+    blocco : int
+        Indice (a partire da 0) del blocco nel flusso di input
+    righe : int
+        Numero di righe contenute nel blocco scartato
+    messaggio : str
+        Messaggio dell'errore di integrità restituito da SQLite
+    """
+    blocco: int
+    righe: int
+    messaggio: str
+
+
+@dataclass
+class RisultatoCaricamento:
+    """Esito di un caricamento massivo (add_agenzie, add_agenti, add_proprieta_many).
+    
+    Attributi
+    ---------
+    inseriti : int
+        Numero di righe inserite con successo
+    scartati : int
+        Numero di righe appartenenti a blocchi scartati
+    errori : list[ErroreBlocco]
+        Un elemento per ogni blocco che ha violato un vincolo PK o FK
+    """
+    inseriti: int = 0
+    scartati: int = 0
+    errori: list[ErroreBlocco] = field(default_factory=list)
+
+
+@dataclass
+class PaginaProprieta:
+    """Una pagina di risultati restituita da get_pagina_proprieta.
+    
+    Attributi
+    ---------
+    elementi : list[Proprieta]
+        Le proprietà della pagina, nell'ordine richiesto
+    cursore : str | None
+        Cursore opaco da passare alla chiamata successiva per ottenere la
+        pagina seguente; None se questa è l'ultima pagina
+    """
+    elementi: list[Proprieta]
+    cursore: Optional[str]
+
+
+@dataclass
+class AgenziaCompleta:
+    """Un'agenzia con i suoi agenti e le loro proprietà (get_agenzia_completa).
+    
+    Ogni agente compare come un'unica istanza, in `agenti`; le proprietà sono
+    raggruppate per id_agente e agente_di() risale all'istanza condivisa.
+    
+    Attributi
+    ---------
+    agenzia : Agenzia
+    agenti : dict[int, Agente]
+        id_agente → agente, nell'ordine di id_agente
+    proprieta : dict[int, list[Proprieta]]
+        id_agente → proprietà dell'agente (lista vuota se non ne ha)
+    """
+    agenzia: Agenzia
+    agenti: dict[int, Agente] = field(default_factory=dict)
+    proprieta: dict[int, list[Proprieta]] = field(default_factory=dict)
+    
+    def agente_di(self, proprieta: Proprieta) -> Agente:
+        """Restituisce l'istanza dell'agente che gestisce la proprietà."""
+        return self.agenti[proprieta.id_agente]
+    
+    def tutte_le_proprieta(self) -> list[Proprieta]:
+        """Restituisce le proprietà di tutti gli agenti dell'agenzia."""
+        return [p for lista in self.proprieta.values() for p in lista]
+
+
+@dataclass
+class Modifica:
+    """Una scrittura registrata nella tabella modifiche (changes_since).
+    
+    Attributi
+    ---------
+    seq : int
+        Numero di sequenza, crescente e mai riutilizzato
+    tabella : str
+        "agenzie", "agenti" o "proprieta"
+    operazione : str
+        "INSERT", "UPDATE" o "DELETE"
+    chiave : int
+        La chiave primaria della riga (il nuovo valore se è cambiata)
+    dati : dict | None
+        La riga dopo la scrittura, colonna → valore; None per DELETE
+    """
+    seq: int
+    tabella: str
+    operazione: str
+    chiave: int
+    dati: Optional[dict]
+
+
+@dataclass
+class ColonneProprieta:
+    """Proprietà in formato colonnare, restituite da get_colonne_proprieta.
+    
+    Ogni attributo è un array con un elemento per proprietà, nello stesso ordine.
+    Con NumPy installato sono numpy.ndarray, altrimenti array.array.
+    
+    Attributi
+    ---------
+    id_proprieta : array di int64
+    id_agente : array di int64
+    prezzo : array di float64
+    stato : array di int32
+        Codice dello stato: l'indice in `categorie_stato`
+    categorie_stato : list[str]
+        Valori distinti dello stato, nell'ordine in cui sono stati incontrati
+    """
+    id_proprieta: Any
+    id_agente: Any
+    prezzo: Any
+    stato: Any
+    categorie_stato: list[str]
+    
+    def __len__(self) -> int:
+        return len(self.id_proprieta)
+    
+    def stati(self) -> list[str]:
+        """Decodifica la colonna stato nei valori testuali."""
+        return [self.categorie_stato[codice] for codice in self.stato]
+
+
+@dataclass
+class StatistichePrezzi:
+    """Statistiche sui prezzi di un gruppo di proprietà (get_statistiche_prezzi).
+    
+    Attributi
+    ---------
+    conteggio : int
+    media, minimo, massimo : float
+    percentili : dict[float, float]
+        Percentile richiesto (tra 0 e 1) → prezzo, interpolato linearmente
+        tra le due proprietà più vicine
+    """
+    conteggio: int
+    media: float
+    minimo: float
+    massimo: float
+    percentili: dict[float, float] = field(default_factory=dict)
+    
+    @property
+    def mediana(self) -> Optional[float]:
+        """Il percentile 0.5, se è stato richiesto."""
+        return self.percentili.get(0.5)
+
+
+@dataclass
+class StatisticheCache:
+    """Contatori della cache in-process di GestoreImmobiliare.
+    
+    Attributi
+    ---------
+    hit : int
+        Letture servite dalla cache
+    miss : int
+        Letture che hanno dovuto interrogare il database
+    espulsioni : int
+        Voci rimosse perché la cache era piena o perché scadute (TTL)
+    invalidazioni : int
+        Voci rimosse perché una scrittura le ha rese obsolete
+    dimensione : int
+        Numero di voci attualmente in cache
+    capacita : int
+        Numero massimo di voci
+    """
+    hit: int
+    miss: int
+    espulsioni: int
+    invalidazioni: int
+    dimensione: int
+    capacita: int
+
+
+@dataclass
+class StatistichePool:
+    """Metriche del pool di connessioni di lettura.
+    
+    Attributi
+    ---------
+    dimensione : int
+        Numero di connessioni di lettura nel pool
+    in_uso : int
+        Connessioni attualmente prese in prestito
+    picco_in_uso : int
+        Massimo numero di connessioni in uso contemporaneamente
+    acquisizioni : int
+        Connessioni prese in prestito in totale
+    attese : int
+        Acquisizioni che hanno trovato il pool saturo e hanno dovuto attendere
+    timeout : int
+        Acquisizioni fallite perché nessuna connessione si è liberata in tempo
+    attesa_totale : float
+        Secondi complessivamente trascorsi in attesa di una connessione
+    """
+    dimensione: int
+    in_uso: int
+    picco_in_uso: int
+    acquisizioni: int
+    attese: int
+    timeout: int
+    attesa_totale: float
+
+
+@dataclass
+class StatisticheOperazione:
+    """Contatori e istogramma delle latenze di un metodo o di uno statement SQL.
+    
+    Attributi
+    ---------
+    chiamate : int
+        Numero di esecuzioni
+    righe : int
+        Righe restituite (per INSERT, UPDATE e DELETE: righe modificate;
+        per i metodi: entità restituite, comprese quelle nelle liste di un
+        dizionario e agenzia, agenti e proprietà di un'AgenziaCompleta)
+    tempo_totale : float
+        Secondi complessivi
+    tempo_massimo : float
+        Secondi dell'esecuzione più lenta
+    istogramma : dict[float, int]
+        Limite superiore in secondi dell'intervallo (vedi LIMITI_ISTOGRAMMA, l'ultimo
+        è infinito) → numero di esecuzioni che vi rientrano
+    """
+    chiamate: int
+    righe: int
+    tempo_totale: float
+    tempo_massimo: float
+    istogramma: dict[float, int] = field(default_factory=dict)
+    
+    @property
+    def tempo_medio(self) -> float:
+        return self.tempo_totale / self.chiamate if self.chiamate else 0.0
+    
+    def percentile(self, q: float) -> float:
+        """Stima il percentile `q` (tra 0 e 1) della latenza, in secondi.
+        
+        Restituisce il limite superiore dell'intervallo dell'istogramma che lo
+        contiene, senza superare tempo_massimo.
+        """
+        soglia = q * self.chiamate
+        cumulato = 0
+        for limite, conteggio in self.istogramma.items():
+            cumulato += conteggio
+            if conteggio and cumulato >= soglia:
+                return min(limite, self.tempo_massimo)
+        return self.tempo_massimo
+
+
+@dataclass
+class QueryLenta:
+    """Uno statement che ha superato la soglia delle query lente.
+    
+    Attributi
+    ---------
+    sql : str
+        Lo statement normalizzato (spazi compattati, liste di ? abbreviate);
+        i parametri non vengono conservati
+    durata : float
+        Secondi tra l'esecuzione e la lettura dell'ultima riga
+    righe : int
+        Righe restituite o modificate
+    metodo : str | None
+        Il metodo del gestore da cui è partito lo statement, se noto
+    istante : float
+        Fine dell'esecuzione, come time.time()
+    piano : list[str]
+        EXPLAIN QUERY PLAN, indentato per livello; è catturato la prima volta
+        che lo statement risulta lento e riusato per le successive
+    """
+    sql: str
+    durata: float
+    righe: int
+    metodo: Optional[str]
+    istante: float
+    piano: list[str] = field(default_factory=list)
+
+
+@dataclass
+class StatisticheStrumentazione:
+    """Istantanea della strumentazione di GestoreImmobiliare (vedi `stats()`).
+    
+    Attributi
+    ---------
+    metodi : dict[str, StatisticheOperazione]
+        Nome del metodo pubblico → statistiche
+    statement : dict[str, StatisticheOperazione]
+        SQL normalizzato → statistiche
+    query_lente : list[QueryLenta]
+        Le ultime QUERY_LENTE_CONSERVATE query lente, dalla più vecchia
+    soglia_query_lenta : float
+        Secondi oltre i quali uno statement è considerato lento
+    """
+    metodi: dict[str, StatisticheOperazione]
+    statement: dict[str, StatisticheOperazione]
+    query_lente: list[QueryLenta]
+    soglia_query_lenta: float
+
+
+@dataclass(frozen=True)
+class ProfiloPrestazioni:
+    """Insieme coerente di PRAGMA SQLite applicati all'apertura della connessione.
+    
+    Attributi
+    ---------
+    nome : str
+        Nome del profilo (es. "durable", "balanced", "bulk-load")
+    journal_mode : str
+        Modalità del journal (es. "WAL", "DELETE")
+    synchronous : str
+        Livello di sincronizzazione su disco ("OFF", "NORMAL", "FULL", "EXTRA")
+    mmap_size : int
+        Byte del file mappati in memoria (0 disabilita il memory-mapping)
+    cache_size : int
+        Dimensione della page cache; se negativo è espresso in KiB
+    temp_store : str
+        Dove vengono salvate tabelle e indici temporanei ("DEFAULT", "FILE", "MEMORY")
+    busy_timeout : int
+        Millisecondi di attesa su un database bloccato prima di fallire
+    """
+    nome: str
+    journal_mode: str
+    synchronous: str
+    mmap_size: int
+    cache_size: int
+    temp_store: str
+    busy_timeout: int
+
+
+PROFILI_PRESTAZIONI = {
+    # WAL con fsync a ogni commit: i lettori non si bloccano e nessun commit va perso.
+    "durable": ProfiloPrestazioni("durable", "WAL", "FULL", 0, -2000, "DEFAULT", 5000),
+    # In WAL, NORMAL sincronizza solo ai checkpoint: un crash del sistema può perdere
+    # gli ultimi commit ma non corrompe mai il database.
+    "balanced": ProfiloPrestazioni(
+        "balanced", "WAL", "NORMAL", 256 * 1024 * 1024, -64000, "MEMORY", 5000
+    ),
+    # Per i caricamenti notturni: nessun fsync, cache grande, attese lunghe.
+    "bulk-load": ProfiloPrestazioni(
+        "bulk-load", "WAL", "OFF", 1024 * 1024 * 1024, -256000, "MEMORY", 30000
+    ),
+}
+
+_LIVELLI_SYNCHRONOUS = ("OFF", "NORMAL", "FULL", "EXTRA")
+_LIVELLI_TEMP_STORE = ("DEFAULT", "FILE", "MEMORY")
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS agenzie (
+    id_agenzia INTEGER PRIMARY KEY,
+    nome TEXT NOT NULL,
+    indirizzo TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS agenti (
+    id_agente INTEGER PRIMARY KEY,
+    nome TEXT NOT NULL,
+    email TEXT NOT NULL,
+    id_agenzia INTEGER NOT NULL,
+    FOREIGN KEY (id_agenzia) REFERENCES agenzie(id_agenzia)
+);
+CREATE TABLE IF NOT EXISTS proprieta (
+    id_proprieta INTEGER PRIMARY KEY,
+    indirizzo TEXT NOT NULL,
+    prezzo REAL NOT NULL,
+    stato TEXT NOT NULL,
+    id_agente INTEGER NOT NULL,
+    FOREIGN KEY (id_agente) REFERENCES agenti(id_agente)
+);
+"""
+
+# Migrazioni applicate in ordine sopra lo schema di base. PRAGMA user_version
+# registra quante sono già state eseguite, così un database creato con una
+# versione precedente viene aggiornato all'apertura. Aggiungere sempre in coda.
+_MIGRAZIONI = (
+    # 1: indici sulle chiavi esterne usate da JOIN e filtri, e sullo stato
+    """
+    CREATE INDEX IF NOT EXISTS idx_agenti_id_agenzia ON agenti(id_agenzia);
+    CREATE INDEX IF NOT EXISTS idx_proprieta_id_agente ON proprieta(id_agente);
+    CREATE INDEX IF NOT EXISTS idx_proprieta_stato ON proprieta(stato);
+    """,
+    # 2: ordinamento e filtri per fascia di prezzo nella paginazione; l'indice
+    # (stato, prezzo) serve anche i filtri sul solo stato e sostituisce il precedente
+    """
+    CREATE INDEX IF NOT EXISTS idx_proprieta_prezzo ON proprieta(prezzo);
+    CREATE INDEX IF NOT EXISTS idx_proprieta_stato_prezzo ON proprieta(stato, prezzo);
+    DROP INDEX IF EXISTS idx_proprieta_stato;
+    """,
+    # 3: coordinate opzionali delle proprietà
+    """
+    ALTER TABLE proprieta ADD COLUMN latitudine REAL;
+    ALTER TABLE proprieta ADD COLUMN longitudine REAL;
+    """,
+)
+
+# Conteggio delle proprietà per agente, mantenuto dai trigger a ogni inserimento,
+# cancellazione o riassegnazione. Opzionale: creato solo con conteggi_proprieta=True,
+# ma una volta presente i trigger lo tengono aggiornato per qualsiasi connessione.
+_SCHEMA_CONTEGGI = """
+CREATE TABLE conteggi_agenti (
+    id_agente INTEGER PRIMARY KEY,
+    id_agenzia INTEGER NOT NULL,
+    conteggio_proprieta INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX idx_conteggi_agenti_classifica
+    ON conteggi_agenti(id_agenzia, conteggio_proprieta DESC, id_agente);
+INSERT INTO conteggi_agenti (id_agente, id_agenzia, conteggio_proprieta)
+    SELECT a.id_agente, a.id_agenzia,
+           (SELECT COUNT(*) FROM proprieta p WHERE p.id_agente = a.id_agente)
+    FROM agenti a;
+
+CREATE TRIGGER trg_conteggi_agenti_insert AFTER INSERT ON agenti BEGIN
+    INSERT INTO conteggi_agenti (id_agente, id_agenzia) VALUES (NEW.id_agente, NEW.id_agenzia);
+END;
+CREATE TRIGGER trg_conteggi_agenti_update AFTER UPDATE OF id_agenzia ON agenti BEGIN
+    UPDATE conteggi_agenti SET id_agenzia = NEW.id_agenzia WHERE id_agente = NEW.id_agente;
+END;
+CREATE TRIGGER trg_conteggi_agenti_delete AFTER DELETE ON agenti BEGIN
+    DELETE FROM conteggi_agenti WHERE id_agente = OLD.id_agente;
+END;
+CREATE TRIGGER trg_conteggi_proprieta_insert AFTER INSERT ON proprieta BEGIN
+    UPDATE conteggi_agenti SET conteggio_proprieta = conteggio_proprieta + 1
+    WHERE id_agente = NEW.id_agente;
+END;
+CREATE TRIGGER trg_conteggi_proprieta_delete AFTER DELETE ON proprieta BEGIN
+    UPDATE conteggi_agenti SET conteggio_proprieta = conteggio_proprieta - 1
+    WHERE id_agente = OLD.id_agente;
+END;
+CREATE TRIGGER trg_conteggi_proprieta_update AFTER UPDATE OF id_agente ON proprieta
+WHEN OLD.id_agente IS NOT NEW.id_agente BEGIN
+    UPDATE conteggi_agenti SET conteggio_proprieta = conteggio_proprieta - 1
+    WHERE id_agente = OLD.id_agente;
+    UPDATE conteggi_agenti SET conteggio_proprieta = conteggio_proprieta + 1
+    WHERE id_agente = NEW.id_agente;
+END;
+"""
+
+# Riepilogo dei prezzi per (agente, stato): conteggio, somma, minimo e massimo,
+# mantenuti dai trigger. Minimo e massimo vengono ricalcolati dalla tabella
+# proprieta solo quando la riga tolta dal gruppo era proprio un estremo; i gruppi
+# svuotati vengono eliminati. Opzionale: creato solo con riepilogo_prezzi=True.
+_SCHEMA_RIEPILOGO = """
+CREATE TABLE riepilogo_prezzi (
+    id_agente INTEGER NOT NULL,
+    stato TEXT NOT NULL,
+    conteggio INTEGER NOT NULL,
+    somma REAL NOT NULL,
+    minimo REAL NOT NULL,
+    massimo REAL NOT NULL,
+    PRIMARY KEY (id_agente, stato)
+) WITHOUT ROWID;
+INSERT INTO riepilogo_prezzi (id_agente, stato, conteggio, somma, minimo, massimo)
+    SELECT id_agente, stato, COUNT(*), SUM(prezzo), MIN(prezzo), MAX(prezzo)
+    FROM proprieta GROUP BY id_agente, stato;
+
+CREATE TRIGGER trg_riepilogo_prezzi_insert AFTER INSERT ON proprieta BEGIN
+    {aggiungi}
+END;
+CREATE TRIGGER trg_riepilogo_prezzi_delete AFTER DELETE ON proprieta BEGIN
+    {togli}
+END;
+CREATE TRIGGER trg_riepilogo_prezzi_update AFTER UPDATE OF prezzo, stato, id_agente ON proprieta
+BEGIN
+    {togli}
+    {aggiungi}
+END;
+""".format(
+    aggiungi="""
+    INSERT INTO riepilogo_prezzi (id_agente, stato, conteggio, somma, minimo, massimo)
+    VALUES (NEW.id_agente, NEW.stato, 1, NEW.prezzo, NEW.prezzo, NEW.prezzo)
+    ON CONFLICT (id_agente, stato) DO UPDATE SET
+        conteggio = conteggio + 1,
+        somma = somma + excluded.somma,
+        minimo = MIN(minimo, excluded.minimo),
+        massimo = MAX(massimo, excluded.massimo);""",
+    togli="""
+    UPDATE riepilogo_prezzi SET
+        conteggio = conteggio - 1,
+        somma = somma - OLD.prezzo,
+        minimo = CASE WHEN OLD.prezzo > minimo THEN minimo ELSE COALESCE((
+            SELECT MIN(prezzo) FROM proprieta
+            WHERE id_agente = OLD.id_agente AND stato = OLD.stato), minimo) END,
+        massimo = CASE WHEN OLD.prezzo < massimo THEN massimo ELSE COALESCE((
+            SELECT MAX(prezzo) FROM proprieta
+            WHERE id_agente = OLD.id_agente AND stato = OLD.stato), massimo) END
+    WHERE id_agente = OLD.id_agente AND stato = OLD.stato;
+    DELETE FROM riepilogo_prezzi
+    WHERE id_agente = OLD.id_agente AND stato = OLD.stato AND conteggio = 0;""",
+)
+
+# Indici full-text (FTS5) sugli indirizzi di proprietà e agenzie. Sono tabelle
+# "external content": il testo resta nelle tabelle di origine e i trigger
+# aggiornano solo l'indice. prefix='2 3' rende rapide le ricerche per prefisso
+# (nomi di via digitati a metà). Opzionali: create solo con ricerca_indirizzi=True.
+_SCHEMA_INDIRIZZI = "\n".join(
+    f"""
+CREATE VIRTUAL TABLE indirizzi_{tabella} USING fts5(
+    indirizzo, content='{tabella}', content_rowid='{chiave}',
+    prefix='2 3', tokenize='unicode61 remove_diacritics 2'
+);
+INSERT INTO indirizzi_{tabella}(indirizzi_{tabella}) VALUES ('rebuild');
+CREATE TRIGGER trg_indirizzi_{tabella}_insert AFTER INSERT ON {tabella} BEGIN
+    INSERT INTO indirizzi_{tabella}(rowid, indirizzo) VALUES (NEW.{chiave}, NEW.indirizzo);
+END;
+CREATE TRIGGER trg_indirizzi_{tabella}_delete AFTER DELETE ON {tabella} BEGIN
+    INSERT INTO indirizzi_{tabella}(indirizzi_{tabella}, rowid, indirizzo)
+    VALUES ('delete', OLD.{chiave}, OLD.indirizzo);
+END;
+CREATE TRIGGER trg_indirizzi_{tabella}_update AFTER UPDATE OF indirizzo, {chiave} ON {tabella}
+BEGIN
+    INSERT INTO indirizzi_{tabella}(indirizzi_{tabella}, rowid, indirizzo)
+    VALUES ('delete', OLD.{chiave}, OLD.indirizzo);
+    INSERT INTO indirizzi_{tabella}(rowid, indirizzo) VALUES (NEW.{chiave}, NEW.indirizzo);
+END;
+"""
+    for tabella, chiave in (("proprieta", "id_proprieta"), ("agenzie", "id_agenzia"))
+)
+
+# Indice R*Tree sulle coordinate delle proprietà che le hanno. Ogni punto è un
+# rettangolo degenere; l'R*Tree memorizza float a 32 bit arrotondati verso
+# l'esterno, quindi le query lo usano per trovare i candidati e applicano il
+# filtro esatto sulle colonne di proprieta. Opzionale: creato solo con
+# indice_geografico=True.
+_SCHEMA_POSIZIONI = """
+CREATE VIRTUAL TABLE posizioni_proprieta USING rtree(
+    id_proprieta, min_lat, max_lat, min_lon, max_lon
+);
+INSERT INTO posizioni_proprieta
+    SELECT id_proprieta, latitudine, latitudine, longitudine, longitudine FROM proprieta
+    WHERE latitudine IS NOT NULL AND longitudine IS NOT NULL;
+
+CREATE TRIGGER trg_posizioni_proprieta_insert AFTER INSERT ON proprieta
+WHEN NEW.latitudine IS NOT NULL AND NEW.longitudine IS NOT NULL BEGIN
+    INSERT INTO posizioni_proprieta VALUES (
+        NEW.id_proprieta, NEW.latitudine, NEW.latitudine, NEW.longitudine, NEW.longitudine);
+END;
+CREATE TRIGGER trg_posizioni_proprieta_delete AFTER DELETE ON proprieta BEGIN
+    DELETE FROM posizioni_proprieta WHERE id_proprieta = OLD.id_proprieta;
+END;
+CREATE TRIGGER trg_posizioni_proprieta_update
+AFTER UPDATE OF latitudine, longitudine, id_proprieta ON proprieta BEGIN
+    DELETE FROM posizioni_proprieta WHERE id_proprieta = OLD.id_proprieta;
+    INSERT INTO posizioni_proprieta
+        SELECT NEW.id_proprieta, NEW.latitudine, NEW.latitudine, NEW.longitudine, NEW.longitudine
+        WHERE NEW.latitudine IS NOT NULL AND NEW.longitudine IS NOT NULL;
+END;
+"""
+
+# Colonne di proprieta nell'ordine dei campi di Proprieta (e di ProprietaCompatta):
+# le query che costruiscono entità e gli INSERT le prendono da qui, insieme a
+# _valori_proprieta, quindi un nuovo campo va aggiunto solo in questi due punti.
+_COLONNE_PROPRIETA = (
+    "id_proprieta", "indirizzo", "prezzo", "stato", "id_agente", "latitudine", "longitudine",
+)
+_SELECT_COLONNE_PROPRIETA = ", ".join(_COLONNE_PROPRIETA)
+_SELECT_COLONNE_P = ", ".join(f"p.{colonna}" for colonna in _COLONNE_PROPRIETA)
+
+
+def _valori_proprieta(proprieta: Proprieta) -> tuple:
+    """I valori da inserire per una proprietà, nell'ordine di _COLONNE_PROPRIETA."""
+    return (
+        proprieta.id_proprieta,
+        proprieta.indirizzo,
+        proprieta.prezzo,
+        proprieta.stato,
+        proprieta.id_agente,
+        proprieta.latitudine,
+        proprieta.longitudine,
+    )
+
+
+# Colonne registrate nel log delle modifiche per ciascuna tabella (la prima è la chiave).
+_TABELLE_REGISTRATE = {
+    "agenzie": ("id_agenzia", "nome", "indirizzo"),
+    "agenti": ("id_agente", "nome", "email", "id_agenzia"),
+    "proprieta": _COLONNE_PROPRIETA,
+}
+
+
+def _trigger_modifiche(tabella: str, colonne: tuple) -> str:
+    chiave = colonne[0]
+    dati = "json_object({})".format(", ".join(f"'{c}', NEW.{c}" for c in colonne))
+    
+    def registra(operazione, riga, json):
+        return (
+            "INSERT INTO modifiche (tabella, operazione, chiave, dati) "
+            f"VALUES ('{tabella}', '{operazione}', {riga}.{chiave}, {json});"
+        )
+    
+    # Se cambia la chiave primaria la modifica viene registrata come DELETE + INSERT,
+    # così chi consuma il log rimuove la vecchia chiave.
+    return f"""
+CREATE TRIGGER trg_modifiche_{tabella}_insert AFTER INSERT ON {tabella} BEGIN
+    {registra("INSERT", "NEW", dati)}
+END;
+CREATE TRIGGER trg_modifiche_{tabella}_update AFTER UPDATE ON {tabella}
+WHEN OLD.{chiave} = NEW.{chiave} BEGIN
+    {registra("UPDATE", "NEW", dati)}
+END;
+CREATE TRIGGER trg_modifiche_{tabella}_update_chiave AFTER UPDATE OF {chiave} ON {tabella}
+WHEN OLD.{chiave} <> NEW.{chiave} BEGIN
+    {registra("DELETE", "OLD", "NULL")}
+    {registra("INSERT", "NEW", dati)}
+END;
+CREATE TRIGGER trg_modifiche_{tabella}_delete AFTER DELETE ON {tabella} BEGIN
+    {registra("DELETE", "OLD", "NULL")}
+END;
+"""
+
+
+# Log delle modifiche (change data capture): ogni scrittura su agenzie, agenti e
+# proprieta aggiunge una riga nella stessa transazione, quindi il log contiene
+# esattamente le scritture confermate. AUTOINCREMENT garantisce che seq non venga
+# mai riutilizzato, nemmeno dopo pota_modifiche. Opzionale: creato solo con
+# registro_modifiche=True.
+_SCHEMA_MODIFICHE = """
+CREATE TABLE modifiche (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    tabella TEXT NOT NULL,
+    operazione TEXT NOT NULL,
+    chiave INTEGER NOT NULL,
+    dati TEXT
+);
+""" + "".join(
+    _trigger_modifiche(tabella, colonne) for tabella, colonne in _TABELLE_REGISTRATE.items()
+)
+
+# Storico delle proprietà: una riga per ogni variazione di prezzo, stato o
+# agente, più una riga di stato all'inserimento (valore_precedente NULL, cioè
+# "messa sul mercato") e, alla cancellazione, una riga per campo con
+# valore_nuovo NULL. Il valore di un campo a un certo istante è il
+# valore_precedente della prima variazione successiva, o il valore attuale se
+# non ce ne sono. Gli istanti sono testo ISO 8601 in UTC con i millisecondi,
+# quindi si confrontano come stringhe. Opzionale: creato solo con storico_proprieta=True.
+_ADESSO_SQL = "strftime('%Y-%m-%dT%H:%M:%fZ', 'now')"
+_CAMPI_STORICO = ("prezzo", "stato", "id_agente")
+_VARIAZIONI_STORICO = "\n    UNION ALL ".join(
+    f"SELECT NEW.id_proprieta, '{campo}', OLD.{campo}, NEW.{campo}, {_ADESSO_SQL} "
+    f"WHERE OLD.{campo} IS NOT NEW.{campo}"
+    for campo in _CAMPI_STORICO
+)
+_CANCELLAZIONI_STORICO = ",\n           ".join(
+    f"(OLD.id_proprieta, '{campo}', OLD.{campo}, NULL, {_ADESSO_SQL})"
+    for campo in ("indirizzo", *_CAMPI_STORICO)
+)
+_SCHEMA_STORICO = f"""
+CREATE TABLE storico_proprieta (
+    seq INTEGER PRIMARY KEY,
+    id_proprieta INTEGER NOT NULL,
+    campo TEXT NOT NULL,
+    valore_precedente,
+    valore_nuovo,
+    istante TEXT NOT NULL
+);
+CREATE INDEX idx_storico_proprieta ON storico_proprieta(id_proprieta, campo, istante);
+CREATE INDEX idx_storico_agenti ON storico_proprieta(valore_precedente, istante)
+    WHERE campo = 'id_agente';
+
+CREATE TRIGGER trg_storico_proprieta_insert AFTER INSERT ON proprieta BEGIN
+    INSERT INTO storico_proprieta (id_proprieta, campo, valore_precedente, valore_nuovo, istante)
+    VALUES (NEW.id_proprieta, 'stato', NULL, NEW.stato, {_ADESSO_SQL});
+END;
+CREATE TRIGGER trg_storico_proprieta_update
+AFTER UPDATE OF {", ".join(_CAMPI_STORICO)} ON proprieta BEGIN
+    INSERT INTO storico_proprieta (id_proprieta, campo, valore_precedente, valore_nuovo, istante)
+    {_VARIAZIONI_STORICO};
+END;
+CREATE TRIGGER trg_storico_proprieta_delete AFTER DELETE ON proprieta BEGIN
+    INSERT INTO storico_proprieta (id_proprieta, campo, valore_precedente, valore_nuovo, istante)
+    VALUES {_CANCELLAZIONI_STORICO};
+END;
+"""
+
+_INSERT_AGENZIA = "INSERT INTO agenzie (id_agenzia, nome, indirizzo) VALUES (?, ?, ?)"
+_INSERT_AGENTE = "INSERT INTO agenti (id_agente, nome, email, id_agenzia) VALUES (?, ?, ?, ?)"
+_INSERT_PROPRIETA = (
+    f"INSERT INTO proprieta ({_SELECT_COLONNE_PROPRIETA}) "
+    f"VALUES ({', '.join('?' * len(_COLONNE_PROPRIETA))})"
+)
+
+_SELECT_PROPRIETA_PER_AGENTE = (
+    f"SELECT {_SELECT_COLONNE_PROPRIETA} FROM proprieta WHERE id_agente = ?"
+)
+_SELECT_AGENTI_PER_AGENZIA = (
+    "SELECT id_agente, nome, email, id_agenzia FROM agenti WHERE id_agenzia = ?"
+)
+_SELECT_PROPRIETA_PER_AGENTI = (
+    f"SELECT {_SELECT_COLONNE_PROPRIETA} FROM proprieta WHERE id_agente IN ({{segnaposti}})"
+)
+_SELECT_AGENTI_PER_AGENZIE = (
+    "SELECT id_agente, nome, email, id_agenzia FROM agenti WHERE id_agenzia IN ({segnaposti})"
+)
+_SELECT_AGENZIE_COMPLETE = (
+    "SELECT id_agenzia, nome, indirizzo FROM agenzie{filtro} ORDER BY id_agenzia",
+    "SELECT id_agente, nome, email, id_agenzia FROM agenti{filtro} ORDER BY id_agente",
+    f"SELECT {_SELECT_COLONNE_P} "
+    "FROM proprieta p JOIN agenti a ON p.id_agente = a.id_agente{filtro}",
+)
+_SELECT_PROPRIETA_PER_AGENZIA = (
+    f"SELECT {_SELECT_COLONNE_P} "
+    "FROM proprieta p JOIN agenti a ON p.id_agente = a.id_agente "
+    "WHERE a.id_agenzia = ?"
+)
+
+_DIMENSIONI_STATISTICHE = ("agenzia", "agente", "stato")
+
+# Colonne ammesse come chiave di ordinamento della paginazione; id_proprieta
+# fa sempre da spareggio, così la chiave (colonna, id_proprieta) è univoca.
+_ORDINAMENTI_PROPRIETA = {"prezzo": "p.prezzo", "id_proprieta": "p.id_proprieta"}
+
+DIMENSIONE_BLOCCO = 1000
+# Gli statement preparati restano in cache per connessione: le query fisse sono
+# poche decine, il resto dello spazio serve alle combinazioni di filtri.
+STATEMENT_IN_CACHE = 256
+DIMENSIONE_BATCH_LETTURA = 500
+RAGGIO_TERRESTRE_KM = 6371.0088
+# Limite di parametri per statement garantito da ogni versione di SQLite
+# (SQLITE_MAX_VARIABLE_NUMBER vale 999 fino alla 3.32): le liste IN più lunghe
+# vengono spezzate in più query.
+MASSIMO_PARAMETRI_SQL = 999
+# Limiti superiori (in secondi) degli intervalli degli istogrammi di latenza;
+# un ultimo intervallo raccoglie le esecuzioni oltre i 10 secondi.
+LIMITI_ISTOGRAMMA = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+QUERY_LENTE_CONSERVATE = 100
+_SEGNAPOSTO_RIPETUTI = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+# Solo per questi statement si cattura EXPLAIN QUERY PLAN
+_STATEMENT_CON_PIANO = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE", "REPLACE")
+# Metodi pubblici che non vengono misurati: non interrogano il database o
+# restituiscono context manager
+_METODI_NON_STRUMENTATI = frozenset({
+    "transaction", "close", "stats", "statistiche_cache", "statistiche_pool",
+})
+
+
+_MANCANTE = object()
+
+
+class _CacheLRU:
+    """Cache LRU con scadenza opzionale, sicura tra thread."""
+    
+    def __init__(self, capacita: int, ttl: Optional[float] = None):
+        if capacita < 1:
+            raise ValueError("La capacità della cache deve essere positiva")
+        self.capacita = capacita
+        self.ttl = ttl
+        self._voci: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hit = self.miss = self.espulsioni = self.invalidazioni = 0
+        # Cresce a ogni invalidazione: un valore calcolato prima non va più scritto.
+        self.versione = 0
+    
+    def leggi(self, chiave: Hashable):
+        """Restituisce il valore in cache oppure _MANCANTE."""
+        with self._lock:
+            voce = self._voci.get(chiave)
+            if voce is not None:
+                valore, scadenza = voce
+                if scadenza is None or scadenza > time.monotonic():
+                    self._voci.move_to_end(chiave)
+                    self.hit += 1
+                    return valore
+                del self._voci[chiave]
+                self.espulsioni += 1
+            self.miss += 1
+            return _MANCANTE
+    
+    def scrivi(self, chiave: Hashable, valore, versione: Optional[int] = None) -> None:
+        """Memorizza il valore, a meno che `versione` sia superata da un'invalidazione."""
+        scadenza = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            if versione is not None and versione != self.versione:
+                return
+            self._voci[chiave] = (valore, scadenza)
+            self._voci.move_to_end(chiave)
+            while len(self._voci) > self.capacita:
+                self._voci.popitem(last=False)
+                self.espulsioni += 1
+    
+    def invalida(self, *chiavi: Hashable) -> None:
+        with self._lock:
+            self.versione += 1
+            for chiave in chiavi:
+                if self._voci.pop(chiave, None) is not None:
+                    self.invalidazioni += 1
+    
+    def svuota(self) -> None:
+        with self._lock:
+            self.versione += 1
+            self.invalidazioni += len(self._voci)
+            self._voci.clear()
+    
+    def statistiche(self) -> StatisticheCache:
+        with self._lock:
+            return StatisticheCache(
+                self.hit, self.miss, self.espulsioni, self.invalidazioni,
+                len(self._voci), self.capacita,
+            )
+
+
+class _PoolConnessioni:
+    """Insieme fisso di connessioni di lettura, prese in prestito una alla volta."""
+    
+    def __init__(self, connessioni: list[sqlite3.Connection], attesa_massima: float):
+        self._tutte = connessioni
+        self._libere: queue.LifoQueue = queue.LifoQueue()
+        for conn in connessioni:
+            self._libere.put(conn)
+        self.attesa_massima = attesa_massima
+        self._lock = threading.Lock()
+        self.in_uso = self.picco_in_uso = self.acquisizioni = self.attese = self.timeout = 0
+        self.attesa_totale = 0.0
+    
+    @contextmanager
+    def connessione(self) -> Iterator[sqlite3.Connection]:
+        """Prende in prestito una connessione, attendendo al più `attesa_massima` secondi."""
+        try:
+            conn = self._libere.get_nowait()
+            attesa = None
+        except queue.Empty:
+            inizio = time.perf_counter()
+            try:
+                conn = self._libere.get(timeout=self.attesa_massima)
+            except queue.Empty:
+                with self._lock:
+                    self.timeout += 1
+                raise TimeoutError(
+                    f"Nessuna connessione di lettura libera entro {self.attesa_massima} s"
+                ) from None
+            attesa = time.perf_counter() - inizio
+        with self._lock:
+            self.acquisizioni += 1
+            if attesa is not None:
+                self.attese += 1
+                self.attesa_totale += attesa
+            self.in_uso += 1
+            self.picco_in_uso = max(self.picco_in_uso, self.in_uso)
+        try:
+            yield conn
+        finally:
+            with self._lock:
+                self.in_uso -= 1
+            self._libere.put(conn)
+    
+    def statistiche(self) -> StatistichePool:
+        with self._lock:
+            return StatistichePool(
+                len(self._tutte), self.in_uso, self.picco_in_uso, self.acquisizioni,
+                self.attese, self.timeout, self.attesa_totale,
+            )
+    
+    def chiudi(self) -> None:
+        for conn in self._tutte:
+            conn.close()
+
+
+class _ContatoreLatenze:
+    """Contatori di un metodo o di uno statement; va aggiornato sotto il lock di _Strumentazione."""
+    
+    __slots__ = ("chiamate", "righe", "tempo_totale", "tempo_massimo", "conteggi")
+    
+    def __init__(self):
+        self.chiamate = self.righe = 0
+        self.tempo_totale = self.tempo_massimo = 0.0
+        self.conteggi = [0] * (len(LIMITI_ISTOGRAMMA) + 1)
+    
+    def aggiungi(self, durata: float, righe: int) -> None:
+        self.chiamate += 1
+        self.righe += righe
+        self.tempo_totale += durata
+        self.tempo_massimo = max(self.tempo_massimo, durata)
+        self.conteggi[bisect_left(LIMITI_ISTOGRAMMA, durata)] += 1
+    
+    def istantanea(self) -> StatisticheOperazione:
+        return StatisticheOperazione(
+            self.chiamate, self.righe, self.tempo_totale, self.tempo_massimo,
+            dict(zip((*LIMITI_ISTOGRAMMA, math.inf), self.conteggi)),
+        )
+
+
+def _normalizza_sql(sql: str) -> str:
+    """Compatta gli spazi e abbrevia le liste di segnaposto tra parentesi.
+    
+    Così le liste IN di lunghezza diversa finiscono nello stesso statement.
+    """
+    return _SEGNAPOSTO_RIPETUTI.sub("(?, ...)", " ".join(sql.split()))
+
+
+class _Strumentazione:
+    """Raccoglie le statistiche di metodi e statement di un gestore, sicura tra thread."""
+    
+    def __init__(self, soglia_query_lenta: float):
+        self.soglia_query_lenta = soglia_query_lenta
+        self._lock = threading.Lock()
+        self._metodi: dict[str, _ContatoreLatenze] = {}
+        self._statement: dict[str, _ContatoreLatenze] = {}
+        self._piani: dict[str, list[str]] = {}
+        self._query_lente: deque = deque(maxlen=QUERY_LENTE_CONSERVATE)
+        self._locale = threading.local()
+    
+    def avvolgi(self, nome: str, metodo: Callable) -> Callable:
+        """Restituisce `metodo` con la misura di tempo e righe restituite."""
+        def strumentato(*args, **kwargs):
+            precedente = getattr(self._locale, "metodo", None)
+            if precedente is None:
+                self._locale.metodo = nome
+            inizio = time.perf_counter()
+            try:
+                risultato = metodo(*args, **kwargs)
+            finally:
+                self._locale.metodo = precedente
+            if isinstance(risultato, GeneratorType):
+                return self._misura_iteratore(nome, risultato)
+            self._registra(self._metodi, nome, time.perf_counter() - inizio, _righe(risultato))
+            return risultato
+        
+        strumentato.__name__ = nome
+        strumentato.__doc__ = metodo.__doc__
+        strumentato.__wrapped__ = metodo
+        return strumentato
+    
+    def _misura_iteratore(self, nome: str, iteratore: Iterator) -> Iterator:
+        """Misura solo il tempo passato a produrre gli elementi, non quello del chiamante."""
+        durata = 0.0
+        righe = 0
+        try:
+            while True:
+                inizio = time.perf_counter()
+                precedente = getattr(self._locale, "metodo", None)
+                if precedente is None:
+                    self._locale.metodo = nome
+                try:
+                    elemento = next(iteratore)
+                except StopIteration:
+                    break
+                finally:
+                    self._locale.metodo = precedente
+                    durata += time.perf_counter() - inizio
+                righe += 1
+                yield elemento
+        finally:
+            iteratore.close()
+            self._registra(self._metodi, nome, durata, righe)
+    
+    def registra_statement(
+        self, conn: sqlite3.Connection, sql: str, parametri, durata: float, righe: int
+    ) -> None:
+        chiave = _normalizza_sql(sql)
+        self._registra(self._statement, chiave, durata, righe)
+        if durata < self.soglia_query_lenta:
+            return
+        piano = self._piani.get(chiave)
+        if piano is None:
+            piano = self._piani[chiave] = _piano_query(conn, sql, parametri)
+        self._query_lente.append(QueryLenta(
+            chiave, durata, righe, getattr(self._locale, "metodo", None), time.time(), piano
+        ))
+    
+    def _registra(self, contatori: dict, chiave: str, durata: float, righe: int) -> None:
+        with self._lock:
+            contatore = contatori.get(chiave)
+            if contatore is None:
+                contatore = contatori[chiave] = _ContatoreLatenze()
+            contatore.aggiungi(durata, righe)
+    
+    def istantanea(self, azzera: bool = False) -> StatisticheStrumentazione:
+        with self._lock:
+            risultato = StatisticheStrumentazione(
+                {nome: c.istantanea() for nome, c in self._metodi.items()},
+                {sql: c.istantanea() for sql, c in self._statement.items()},
+                list(self._query_lente),
+                self.soglia_query_lenta,
+            )
+            if azzera:
+                self._metodi.clear()
+                self._statement.clear()
+                self._query_lente.clear()
+        return risultato
+
+
+def _righe(risultato) -> int:
+    if isinstance(risultato, AgenziaCompleta):
+        return 1 + len(risultato.agenti) + sum(map(len, risultato.proprieta.values()))
+    if isinstance(risultato, dict):
+        return sum(
+            _righe(valore) if isinstance(valore, (list, AgenziaCompleta)) else int(valore is not None)
+            for valore in risultato.values()
+        )
+    if isinstance(risultato, (list, tuple, ColonneProprieta)):
+        return len(risultato)
+    if isinstance(risultato, PaginaProprieta):
+        return len(risultato.elementi)
+    if isinstance(risultato, RisultatoCaricamento):
+        return risultato.inseriti
+    return 0
+
+
+def _piano_query(conn: sqlite3.Connection, sql: str, parametri) -> list[str]:
+    """EXPLAIN QUERY PLAN di `sql`, con una riga per nodo indentata per livello."""
+    if not sql.lstrip()[:7].upper().startswith(_STATEMENT_CON_PIANO) or parametri is None:
+        return []
+    try:
+        nodi = sqlite3.Cursor(conn).execute(f"EXPLAIN QUERY PLAN {sql}", parametri).fetchall()
+    except sqlite3.Error:
+        return []
+    livelli = {0: -1}
+    piano = []
+    for id_nodo, genitore, _, dettaglio in nodi:
+        livelli[id_nodo] = livelli.get(genitore, -1) + 1
+        piano.append("  " * livelli[id_nodo] + dettaglio)
+    return piano
+
+
+class _CursoreStrumentato(sqlite3.Cursor):
+    """Cursore che misura ogni statement dall'esecuzione all'ultima riga letta.
+    
+    La misura si chiude quando le righe sono esaurite, alla chiusura del
+    cursore, alla successiva execute o quando il cursore viene distrutto;
+    le letture parziali contano solo le righe effettivamente lette.
+    """
+    
+    _misura = None
+    
+    def execute(self, sql, parametri=(), /):
+        self._chiudi_misura()
+        inizio = time.perf_counter()
+        super().execute(sql, parametri)
+        self._inizia_misura(sql, parametri, time.perf_counter() - inizio)
+        return self
+    
+    def executemany(self, sql, sequenza_parametri, /):
+        self._chiudi_misura()
+        inizio = time.perf_counter()
+        super().executemany(sql, sequenza_parametri)
+        self._inizia_misura(sql, None, time.perf_counter() - inizio)
+        return self
+    
+    def _inizia_misura(self, sql: str, parametri, durata: float) -> None:
+        self._misura = [sql, parametri, durata, 0]
+        if self.description is None:
+            # Nessuna riga da leggere (INSERT, UPDATE, DDL, ...): la misura è completa.
+            self._misura[3] = max(self.rowcount, 0)
+            self._chiudi_misura()
+    
+    def _accumula(self, inizio: float, righe: int, esaurito: bool) -> None:
+        misura = self._misura
+        if misura is not None:
+            misura[2] += time.perf_counter() - inizio
+            misura[3] += righe
+            if esaurito:
+                self._chiudi_misura()
+    
+    def _chiudi_misura(self) -> None:
+        misura = self._misura
+        if misura is not None:
+            self._misura = None
+            self.connection._strumentazione.registra_statement(self.connection, *misura)
+    
+    def fetchone(self):
+        inizio = time.perf_counter()
+        riga = super().fetchone()
+        self._accumula(inizio, riga is not None, riga is None)
+        return riga
+    
+    def fetchmany(self, size=None):
+        inizio = time.perf_counter()
+        dimensione = self.arraysize if size is None else size
+        righe = super().fetchmany(dimensione)
+        self._accumula(inizio, len(righe), len(righe) < dimensione)
+        return righe
+    
+    def fetchall(self):
+        inizio = time.perf_counter()
+        righe = super().fetchall()
+        self._accumula(inizio, len(righe), True)
+        return righe
+    
+    def __next__(self):
+        inizio = time.perf_counter()
+        try:
+            riga = super().__next__()
+        except StopIteration:
+            self._accumula(inizio, 0, True)
+            raise
+        self._accumula(inizio, 1, False)
+        return riga
+    
+    def close(self):
+        self._chiudi_misura()
+        super().close()
+    
+    def __del__(self):
+        try:
+            self._chiudi_misura()
+        except Exception:
+            pass
+
+
+class _ConnessioneStrumentata(sqlite3.Connection):
+    """Connessione i cui cursori (anche quelli di execute) sono _CursoreStrumentato."""
+    
+    _strumentazione: _Strumentazione
+    
+    def cursor(self, factory=_CursoreStrumentato):
+        return super().cursor(factory)
+    
+    def execute(self, sql, parametri=(), /):
+        return self.cursor().execute(sql, parametri)
+    
+    def executemany(self, sql, sequenza_parametri, /):
+        return self.cursor().executemany(sql, sequenza_parametri)
+
+
+def _fabbrica_righe(classe: type) -> Callable[[sqlite3.Cursor, tuple], object]:
+    """Crea una row_factory che costruisce `classe` passando le colonne per posizione.
+    
+    La row_factory viene chiamata dal modulo sqlite3 mentre legge le righe,
+    quindi fetchall/fetchmany restituiscono già le entità senza passare da una
+    lista intermedia di tuple. Le colonne della query devono seguire l'ordine
+    dei campi della dataclass.
+    """
+    def fabbrica(cursor, riga):
+        return classe(*riga)
+    
+    fabbrica.__name__ = f"righe_{classe.__name__}"
+    return fabbrica
+
+
+def _riga_modifica(cursor: sqlite3.Cursor, riga: tuple) -> Modifica:
+    seq, tabella, operazione, chiave, dati = riga
+    return Modifica(seq, tabella, operazione, chiave, json.loads(dati) if dati is not None else None)
+
+
+def _esegui_mappato(
+    conn: sqlite3.Connection, sql: str, parametri: Iterable, fabbrica: Callable
+) -> sqlite3.Cursor:
+    """Esegue `sql` su un cursore nuovo che mappa le righe con `fabbrica`."""
+    cursor = conn.cursor()
+    cursor.row_factory = fabbrica
+    return cursor.execute(sql, parametri)
+
+
+def _filtri_proprieta(
+    stato: Optional[str] = None,
+    prezzo_min: Optional[float] = None,
+    prezzo_max: Optional[float] = None,
+    id_agente: Optional[int] = None,
+    id_agenzia: Optional[int] = None,
+) -> tuple[str, list[str], list]:
+    """Traduce i filtri sulle proprietà in SQL parametrizzato.
+    
+    Ritorno
+    -------
+    tuple[str, list[str], list]
+        La clausola FROM (con il JOIN su agenti solo se serve), le condizioni
+        da unire con AND e i relativi parametri. La tabella proprieta ha alias `p`.
+    """
+    sorgente = "FROM proprieta p"
+    condizioni: list[str] = []
+    parametri: list = []
+    if id_agenzia is not None:
+        sorgente += " JOIN agenti a ON p.id_agente = a.id_agente"
+        condizioni.append("a.id_agenzia = ?")
+        parametri.append(id_agenzia)
+    if id_agente is not None:
+        condizioni.append("p.id_agente = ?")
+        parametri.append(id_agente)
+    if stato is not None:
+        condizioni.append("p.stato = ?")
+        parametri.append(stato)
+    if prezzo_min is not None:
+        condizioni.append("p.prezzo >= ?")
+        parametri.append(prezzo_min)
+    if prezzo_max is not None:
+        condizioni.append("p.prezzo <= ?")
+        parametri.append(prezzo_max)
+    return sorgente, condizioni, parametri
+
+
+def _query_fts(testo: str) -> str:
+    """Trasforma il testo digitato in una query FTS5: ogni parola è un prefisso, tutte obbligatorie.
+    
+    Le parole vengono racchiuse tra virgolette, quindi la sintassi FTS5
+    (AND, OR, NEAR, trattini, ...) nel testo dell'utente non ha effetto.
+    """
+    return " ".join(f'"{parola}"*' for parola in re.findall(r"\w+", testo))
+
+
+def _distanza_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Distanza ortodromica tra due punti (formula dell'emisenoverso)."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (
+        math.sin((phi2 - phi1) / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2
+    )
+    return 2 * RAGGIO_TERRESTRE_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _riquadri_raggio(latitudine: float, longitudine: float, raggio_km: float) -> list[tuple]:
+    """Rettangoli (lat_min, lat_max, lon_min, lon_max) che contengono il cerchio.
+    
+    Sono due se il cerchio attraversa l'antimeridiano; se contiene un polo
+    comprende tutte le longitudini.
+    """
+    angolo = raggio_km / RAGGIO_TERRESTRE_KM
+    delta_lat = math.degrees(angolo)
+    lat_min, lat_max = latitudine - delta_lat, latitudine + delta_lat
+    rapporto = math.sin(angolo) / math.cos(math.radians(latitudine)) if angolo < math.pi / 2 else 2
+    if lat_min <= -90 or lat_max >= 90 or rapporto >= 1:
+        return [(max(lat_min, -90.0), min(lat_max, 90.0), -180.0, 180.0)]
+    delta_lon = math.degrees(math.asin(rapporto))
+    lon_min, lon_max = longitudine - delta_lon, longitudine + delta_lon
+    if lon_min < -180:
+        return [(lat_min, lat_max, lon_min + 360, 180.0), (lat_min, lat_max, -180.0, lon_max)]
+    if lon_max > 180:
+        return [(lat_min, lat_max, lon_min, 180.0), (lat_min, lat_max, -180.0, lon_max - 360)]
+    return [(lat_min, lat_max, lon_min, lon_max)]
+
+
+def _istante(valore: Union[datetime, date, str]) -> str:
+    """Converte un istante nel formato dello storico (ISO 8601, UTC, millisecondi).
+    
+    Le datetime senza fuso orario sono considerate in UTC; una data, anche
+    come stringa "AAAA-MM-GG", indica la fine di quel giorno.
+    """
+    if isinstance(valore, str):
+        try:
+            valore = date.fromisoformat(valore)
+        except ValueError:
+            valore = datetime.fromisoformat(valore.replace("Z", "+00:00"))
+    if not isinstance(valore, datetime):
+        valore = datetime(valore.year, valore.month, valore.day, 23, 59, 59, 999000)
+    if valore.tzinfo is not None:
+        valore = valore.astimezone(timezone.utc)
+    return f"{valore:%Y-%m-%dT%H:%M:%S}.{valore.microsecond // 1000:03d}Z"
+
+
+def _codifica_cursore(ordina_per: str, decrescente: bool, valore, id_proprieta: int) -> str:
+    dati = json.dumps([ordina_per, decrescente, valore, id_proprieta]).encode()
+    return base64.urlsafe_b64encode(dati).decode("ascii")
+
+
+def _decodifica_cursore(cursore: str, ordina_per: str, decrescente: bool) -> tuple:
+    try:
+        ordine, discendente, valore, id_proprieta = json.loads(base64.urlsafe_b64decode(cursore))
+    except (ValueError, TypeError):
+        raise ValueError("Cursore di paginazione non valido") from None
+    if (ordine, discendente) != (ordina_per, decrescente):
+        raise ValueError("Il cursore appartiene a un ordinamento diverso")
+    return valore, id_proprieta
+
+
+def _blocchi(elementi: Iterable, dimensione: int) -> Iterator[list]:
+    """Suddivide un iterabile (anche un generatore) in liste di al più `dimensione` elementi."""
+    if dimensione < 1:
+        raise ValueError("dimensione_blocco deve essere positiva")
+    iteratore = iter(elementi)
+    while blocco := list(islice(iteratore, dimensione)):
+        yield blocco
+
+
+def _copia_entita(valore):
+    """Copia una lista o un dizionario di entità insieme alle entità contenute.
+    
+    Le entità hanno solo campi scalari, quindi basta una copia superficiale di
+    ciascuna perché il chiamante non possa alterare i valori in cache.
+    """
+    if isinstance(valore, dict):
+        return {chiave: copy.copy(entita) for chiave, entita in valore.items()}
+    return [copy.copy(entita) for entita in valore]
+
+
+class GestoreImmobiliare:
+    """Gestisce tutte le operazioni sul database per l'agenzia immobiliare.
+    
+    Questa classe fornisce metodi per:
+    - Creare e gestire la struttura del database
+    - Inserire nuove entità (agenzie, agenti, proprietà), singolarmente o in blocco
+    - Eseguire query complesse con JOIN tra tabelle
+    - Aggiornare lo stato delle proprietà
+    - Trovare statistiche sugli agenti
+    - Raggruppare più scritture in una transazione (`with gestore.transaction():`
+      oppure `with gestore:`)
+    
+    Parametri
+    ----------
+    db_path : str
+        Il percorso del file di database SQLite (es. "real_estate.db")
+    profilo : str | ProfiloPrestazioni | None
+        Profilo di prestazioni da applicare (vedi PROFILI_PRESTAZIONI)
+    conteggi_proprieta : bool
+        Mantiene nel database il numero di proprietà di ogni agente
+    cache : int | None
+        Numero massimo di risultati tenuti nella cache in-process (None la disattiva)
+    cache_ttl : float | None
+        Secondi dopo i quali una voce della cache scade
+    connessioni_lettura : int
+        Dimensione del pool di connessioni di lettura (0 = connessione singola)
+    attesa_pool : float
+        Secondi massimi di attesa per una connessione di lettura libera
+    entita_compatte : bool
+        Restituisce AgenteCompatto/ProprietaCompatta al posto di Agente/Proprieta
+    riepilogo_prezzi : bool
+        Mantiene nel database le statistiche sui prezzi per agente e stato
+    ricerca_indirizzi : bool
+        Mantiene un indice full-text degli indirizzi per cerca_proprieta e cerca_agenzie
+    indice_geografico : bool
+        Mantiene un indice R*Tree delle coordinate per le ricerche per area e raggio
+    registro_modifiche : bool
+        Registra ogni scrittura nella tabella modifiche, letta da changes_since
+    storico_proprieta : bool
+        Registra le variazioni di prezzo, stato e agente delle proprietà
+    strumentazione : bool
+        Misura metodi e statement SQL e tiene un log delle query lente (vedi stats)
+    soglia_query_lenta : float
+        Secondi oltre i quali uno statement finisce nel log delle query lente
+    sola_lettura : bool
+        Apre il database in sola lettura (mode=ro, query_only), senza migrazioni
+    """
+    
+    def __init__(
+        self,
+        db_path: str,
+        profilo: Union[str, ProfiloPrestazioni, None] = None,
+        *,
+        conteggi_proprieta: bool = False,
+        cache: Optional[int] = None,
+        cache_ttl: Optional[float] = None,
+        connessioni_lettura: int = 0,
+        attesa_pool: float = 5.0,
+        entita_compatte: bool = False,
+        riepilogo_prezzi: bool = False,
+        ricerca_indirizzi: bool = False,
+        indice_geografico: bool = False,
+        registro_modifiche: bool = False,
+        storico_proprieta: bool = False,
+        strumentazione: bool = False,
+        soglia_query_lenta: float = 0.1,
+        sola_lettura: bool = False,
+    ):
+        """Inizializza il gestore e crea le tabelle se non esistono.
+        
+        Parametri
+        ---------
+        db_path : str
+            Percorso al file database SQLite
+        profilo : str | ProfiloPrestazioni | None
+            Nome di un profilo in PROFILI_PRESTAZIONI ("durable", "balanced",
+            "bulk-load") oppure un ProfiloPrestazioni personalizzato. Con None
+            restano le impostazioni predefinite di SQLite.
+        conteggi_proprieta : bool
+            Se True crea (se assente) la tabella conteggi_agenti, mantenuta dai
+            trigger, e get_best_agente_per_agenzia la usa al posto dell'aggregazione.
+        cache : int | None
+            Se indicato, attiva una cache LRU di al più `cache` risultati per
+            get_agenti_per_agenzia, get_proprieta_per_agente,
+            get_proprieta_per_agenzia e get_best_agente_per_agenzia. Le scritture
+            fatte tramite il gestore invalidano solo le voci interessate; le
+            scritture fatte da altre connessioni non sono viste finché la voce
+            non scade (vedi `cache_ttl`). Ogni lettura restituisce entità nuove,
+            che il chiamante può modificare senza alterare la cache.
+        cache_ttl : float | None
+            Durata massima in secondi di una voce della cache.
+        connessioni_lettura : int
+            Se maggiore di zero il gestore può essere condiviso tra thread: le
+            letture usano un pool di `connessioni_lettura` connessioni in sola
+            lettura, mentre tutte le scritture passano, una alla volta, dalla
+            connessione principale `self.conn`. Perché le letture procedano in
+            parallelo alle scritture il database deve essere in WAL (ad esempio
+            con profilo="balanced").
+        attesa_pool : float
+            Se tutte le connessioni di lettura sono occupate, una lettura attende
+            al più questi secondi prima di sollevare TimeoutError.
+        entita_compatte : bool
+            Se True le query restituiscono AgenteCompatto e ProprietaCompatta,
+            varianti con __slots__ più leggere e rapide da costruire, utili per
+            risultati molto grandi.
+        riepilogo_prezzi : bool
+            Se True crea (se assente) la tabella riepilogo_prezzi, mantenuta dai
+            trigger, e get_statistiche_prezzi legge conteggi, medie, minimi e
+            massimi da lì invece di aggregare la tabella proprieta.
+        ricerca_indirizzi : bool
+            Se True crea (se assenti) gli indici FTS5 indirizzi_proprieta e
+            indirizzi_agenzie, mantenuti dai trigger, usati da cerca_proprieta
+            e cerca_agenzie. Richiede SQLite compilato con FTS5.
+        indice_geografico : bool
+            Se True crea (se assente) l'indice R*Tree posizioni_proprieta,
+            mantenuto dai trigger, che get_proprieta_in_area e
+            get_proprieta_nel_raggio usano al posto della scansione completa.
+        registro_modifiche : bool
+            Se True crea (se assente) la tabella modifiche, in cui i trigger
+            registrano ogni INSERT, UPDATE e DELETE su agenzie, agenti e
+            proprieta, fatti da qualsiasi connessione. Vedi changes_since.
+            Le scritture esistenti prima della creazione non vengono registrate.
+        storico_proprieta : bool
+            Se True crea (se assente) la tabella storico_proprieta, in cui i
+            trigger registrano inserimenti, cancellazioni e variazioni di prezzo,
+            stato e agente. Vedi get_portafoglio_al e get_tempi_sul_mercato.
+        strumentazione : bool
+            Se True misura ogni chiamata ai metodi pubblici e ogni statement SQL
+            (chiamate, righe, istogramma delle latenze) e conserva gli statement
+            più lenti di `soglia_query_lenta` con il loro EXPLAIN QUERY PLAN.
+            Vedi stats. Se False (default) metodi e connessioni sono quelli
+            normali, senza alcun costo aggiuntivo.
+        soglia_query_lenta : float
+            Secondi, dall'esecuzione all'ultima riga letta, oltre i quali uno
+            statement è considerato lento.
+        sola_lettura : bool
+            Se True apre il file esistente con l'URI `mode=ro` e PRAGMA
+            query_only, adatto ai report che leggono il database di un servizio
+            in funzione (o una sua copia fatta con crea_snapshot). Non crea
+            tabelle né applica migrazioni: lo schema deve essere già aggiornato,
+            così come le tabelle opzionali richieste; journal_mode resta quello
+            del file. Ogni scrittura solleva sqlite3.OperationalError.
+            
+        Comportamento
+        -------------
+        - Crea una connessione al database
+        - Applica il profilo di prestazioni; quello effettivamente in vigore
+          (letto dai PRAGMA) è disponibile in `self.profilo`
+        - Crea le tabelle agenzie, agenti e proprieta se non esistono
+        - Definisce chiavi primarie e chiavi esterne per l'integrità referenziale
+        """
+        if connessioni_lettura < 0:
+            raise ValueError("connessioni_lettura non può essere negativo")
+        if connessioni_lettura and db_path == ":memory:":
+            raise ValueError("Il pool di connessioni richiede un database su file")
+        if sola_lettura and db_path == ":memory:":
+            raise ValueError("La sola lettura richiede un database su file")
+        self.sola_lettura = sola_lettura
+        self._strumentazione = (
+            _Strumentazione(soglia_query_lenta) if strumentazione else None
+        )
+        self.conn = self._connetti(db_path, check_same_thread=not connessioni_lettura)
+        self._righe_agente = _fabbrica_righe(AgenteCompatto if entita_compatte else Agente)
+        self._righe_proprieta = _fabbrica_righe(
+            ProprietaCompatta if entita_compatte else Proprieta
+        )
+        self._lock_scrittura = threading.RLock()
+        self._thread_transazione: Optional[int] = None
+        self._profondita_transazione = 0
+        self._contesti: list = []
+        self._cache = _CacheLRU(cache, cache_ttl) if cache is not None else None
+        # Invalidazioni da ripetere dopo il COMMIT (None: svuotare tutta la cache)
+        self._invalidazioni_in_sospeso: Optional[set] = set()
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.profilo = self._applica_profilo(profilo)
+        if sola_lettura:
+            self._verifica_schema()
+        else:
+            self._crea_schema()
+        self.conteggi_proprieta = conteggi_proprieta
+        if conteggi_proprieta:
+            self._crea_tabella_derivata("conteggi_agenti", _SCHEMA_CONTEGGI)
+        self.riepilogo_prezzi = riepilogo_prezzi
+        if riepilogo_prezzi:
+            self._crea_tabella_derivata("riepilogo_prezzi", _SCHEMA_RIEPILOGO)
+        self.ricerca_indirizzi = ricerca_indirizzi
+        if ricerca_indirizzi:
+            self._crea_tabella_derivata("indirizzi_proprieta", _SCHEMA_INDIRIZZI)
+        self.indice_geografico = indice_geografico
+        if indice_geografico:
+            self._crea_tabella_derivata("posizioni_proprieta", _SCHEMA_POSIZIONI)
+        self.registro_modifiche = registro_modifiche
+        if registro_modifiche:
+            self._crea_tabella_derivata("modifiche", _SCHEMA_MODIFICHE)
+        self.storico_proprieta = storico_proprieta
+        if storico_proprieta:
+            self._crea_tabella_derivata("storico_proprieta", _SCHEMA_STORICO)
+        self._pool = None
+        if connessioni_lettura:
+            self._pool = _PoolConnessioni(
+                [self._apri_lettore(db_path) for _ in range(connessioni_lettura)], attesa_pool
+            )
+        if self._strumentazione is not None:
+            self._strumenta_metodi()
+    
+    def _applica_profilo(
+        self, profilo: Union[str, ProfiloPrestazioni, None]
+    ) -> ProfiloPrestazioni:
+        """Applica i PRAGMA del profilo e restituisce i valori effettivamente in vigore.
+        
+        SQLite può ignorare alcune richieste (ad esempio un database in memoria
+        non passa mai in WAL e mmap_size è limitato in fase di compilazione),
+        quindi il profilo restituito è riletto dalla connessione.
+        """
+        if isinstance(profilo, str):
+            try:
+                profilo = PROFILI_PRESTAZIONI[profilo]
+            except KeyError:
+                raise ValueError(
+                    f"Profilo sconosciuto: {profilo!r} "
+                    f"(disponibili: {', '.join(PROFILI_PRESTAZIONI)})"
+                ) from None
+        if profilo is not None:
+            self.conn.execute(f"PRAGMA busy_timeout = {int(profilo.busy_timeout)}")
+            if not self.sola_lettura:
+                # journal_mode è una proprietà del file: in sola lettura resta quella attuale.
+                self.conn.execute(f"PRAGMA journal_mode = {profilo.journal_mode}")
+            self.conn.execute(f"PRAGMA synchronous = {profilo.synchronous}")
+            self.conn.execute(f"PRAGMA mmap_size = {int(profilo.mmap_size)}")
+            self.conn.execute(f"PRAGMA cache_size = {int(profilo.cache_size)}")
+            self.conn.execute(f"PRAGMA temp_store = {profilo.temp_store}")
+        
+        def pragma(nome):
+            # Alcuni PRAGMA (es. mmap_size su un database in memoria) non restituiscono righe.
+            riga = self.conn.execute(f"PRAGMA {nome}").fetchone()
+            return riga[0] if riga is not None else 0
+        
+        return ProfiloPrestazioni(
+            nome=profilo.nome if profilo is not None else "predefinito",
+            journal_mode=pragma("journal_mode").upper(),
+            synchronous=_LIVELLI_SYNCHRONOUS[pragma("synchronous")],
+            mmap_size=pragma("mmap_size"),
+            cache_size=pragma("cache_size"),
+            temp_store=_LIVELLI_TEMP_STORE[pragma("temp_store")],
+            busy_timeout=pragma("busy_timeout"),
+        )
+    
+    def _connetti(self, db_path: str, check_same_thread: bool) -> sqlite3.Connection:
+        """Apre una connessione, strumentata se la strumentazione è attiva e in
+        sola lettura (URI mode=ro e query_only) se lo è il gestore."""
+        if self.sola_lettura:
+            db_path = f"{Path(db_path).resolve().as_uri()}?mode=ro"
+        opzioni: dict[str, Any] = {}
+        if self._strumentazione is not None:
+            opzioni["factory"] = _ConnessioneStrumentata
+        conn = sqlite3.connect(
+            db_path, check_same_thread=check_same_thread,
+            cached_statements=STATEMENT_IN_CACHE, uri=self.sola_lettura, **opzioni,
+        )
+        if self._strumentazione is not None:
+            conn._strumentazione = self._strumentazione
+        if self.sola_lettura:
+            conn.execute("PRAGMA query_only = ON")
+        return conn
+    
+    def _strumenta_metodi(self) -> None:
+        """Sostituisce, solo su questa istanza, i metodi pubblici con le versioni misurate."""
+        classe = type(self)
+        for nome in dir(classe):
+            if nome.startswith("_") or nome in _METODI_NON_STRUMENTATI:
+                continue
+            if callable(getattr(classe, nome)):
+                setattr(self, nome, self._strumentazione.avvolgi(nome, getattr(self, nome)))
+    
+    def _apri_lettore(self, db_path: str) -> sqlite3.Connection:
+        """Apre una connessione del pool con le impostazioni del profilo in vigore."""
+        conn = self._connetti(db_path, check_same_thread=False)
+        conn.execute(f"PRAGMA busy_timeout = {int(self.profilo.busy_timeout)}")
+        conn.execute(f"PRAGMA mmap_size = {int(self.profilo.mmap_size)}")
+        conn.execute(f"PRAGMA cache_size = {int(self.profilo.cache_size)}")
+        conn.execute(f"PRAGMA temp_store = {self.profilo.temp_store}")
+        conn.execute("PRAGMA query_only = ON")
+        return conn
+    
+    def _crea_schema(self) -> None:
+        """Crea le tabelle di base e applica le migrazioni non ancora eseguite."""
+        self.conn.executescript(_SCHEMA)
+        versione = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        for numero, script in enumerate(_MIGRAZIONI[versione:], start=versione + 1):
+            try:
+                self.conn.executescript(
+                    f"BEGIN; {script}; PRAGMA user_version = {numero}; COMMIT;"
+                )
+            except BaseException:
+                self.conn.rollback()
+                raise
+    
+    def _verifica_schema(self) -> None:
+        """In sola lettura controlla che le migrazioni siano già state applicate."""
+        versione = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if versione < len(_MIGRAZIONI):
+            raise RuntimeError(
+                f"Lo schema del database è alla versione {versione} invece della "
+                f"{len(_MIGRAZIONI)}: aprilo una volta in lettura e scrittura per aggiornarlo"
+            )
+    
+    def _crea_tabella_derivata(self, nome: str, schema: str) -> None:
+        """Crea e popola una tabella mantenuta dai trigger (con i trigger), se non esiste."""
+        esiste = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (nome,)
+        ).fetchone()
+        if esiste:
+            return
+        if self.sola_lettura:
+            raise RuntimeError(
+                f"La tabella {nome} non esiste e il database è aperto in sola lettura"
+            )
+        try:
+            self.conn.executescript(f"BEGIN; {schema} COMMIT;")
+        except BaseException:
+            self.conn.rollback()
+            raise
+    
+    def add_agenzia(self, agenzia: Agenzia) -> None:
+        """Aggiunge una nuova agenzia al database.
+        
+        Parametri
+        ---------
+        agenzia : Agenzia
+            L'oggetto Agenzia da inserire nel database
+            
+        Comportamento
+        -------------
+        Inserisce i dati dell'agenzia nella tabella agenzie.
+        """
+        with self._scrittura():
+            self.conn.execute(
+                _INSERT_AGENZIA, (agenzia.id_agenzia, agenzia.nome, agenzia.indirizzo)
+            )
+        self._invalida(
+            ("agenti_per_agenzia", agenzia.id_agenzia),
+            ("proprieta_per_agenzia", agenzia.id_agenzia),
+        )
+    
+    def add_agente(self, agente: Agente) -> None:
+        """Aggiunge un nuovo agente al database.
+        
+        Parametri
+        ---------
+        agente : Agente
+            L'oggetto Agente da inserire nel database
+            
+        Comportamento
+        -------------
+        Inserisce i dati dell'agente nella tabella agenti.
+        La chiave esterna id_agenzia deve riferirsi a un'agenzia esistente.
+        """
+        with self._scrittura():
+            self.conn.execute(
+                _INSERT_AGENTE, (agente.id_agente, agente.nome, agente.email, agente.id_agenzia)
+            )
+        self._invalida(
+            ("agenti_per_agenzia", agente.id_agenzia),
+            ("proprieta_per_agente", agente.id_agente),
+            ("best_agente_per_agenzia",),
+        )
+    
+    def add_proprieta(self, proprieta: Proprieta) -> None:
+        """Aggiunge una nuova proprietà al database.
+        
+        Parametri
+        ---------
+        proprieta : Proprieta
+            L'oggetto Proprieta da inserire nel database
+            
+        Comportamento
+        -------------
+        Inserisce i dati della proprietà nella tabella proprieta.
+        La chiave esterna id_agente deve riferirsi a un agente esistente.
+        """
+        with self._scrittura():
+            self.conn.execute(_INSERT_PROPRIETA, _valori_proprieta(proprieta))
+        if self._cache is not None:
+            self._invalida(
+                ("proprieta_per_agente", proprieta.id_agente),
+                ("proprieta_per_agenzia", self._agenzia_di(proprieta.id_agente)),
+                ("best_agente_per_agenzia",),
+            )
+    
+    def add_agenzie(
+        self, agenzie: Iterable[Agenzia], dimensione_blocco: int = DIMENSIONE_BLOCCO
+    ) -> RisultatoCaricamento:
+        """Inserisce molte agenzie in un'unica transazione.
+        
+        Parametri
+        ---------
+        agenzie : Iterable[Agenzia]
+            Le agenzie da inserire (va bene anche un generatore)
+        dimensione_blocco : int
+            Numero di righe passate a ogni executemany
+            
+        Ritorno
+        -------
+        RisultatoCaricamento
+            Righe inserite e blocchi scartati per violazioni di vincoli.
+        """
+        righe = ((a.id_agenzia, a.nome, a.indirizzo) for a in agenzie)
+        return self._inserisci_a_blocchi(_INSERT_AGENZIA, righe, dimensione_blocco)
+    
+    def add_agenti(
+        self, agenti: Iterable[Agente], dimensione_blocco: int = DIMENSIONE_BLOCCO
+    ) -> RisultatoCaricamento:
+        """Inserisce molti agenti in un'unica transazione.
+        
+        Vedi add_agenzie per il significato dei parametri e del valore restituito.
+        """
+        righe = ((a.id_agente, a.nome, a.email, a.id_agenzia) for a in agenti)
+        return self._inserisci_a_blocchi(_INSERT_AGENTE, righe, dimensione_blocco)
+    
+    def add_proprieta_many(
+        self, proprieta: Iterable[Proprieta], dimensione_blocco: int = DIMENSIONE_BLOCCO
+    ) -> RisultatoCaricamento:
+        """Inserisce molte proprietà in un'unica transazione.
+        
+        Vedi add_agenzie per il significato dei parametri e del valore restituito.
+        """
+        righe = map(_valori_proprieta, proprieta)
+        return self._inserisci_a_blocchi(_INSERT_PROPRIETA, righe, dimensione_blocco)
+    
+    def _inserisci_a_blocchi(
+        self, sql: str, righe: Iterable[tuple], dimensione_blocco: int
+    ) -> RisultatoCaricamento:
+        """Esegue `sql` con executemany un blocco alla volta, in una sola transazione.
+        
+        Ogni blocco gira in una transazione annidata (SAVEPOINT): se viola un
+        vincolo (PK duplicata, FK inesistente) viene annullato e registrato in
+        `errori`, mentre i blocchi successivi proseguono. Qualsiasi altro errore
+        annulla l'intero caricamento. Se è già aperta una transazione, il
+        caricamento ne entra a far parte.
+        """
+        risultato = RisultatoCaricamento()
+        with self.transaction():
+            self._svuota_cache()
+            for indice, blocco in enumerate(_blocchi(righe, dimensione_blocco)):
+                try:
+                    with self.transaction():
+                        self.conn.executemany(sql, blocco)
+                except sqlite3.IntegrityError as exc:
+                    risultato.scartati += len(blocco)
+                    risultato.errori.append(ErroreBlocco(indice, len(blocco), str(exc)))
+                else:
+                    risultato.inseriti += len(blocco)
+        return risultato
+    
+    @contextmanager
+    def transaction(self) -> Iterator["GestoreImmobiliare"]:
+        """Apre una transazione esplicita (unit of work).
+        
+        Le scritture eseguite nel blocco (add_*, aggiorna_stato_proprieta, ...)
+        non vengono confermate singolarmente ma entrano nella transazione, che
+        viene confermata all'uscita dal blocco oppure annullata se il blocco
+        solleva un'eccezione. Le transazioni annidate diventano SAVEPOINT: un
+        errore al loro interno annulla solo il blocco annidato.
+        
+        Esempio
+        -------
+        with gestore.transaction():
+            gestore.add_agenzia(agenzia)
+            gestore.add_agente(agente)
+        """
+        with self._lock_scrittura:
+            if self._profondita_transazione == 0:
+                savepoint = None
+                self.conn.execute("BEGIN")
+                self._thread_transazione = threading.get_ident()
+            else:
+                savepoint = f"sp_{self._profondita_transazione}"
+                self.conn.execute(f"SAVEPOINT {savepoint}")
+            self._profondita_transazione += 1
+            try:
+                yield self
+            except BaseException:
+                self._profondita_transazione -= 1
+                if self._cache is not None:
+                    # La cache può contenere letture di dati che stanno per essere annullati.
+                    self._cache.svuota()
+                if savepoint is None:
+                    self._thread_transazione = None
+                    self._invalidazioni_in_sospeso = set()
+                    self.conn.rollback()
+                else:
+                    self.conn.execute(f"ROLLBACK TO {savepoint}")
+                    self.conn.execute(f"RELEASE {savepoint}")
+                raise
+            self._profondita_transazione -= 1
+            if savepoint is not None:
+                self.conn.execute(f"RELEASE {savepoint}")
+                return
+            self._thread_transazione = None
+            in_sospeso, self._invalidazioni_in_sospeso = self._invalidazioni_in_sospeso, set()
+            try:
+                self.conn.commit()
+            except BaseException:
+                if self._cache is not None:
+                    self._cache.svuota()
+                self.conn.rollback()
+                raise
+            if self._cache is not None:
+                # Durante la transazione altri thread leggono dal pool i dati
+                # precedenti e possono averli rimessi in cache: si invalida di nuovo.
+                if in_sospeso is None:
+                    self._cache.svuota()
+                elif in_sospeso:
+                    self._cache.invalida(*in_sospeso)
+    
+    def __enter__(self) -> "GestoreImmobiliare":
+        """Equivale a `with gestore.transaction():`."""
+        contesto = self.transaction()
+        contesto.__enter__()
+        self._contesti.append(contesto)
+        return self
+    
+    def __exit__(self, tipo, valore, traceback) -> Optional[bool]:
+        return self._contesti.pop().__exit__(tipo, valore, traceback)
+    
+    @contextmanager
+    def _scrittura(self) -> Iterator[None]:
+        """Esegue una scrittura nella transazione aperta, o in una nuova se non ce n'è una.
+        
+        Il lock di scrittura garantisce che un altro thread non entri nella
+        transazione aperta da questo: attende che venga confermata o annullata.
+        """
+        with self._lock_scrittura:
+            if self._profondita_transazione:
+                yield
+            else:
+                with self.transaction():
+                    yield
+    
+    @contextmanager
+    def _lettura(self) -> Iterator[sqlite3.Connection]:
+        """Restituisce la connessione su cui eseguire una lettura.
+        
+        Senza pool è sempre self.conn. Con il pool è una connessione di lettura
+        presa in prestito, tranne per il thread che ha una transazione aperta,
+        che deve vedere le proprie scritture non ancora confermate.
+        """
+        if self._pool is None or self._thread_transazione == threading.get_ident():
+            yield self.conn
+        else:
+            with self._pool.connessione() as conn:
+                yield conn
+    
+    def statistiche_pool(self) -> Optional[StatistichePool]:
+        """Restituisce le metriche del pool di connessioni di lettura.
+        
+        Ritorno
+        -------
+        StatistichePool | None
+            None se il gestore è stato creato senza pool.
+        """
+        return self._pool.statistiche() if self._pool is not None else None
+    
+    def _da_cache(self, chiave: tuple, calcola: Callable):
+        """Restituisce il risultato di `calcola()`, passando dalla cache se attiva.
+        
+        Dalla cache escono copie della lista o del dizionario e delle entità
+        contenute: il chiamante può modificarle senza alterare le letture successive.
+        """
+        if self._cache is None or self._thread_transazione == threading.get_ident():
+            # Chi ha una transazione aperta vede dati non confermati: né letti né scritti in cache.
+            return calcola()
+        valore = self._cache.leggi(chiave)
+        if valore is _MANCANTE:
+            # Se nel frattempo una scrittura invalida la cache, il valore non viene memorizzato.
+            versione = self._cache.versione
+            valore = calcola()
+            self._cache.scrivi(chiave, valore, versione)
+        return _copia_entita(valore)
+    
+    def _invalida(self, *chiavi: tuple) -> None:
+        """Invalida le chiavi subito e, dentro una transazione, di nuovo dopo il COMMIT."""
+        if self._cache is not None:
+            with self._lock_scrittura:
+                self._cache.invalida(*chiavi)
+                if self._profondita_transazione and self._invalidazioni_in_sospeso is not None:
+                    self._invalidazioni_in_sospeso.update(chiavi)
+    
+    def _svuota_cache(self) -> None:
+        """Come _invalida, per tutta la cache."""
+        if self._cache is not None:
+            with self._lock_scrittura:
+                self._cache.svuota()
+                if self._profondita_transazione:
+                    self._invalidazioni_in_sospeso = None
+    
+    def _agenzia_di(self, id_agente: int) -> Optional[int]:
+        with self._lettura() as conn:
+            riga = conn.execute(
+                "SELECT id_agenzia FROM agenti WHERE id_agente = ?", (id_agente,)
+            ).fetchone()
+        return riga[0] if riga is not None else None
+    
+    def statistiche_cache(self) -> Optional[StatisticheCache]:
+        """Restituisce i contatori della cache (hit, miss, espulsioni, ...).
+        
+        Ritorno
+        -------
+        StatisticheCache | None
+            None se il gestore è stato creato senza cache.
+        """
+        return self._cache.statistiche() if self._cache is not None else None
+    
+    def stats(self, azzera: bool = False) -> Optional[StatisticheStrumentazione]:
+        """Restituisce un'istantanea della strumentazione.
+        
+        Parametri
+        ---------
+        azzera : bool
+            Se True, dopo la lettura riparte da zero con contatori e log delle
+            query lente (i piani già catturati restano)
+            
+        Ritorno
+        -------
+        StatisticheStrumentazione | None
+            Statistiche per metodo e per statement e query lente; None se il
+            gestore è stato creato senza strumentazione.
+        """
+        return (
+            self._strumentazione.istantanea(azzera) if self._strumentazione is not None else None
+        )
+    
+    def get_proprieta_per_agente(self, id_agente: int) -> list[Proprieta]:
+        """Restituisce tutte le proprietà gestite da un agente specifico.
+        
+        Parametri
+        ---------
+        id_agente : int
+            L'ID dell'agente
+            
+        Ritorno
+        -------
+        list[Proprieta]
+            Lista di oggetti Proprieta gestiti dall'agente.
+            Lista vuota se l'agente non esiste o non ha proprietà.
+        """
+        def calcola():
+            with self._lettura() as conn:
+                return _esegui_mappato(
+                    conn, _SELECT_PROPRIETA_PER_AGENTE, (id_agente,), self._righe_proprieta
+                ).fetchall()
+        
+        return self._da_cache(("proprieta_per_agente", id_agente), calcola)
+    
+    def get_agenti_per_agenzia(self, id_agenzia: int) -> list[Agente]:
+        """Restituisce tutti gli agenti che lavorano per un'agenzia specifica.
+        
+        Parametri
+        ---------
+        id_agenzia : int
+            L'ID dell'agenzia
+            
+        Ritorno
+        -------
+        list[Agente]
+            Lista di oggetti Agente che lavorano per l'agenzia.
+            Lista vuota se l'agenzia non esiste o non ha agenti.
+        """
+        def calcola():
+            with self._lettura() as conn:
+                return _esegui_mappato(
+                    conn, _SELECT_AGENTI_PER_AGENZIA, (id_agenzia,), self._righe_agente
+                ).fetchall()
+        
+        return self._da_cache(("agenti_per_agenzia", id_agenzia), calcola)
+    
+    def get_proprieta_per_agenzia(self, id_agenzia: int) -> list[Proprieta]:
+        """Restituisce tutte le proprietà gestite da un'intera agenzia.
+        
+        Questa query richiede un JOIN tra le tabelle proprieta e agenti.
+        
+        Parametri
+        ---------
+        id_agenzia : int
+            L'ID dell'agenzia
+            
+        Ritorno
+        -------
+        list[Proprieta]
+            Lista di oggetti Proprieta gestiti dall'agenzia (attraverso i suoi agenti).
+            Lista vuota se l'agenzia non esiste o non ha proprietà.
+        """
+        def calcola():
+            with self._lettura() as conn:
+                return _esegui_mappato(
+                    conn, _SELECT_PROPRIETA_PER_AGENZIA, (id_agenzia,), self._righe_proprieta
+                ).fetchall()
+        
+        return self._da_cache(("proprieta_per_agenzia", id_agenzia), calcola)
+    
+    def get_proprieta_per_agenti(self, ids_agenti: Iterable[int]) -> dict[int, list[Proprieta]]:
+        """Restituisce le proprietà di più agenti insieme, senza una query per agente.
+        
+        Parametri
+        ---------
+        ids_agenti : Iterable[int]
+            Gli ID degli agenti
+            
+        Ritorno
+        -------
+        dict[int, list[Proprieta]]
+            Per ogni ID richiesto (nell'ordine dato, senza ripetizioni) la lista
+            che restituirebbe get_proprieta_per_agente, eventualmente vuota.
+        """
+        return self._raggruppa_per_id(
+            "proprieta_per_agente", ids_agenti, _SELECT_PROPRIETA_PER_AGENTI,
+            self._righe_proprieta, lambda proprieta: proprieta.id_agente,
+        )
+    
+    def get_agenti_per_agenzie(self, ids_agenzie: Iterable[int]) -> dict[int, list[Agente]]:
+        """Restituisce gli agenti di più agenzie insieme, senza una query per agenzia.
+        
+        Vedi get_proprieta_per_agenti; i valori sono le liste che restituirebbe
+        get_agenti_per_agenzia.
+        """
+        return self._raggruppa_per_id(
+            "agenti_per_agenzia", ids_agenzie, _SELECT_AGENTI_PER_AGENZIE,
+            self._righe_agente, lambda agente: agente.id_agenzia,
+        )
     
-    Questa classe fornisce metodi per:
-    - Creare e gestire la struttura del database
-    - Inserire nuove entità (agenzie, agenti, proprietà)
-    - Eseguire query complesse con JOIN tra tabelle
-    - Aggiornare lo stato delle proprietà
-    - Trovare statistiche sugli agenti
+    def cerca_proprieta(
+        self,
+        testo: str,
+        limit: int = 20,
+        *,
+        stato: Optional[str] = None,
+        prezzo_min: Optional[float] = None,
+        prezzo_max: Optional[float] = None,
+        id_agente: Optional[int] = None,
+        id_agenzia: Optional[int] = None,
+    ) -> list[Proprieta]:
+        """Cerca le proprietà per indirizzo, dalla più pertinente.
+        
+        Richiede un gestore creato con ricerca_indirizzi=True.
+        
+        Parametri
+        ---------
+        testo : str
+            Il testo cercato; ogni parola può essere l'inizio di una parola
+            dell'indirizzo (es. "via gari" trova "Via Garibaldi 10"). Maiuscole
+            e accenti non contano.
+        limit : int
+            Numero massimo di risultati
+        stato, prezzo_min, prezzo_max, id_agente, id_agenzia
+            Filtri opzionali, come in get_pagina_proprieta
+            
+        Ritorno
+        -------
+        list[Proprieta]
+            Le proprietà che contengono tutte le parole, ordinate per
+            pertinenza (bm25). Lista vuota se il testo non contiene parole.
+        """
+        self._verifica_ricerca_indirizzi()
+        query = _query_fts(testo)
+        if not query:
+            return []
+        sorgente, condizioni, parametri = _filtri_proprieta(
+            stato, prezzo_min, prezzo_max, id_agente, id_agenzia
+        )
+        sorgente = (
+            "FROM indirizzi_proprieta f JOIN proprieta p ON p.id_proprieta = f.rowid"
+            + sorgente.removeprefix("FROM proprieta p")
+        )
+        where = " AND ".join(["indirizzi_proprieta MATCH ?", *condizioni])
+        with self._lettura() as conn:
+            return _esegui_mappato(
+                conn,
+                f"SELECT {_SELECT_COLONNE_P} "
+                f"{sorgente} WHERE {where} ORDER BY f.rank LIMIT ?",
+                (query, *parametri, limit),
+                self._righe_proprieta,
+            ).fetchall()
     
-    Parametri
-    ----------
-    db_path : str
-        Il percorso del file di database SQLite (es. "real_estate.db")
-    """
+    def cerca_agenzie(self, testo: str, limit: int = 20) -> list[Agenzia]:
+        """Cerca le agenzie per indirizzo, dalla più pertinente.
+        
+        Vedi cerca_proprieta per il significato di `testo` e `limit`.
+        """
+        self._verifica_ricerca_indirizzi()
+        query = _query_fts(testo)
+        if not query:
+            return []
+        with self._lettura() as conn:
+            return _esegui_mappato(
+                conn,
+                "SELECT g.id_agenzia, g.nome, g.indirizzo "
+                "FROM indirizzi_agenzie f JOIN agenzie g ON g.id_agenzia = f.rowid "
+                "WHERE indirizzi_agenzie MATCH ? ORDER BY f.rank LIMIT ?",
+                (query, limit),
+                _fabbrica_righe(Agenzia),
+            ).fetchall()
     
-    def __init__(self, db_path: str):
-        """Inizializza il gestore e crea le tabelle se non esistono.
+    def _verifica_ricerca_indirizzi(self) -> None:
+        if not self.ricerca_indirizzi:
+            raise RuntimeError("La ricerca per indirizzo richiede ricerca_indirizzi=True")
+    
+    def get_proprieta_in_area(
+        self,
+        lat_min: float,
+        lat_max: float,
+        lon_min: float,
+        lon_max: float,
+        *,
+        stato: Optional[str] = None,
+        prezzo_min: Optional[float] = None,
+        prezzo_max: Optional[float] = None,
+        id_agente: Optional[int] = None,
+        id_agenzia: Optional[int] = None,
+    ) -> list[Proprieta]:
+        """Restituisce le proprietà con coordinate dentro un rettangolo.
         
         Parametri
         ---------
-        db_path : str
-            Percorso al file database SQLite
+        lat_min, lat_max, lon_min, lon_max : float
+            Limiti del rettangolo in gradi, inclusi. Se lon_min > lon_max il
+            rettangolo attraversa l'antimeridiano (es. da 170 a -170).
+        stato, prezzo_min, prezzo_max, id_agente, id_agenzia
+            Filtri opzionali, come in get_pagina_proprieta
+            
+        Ritorno
+        -------
+        list[Proprieta]
+            Le proprietà trovate, in nessun ordine particolare. Quelle senza
+            coordinate non compaiono mai.
             
         Comportamento
         -------------
-        - Crea una connessione al database
-        - Crea le tabelle agenzie, agenti e proprieta se non esistono
-        - Definisce chiavi primarie e chiavi esterne per l'integrità referenziale
+        Con indice_geografico=True i candidati vengono dall'R*Tree; altrimenti
+        la tabella proprieta viene scandita per intero.
         """
-        # Placeholder: implementare la connessione e creazione tabelle
-        pass
+        if lon_min <= lon_max:
+            riquadri = [(lat_min, lat_max, lon_min, lon_max)]
+        else:
+            riquadri = [(lat_min, lat_max, lon_min, 180.0), (lat_min, lat_max, -180.0, lon_max)]
+        return self._proprieta_nei_riquadri(
+            riquadri, stato, prezzo_min, prezzo_max, id_agente, id_agenzia
+        )
     
-    def add_agenzia(self, agenzia: Agenzia) -> None:
-        """Aggiunge una nuova agenzia al database.
+    def get_proprieta_nel_raggio(
+        self,
+        latitudine: float,
+        longitudine: float,
+        raggio_km: float,
+        *,
+        limit: Optional[int] = None,
+        stato: Optional[str] = None,
+        prezzo_min: Optional[float] = None,
+        prezzo_max: Optional[float] = None,
+        id_agente: Optional[int] = None,
+        id_agenzia: Optional[int] = None,
+    ) -> list[tuple[Proprieta, float]]:
+        """Restituisce le proprietà entro `raggio_km` da un punto, dalla più vicina.
         
         Parametri
         ---------
-        agenzia : Agenzia
-            L'oggetto Agenzia da inserire nel database
+        latitudine, longitudine : float
+            Il centro, in gradi
+        raggio_km : float
+            Il raggio in chilometri
+        limit : int | None
+            Numero massimo di risultati (i più vicini)
+        stato, prezzo_min, prezzo_max, id_agente, id_agenzia
+            Filtri opzionali, come in get_pagina_proprieta
+            
+        Ritorno
+        -------
+        list[tuple[Proprieta, float]]
+            Coppie (proprietà, distanza in km) ordinate per distanza.
             
         Comportamento
         -------------
-        Inserisce i dati dell'agenzia nella tabella agenzie.
+        Il database restituisce le proprietà nel rettangolo che contiene il
+        cerchio (vedi get_proprieta_in_area); la distanza esatta sulla sfera
+        è poi calcolata in Python solo per questi candidati.
         """
-        # Placeholder: implementare l'inserimento
-        pass
+        if raggio_km < 0:
+            raise ValueError("raggio_km non può essere negativo")
+        candidate = self._proprieta_nei_riquadri(
+            _riquadri_raggio(latitudine, longitudine, raggio_km),
+            stato, prezzo_min, prezzo_max, id_agente, id_agenzia,
+        )
+        vicine = []
+        for proprieta in candidate:
+            distanza = _distanza_km(
+                latitudine, longitudine, proprieta.latitudine, proprieta.longitudine
+            )
+            if distanza <= raggio_km:
+                vicine.append((proprieta, distanza))
+        vicine.sort(key=lambda coppia: coppia[1])
+        return vicine[:limit]
     
-    def add_agente(self, agente: Agente) -> None:
-        """Aggiunge un nuovo agente al database.
+    def _proprieta_nei_riquadri(
+        self,
+        riquadri: list[tuple],
+        stato: Optional[str],
+        prezzo_min: Optional[float],
+        prezzo_max: Optional[float],
+        id_agente: Optional[int],
+        id_agenzia: Optional[int],
+    ) -> list[Proprieta]:
+        """Proprietà dentro uno qualsiasi dei rettangoli (lat_min, lat_max, lon_min, lon_max)."""
+        sorgente, condizioni, parametri = _filtri_proprieta(
+            stato, prezzo_min, prezzo_max, id_agente, id_agenzia
+        )
+        condizioni = [
+            "p.latitudine BETWEEN ? AND ?", "p.longitudine BETWEEN ? AND ?", *condizioni
+        ]
+        if self.indice_geografico:
+            # CROSS JOIN fissa l'ordine: si parte dall'R*Tree anche quando il
+            # pianificatore preferirebbe l'indice su stato e scandirebbe tutto lo stato.
+            sorgente = (
+                "FROM posizioni_proprieta r "
+                "CROSS JOIN proprieta p ON p.id_proprieta = r.id_proprieta"
+                + sorgente.removeprefix("FROM proprieta p")
+            )
+            condizioni = [
+                "r.max_lat >= ? AND r.min_lat <= ?", "r.max_lon >= ? AND r.min_lon <= ?",
+                *condizioni,
+            ]
+        sql = f"SELECT {_SELECT_COLONNE_P} {sorgente} WHERE {' AND '.join(condizioni)}"
+        trovate = []
+        with self._lettura() as conn:
+            for lat_min, lat_max, lon_min, lon_max in riquadri:
+                limiti = (lat_min, lat_max, lon_min, lon_max)
+                if self.indice_geografico:
+                    limiti *= 2
+                trovate += _esegui_mappato(
+                    conn, sql, (*limiti, *parametri), self._righe_proprieta
+                ).fetchall()
+        return trovate
+    
+    def get_agenzia_completa(self, id_agenzia: int) -> Optional[AgenziaCompleta]:
+        """Restituisce un'agenzia con tutti i suoi agenti e le loro proprietà.
         
         Parametri
         ---------
-        agente : Agente
-            L'oggetto Agente da inserire nel database
+        id_agenzia : int
+            L'ID dell'agenzia
+            
+        Ritorno
+        -------
+        AgenziaCompleta | None
+            None se l'agenzia non esiste.
             
         Comportamento
         -------------
-        Inserisce i dati dell'agente nella tabella agenti.
-        La chiave esterna id_agenzia deve riferirsi a un'agenzia esistente.
+        Esegue tre query (agenzia, agenti, proprietà) sulla stessa istantanea
+        del database e collega i risultati in memoria.
         """
-        # Placeholder: implementare l'inserimento
-        pass
+        return self.get_agenzie_complete([id_agenzia]).get(id_agenzia)
     
-    def add_proprieta(self, proprieta: Proprieta) -> None:
-        """Aggiunge una nuova proprietà al database.
+    def get_agenzie_complete(
+        self, ids_agenzie: Optional[Iterable[int]] = None
+    ) -> dict[int, AgenziaCompleta]:
+        """Come get_agenzia_completa, per più agenzie o per tutte.
         
         Parametri
         ---------
-        proprieta : Proprieta
-            L'oggetto Proprieta da inserire nel database
+        ids_agenzie : Iterable[int] | None
+            Le agenzie da leggere; None per tutte
+            
+        Ritorno
+        -------
+        dict[int, AgenziaCompleta]
+            id_agenzia → agenzia completa, in ordine di id_agenzia; gli ID
+            inesistenti non compaiono.
             
         Comportamento
         -------------
-        Inserisce i dati della proprietà nella tabella proprieta.
-        La chiave esterna id_agente deve riferirsi a un agente esistente.
+        Tre query in tutto se ids_agenzie è None, altrimenti tre per ogni
+        blocco di MASSIMO_PARAMETRI_SQL agenzie.
         """
-        # Placeholder: implementare l'inserimento
-        pass
+        if ids_agenzie is None:
+            blocchi: Iterable[list] = [[]]
+        else:
+            blocchi = _blocchi(dict.fromkeys(ids_agenzie), MASSIMO_PARAMETRI_SQL)
+        righe_agenzia = _fabbrica_righe(Agenzia)
+        complete: dict[int, AgenziaCompleta] = {}
+        with self._lettura_coerente() as conn:
+            for blocco in blocchi:
+                segnaposti = ", ".join("?" * len(blocco))
+                sql_agenzie, sql_agenti, sql_proprieta = (
+                    sql.format(
+                        filtro=f" WHERE {tabella}.id_agenzia IN ({segnaposti})"
+                        if ids_agenzie is not None else ""
+                    )
+                    for sql, tabella in zip(_SELECT_AGENZIE_COMPLETE, ("agenzie", "agenti", "a"))
+                )
+                for agenzia in _esegui_mappato(conn, sql_agenzie, blocco, righe_agenzia):
+                    complete[agenzia.id_agenzia] = AgenziaCompleta(agenzia)
+                proprieta_per_agente: dict[int, list] = {}
+                for agente in _esegui_mappato(conn, sql_agenti, blocco, self._righe_agente):
+                    completa = complete.get(agente.id_agenzia)
+                    if completa is not None:
+                        lista: list = []
+                        completa.agenti[agente.id_agente] = agente
+                        completa.proprieta[agente.id_agente] = lista
+                        proprieta_per_agente[agente.id_agente] = lista
+                for proprieta in _esegui_mappato(conn, sql_proprieta, blocco, self._righe_proprieta):
+                    if proprieta.id_agente in proprieta_per_agente:
+                        proprieta_per_agente[proprieta.id_agente].append(proprieta)
+        if ids_agenzie is not None:
+            complete = dict(sorted(complete.items()))
+        return complete
     
-    def get_proprieta_per_agente(self, id_agente: int) -> list[Proprieta]:
-        """Restituisce tutte le proprietà gestite da un agente specifico.
+    @contextmanager
+    def _lettura_coerente(self) -> Iterator[sqlite3.Connection]:
+        """Come _lettura, ma tutte le query nel blocco vedono la stessa istantanea.
+        
+        Se la connessione non è già in una transazione ne apre una di sola
+        lettura, così una scrittura confermata tra una query e l'altra non
+        produce risultati incoerenti.
+        """
+        with self._lettura() as conn:
+            if conn.in_transaction:
+                yield conn
+                return
+            conn.execute("BEGIN")
+            try:
+                yield conn
+            finally:
+                conn.commit()
+    
+    def _raggruppa_per_id(
+        self,
+        nome_cache: str,
+        ids: Iterable[int],
+        sql: str,
+        fabbrica: Callable,
+        id_di: Callable,
+    ) -> dict[int, list]:
+        """Esegue `sql` con liste IN di al più MASSIMO_PARAMETRI_SQL ID e raggruppa le righe.
+        
+        Con la cache attiva gli ID già presenti (con le stesse chiavi dei metodi
+        per singolo ID) non vengono interrogati e i risultati letti la popolano.
+        """
+        risultato: dict[int, list] = {id_: [] for id_ in ids}
+        mancanti = list(risultato)
+        usa_cache = self._cache is not None and self._thread_transazione != threading.get_ident()
+        if usa_cache:
+            versione = self._cache.versione
+            mancanti = []
+            for id_ in risultato:
+                valore = self._cache.leggi((nome_cache, id_))
+                if valore is _MANCANTE:
+                    mancanti.append(id_)
+                else:
+                    risultato[id_] = _copia_entita(valore)
+        if mancanti:
+            with self._lettura() as conn:
+                for blocco in _blocchi(mancanti, MASSIMO_PARAMETRI_SQL):
+                    cursor = _esegui_mappato(
+                        conn, sql.format(segnaposti=", ".join("?" * len(blocco))), blocco, fabbrica
+                    )
+                    for entita in cursor:
+                        risultato[id_di(entita)].append(entita)
+            if usa_cache:
+                for id_ in mancanti:
+                    self._cache.scrivi((nome_cache, id_), _copia_entita(risultato[id_]), versione)
+        return risultato
+    
+    def iter_proprieta_per_agente(
+        self, id_agente: int, dimensione_batch: int = DIMENSIONE_BATCH_LETTURA
+    ) -> Iterator[Proprieta]:
+        """Come get_proprieta_per_agente, ma restituisce un generatore.
         
         Parametri
         ---------
         id_agente : int
             L'ID dell'agente
+        dimensione_batch : int
+            Numero di righe lette dal cursore a ogni fetchmany
             
         Ritorno
         -------
-        list[Proprieta]
-            Lista di oggetti Proprieta gestiti dall'agente.
-            Lista vuota se l'agente non esiste o non ha proprietà.
+        Iterator[Proprieta]
+            Le proprietà vengono lette a gruppi di `dimensione_batch`, quindi la
+            memoria occupata non dipende dal numero di risultati. Interrompere
+            l'iterazione (o chiudere il generatore) libera subito il cursore.
         """
-        # Placeholder: implementare la query
-        return []
+        return self._itera(
+            _SELECT_PROPRIETA_PER_AGENTE, (id_agente,), self._righe_proprieta, dimensione_batch
+        )
     
-    def get_agenti_per_agenzia(self, id_agenzia: int) -> list[Agente]:
-        """Restituisce tutti gli agenti che lavorano per un'agenzia specifica.
+    def iter_agenti_per_agenzia(
+        self, id_agenzia: int, dimensione_batch: int = DIMENSIONE_BATCH_LETTURA
+    ) -> Iterator[Agente]:
+        """Come get_agenti_per_agenzia, ma restituisce un generatore.
+        
+        Vedi iter_proprieta_per_agente per il significato di `dimensione_batch`.
+        """
+        return self._itera(
+            _SELECT_AGENTI_PER_AGENZIA, (id_agenzia,), self._righe_agente, dimensione_batch
+        )
+    
+    def iter_proprieta_per_agenzia(
+        self, id_agenzia: int, dimensione_batch: int = DIMENSIONE_BATCH_LETTURA
+    ) -> Iterator[Proprieta]:
+        """Come get_proprieta_per_agenzia, ma restituisce un generatore.
+        
+        Vedi iter_proprieta_per_agente per il significato di `dimensione_batch`.
+        """
+        return self._itera(
+            _SELECT_PROPRIETA_PER_AGENZIA, (id_agenzia,), self._righe_proprieta, dimensione_batch
+        )
+    
+    def _itera(
+        self, sql: str, parametri: tuple, fabbrica: Callable, dimensione_batch: int
+    ) -> Iterator:
+        """Esegue `sql` su un cursore dedicato e produce le entità create da `fabbrica`."""
+        if dimensione_batch < 1:
+            raise ValueError("dimensione_batch deve essere positiva")
+        
+        def generatore():
+            with self._lettura() as conn:
+                cursor = conn.cursor()
+                cursor.row_factory = fabbrica
+                try:
+                    cursor.execute(sql, parametri)
+                    while righe := cursor.fetchmany(dimensione_batch):
+                        yield from righe
+                finally:
+                    cursor.close()
+        
+        return generatore()
+    
+    def get_portafoglio_al(
+        self, id_agenzia: int, istante: Union[datetime, date, str]
+    ) -> list[Proprieta]:
+        """Restituisce le proprietà dell'agenzia com'erano a un certo istante.
+        
+        Richiede un gestore creato con storico_proprieta=True.
         
         Parametri
         ---------
         id_agenzia : int
             L'ID dell'agenzia
+        istante : datetime | date | str
+            Il momento di interesse; una data (anche come stringa "AAAA-MM-GG")
+            indica la fine del giorno, le datetime senza fuso orario sono in UTC
             
         Ritorno
         -------
-        list[Agente]
-            Lista di oggetti Agente che lavorano per l'agenzia.
-            Lista vuota se l'agenzia non esiste o non ha agenti.
+        list[Proprieta]
+            Le proprietà che esistevano all'istante e appartenevano a un agente
+            dell'agenzia, con prezzo, stato e agente di quel momento, in ordine
+            di id_proprieta. Indirizzo e coordinate sono quelli attuali; per le
+            proprietà cancellate l'indirizzo è quello al momento della
+            cancellazione e le coordinate sono None, perché lo storico non le registra.
+            
+        Comportamento
+        -------------
+        Non scandisce lo storico: le proprietà candidate sono quelle attuali
+        degli agenti dell'agenzia più quelle che da allora hanno lasciato uno di
+        questi agenti (indice parziale idx_storico_agenti); per ciascuna il
+        valore di ogni campo è una ricerca su idx_storico_proprieta. Le proprietà
+        inserite prima dell'attivazione dello storico sono considerate
+        presenti da sempre; l'appartenenza degli agenti alle agenzie è quella attuale.
         """
-        # Placeholder: implementare la query
-        return []
+        self._verifica_storico()
+        
+        def valore(campo: str) -> str:
+            successive = (
+                "FROM storico_proprieta s WHERE s.id_proprieta = c.id_proprieta "
+                f"AND s.campo = '{campo}' AND s.istante > :istante"
+            )
+            return (
+                f"CASE WHEN EXISTS (SELECT 1 {successive}) "
+                f"THEN (SELECT s.valore_precedente {successive} ORDER BY s.istante, s.seq LIMIT 1) "
+                f"ELSE p.{campo} END AS {campo}"
+            )
+        
+        sql = (
+            "WITH agenti_agenzia AS (SELECT id_agente FROM agenti WHERE id_agenzia = :agenzia), "
+            "candidate AS ("
+            "    SELECT id_proprieta FROM proprieta WHERE id_agente IN agenti_agenzia "
+            "    UNION "
+            "    SELECT id_proprieta FROM storico_proprieta WHERE campo = 'id_agente' "
+            "    AND valore_precedente IN agenti_agenzia AND istante > :istante"
+            "), "
+            "al_momento AS ("
+            f"    SELECT c.id_proprieta, {valore('indirizzo')}, {valore('prezzo')}, "
+            f"           {valore('stato')}, {valore('id_agente')}, p.latitudine, p.longitudine "
+            "    FROM candidate c LEFT JOIN proprieta p ON p.id_proprieta = c.id_proprieta"
+            ") "
+            f"SELECT {_SELECT_COLONNE_PROPRIETA} FROM al_momento "
+            "WHERE stato IS NOT NULL AND id_agente IN agenti_agenzia ORDER BY id_proprieta"
+        )
+        with self._lettura() as conn:
+            return _esegui_mappato(
+                conn, sql, {"agenzia": id_agenzia, "istante": _istante(istante)},
+                self._righe_proprieta,
+            ).fetchall()
     
-    def get_proprieta_per_agenzia(self, id_agenzia: int) -> list[Proprieta]:
-        """Restituisce tutte le proprietà gestite da un'intera agenzia.
+    def get_tempi_sul_mercato(
+        self,
+        *,
+        stato_mercato: str = "In vendita",
+        stato: Optional[str] = None,
+        id_agente: Optional[int] = None,
+        id_agenzia: Optional[int] = None,
+        al: Union[datetime, date, str, None] = None,
+    ) -> dict[int, float]:
+        """Restituisce per quanti giorni ogni proprietà è rimasta nello stato `stato_mercato`.
         
-        Questa query richiede un JOIN tra le tabelle proprieta e agenti.
+        Richiede un gestore creato con storico_proprieta=True.
         
         Parametri
         ---------
-        id_agenzia : int
-            L'ID dell'agenzia
+        stato_mercato : str
+            Lo stato che indica "sul mercato"
+        stato, id_agente, id_agenzia
+            Filtri opzionali sulle proprietà attuali
+        al : datetime | date | str | None
+            Fine del periodo per le proprietà ancora sul mercato; per default adesso
             
         Ritorno
         -------
-        list[Proprieta]
-            Lista di oggetti Proprieta gestiti dall'agenzia (attraverso i suoi agenti).
-            Lista vuota se l'agenzia non esiste o non ha proprietà.
+        dict[int, float]
+            id_proprieta → giorni (con decimali) trascorsi in `stato_mercato`,
+            sommando tutti i periodi se la proprietà vi è tornata più volte.
+            Sono incluse solo le proprietà con almeno un periodo di inizio noto.
+            
+        Comportamento
+        -------------
+        Una funzione finestra (LEAD) accoppia ogni variazione di stato con la
+        successiva; con un filtro vengono lette solo le righe dello storico
+        delle proprietà selezionate, tramite idx_storico_proprieta.
         """
-        # Placeholder: implementare la query con JOIN
-        return []
+        self._verifica_storico()
+        sorgente, condizioni, parametri = _filtri_proprieta(
+            stato, id_agente=id_agente, id_agenzia=id_agenzia
+        )
+        selezione = ""
+        if condizioni:
+            selezione = (
+                f" AND s.id_proprieta IN (SELECT p.id_proprieta {sorgente} "
+                f"WHERE {' AND '.join(condizioni)})"
+            )
+        fine = _istante(al) if al is not None else _istante(datetime.now(timezone.utc))
+        sql = (
+            "SELECT id_proprieta, SUM(julianday(COALESCE(fine, ?)) - julianday(istante)) FROM ("
+            "    SELECT s.id_proprieta, s.istante, s.valore_nuovo, "
+            "           LEAD(s.istante) OVER ("
+            "               PARTITION BY s.id_proprieta ORDER BY s.istante, s.seq) AS fine "
+            f"    FROM storico_proprieta s WHERE s.campo = 'stato'{selezione}"
+            ") WHERE valore_nuovo = ? GROUP BY id_proprieta"
+        )
+        with self._lettura() as conn:
+            return dict(conn.execute(sql, (fine, *parametri, stato_mercato)))
+    
+    def _verifica_storico(self) -> None:
+        if not self.storico_proprieta:
+            raise RuntimeError("Lo storico delle proprietà richiede storico_proprieta=True")
+    
+    def changes_since(
+        self,
+        seq: int = 0,
+        limit: Optional[int] = None,
+        dimensione_batch: int = DIMENSIONE_BATCH_LETTURA,
+    ) -> Iterator[Modifica]:
+        """Restituisce, in ordine, le modifiche registrate dopo il numero di sequenza `seq`.
+        
+        Richiede un gestore creato con registro_modifiche=True.
+        
+        Esempio
+        -------
+        ultima = gestore.ultima_modifica()
+        while True:
+            for modifica in gestore.changes_since(ultima, limit=1000):
+                invalida(modifica.tabella, modifica.chiave)
+                ultima = modifica.seq
+            time.sleep(1)
+        
+        Parametri
+        ---------
+        seq : int
+            L'ultimo numero di sequenza già elaborato (0 per partire dall'inizio)
+        limit : int | None
+            Numero massimo di modifiche da restituire
+        dimensione_batch : int
+            Numero di righe lette dal database alla volta
+            
+        Ritorno
+        -------
+        Iterator[Modifica]
+            Un generatore, come iter_proprieta_per_agente: le righe vengono lette
+            a gruppi, quindi anche un arretrato molto lungo usa memoria costante.
+        """
+        self._verifica_registro_modifiche()
+        return self._itera(
+            "SELECT seq, tabella, operazione, chiave, dati FROM modifiche "
+            "WHERE seq > ? ORDER BY seq LIMIT ?",
+            (seq, -1 if limit is None else limit),
+            _riga_modifica,
+            dimensione_batch,
+        )
+    
+    def ultima_modifica(self) -> int:
+        """Restituisce il numero di sequenza dell'ultima modifica registrata (0 se nessuna).
+        
+        Un consumatore che non ha bisogno dello storico parte da qui.
+        """
+        self._verifica_registro_modifiche()
+        with self._lettura() as conn:
+            return conn.execute("SELECT COALESCE(MAX(seq), 0) FROM modifiche").fetchone()[0]
+    
+    def pota_modifiche(self, fino_a_seq: int) -> int:
+        """Elimina dal log le modifiche con numero di sequenza minore o uguale a `fino_a_seq`.
+        
+        Da chiamare quando tutti i consumatori le hanno elaborate; i numeri di
+        sequenza successivi non cambiano.
+        
+        Ritorno
+        -------
+        int
+            Numero di modifiche eliminate.
+        """
+        self._verifica_registro_modifiche()
+        with self._scrittura():
+            return self.conn.execute(
+                "DELETE FROM modifiche WHERE seq <= ?", (fino_a_seq,)
+            ).rowcount
+    
+    def _verifica_registro_modifiche(self) -> None:
+        if not self.registro_modifiche:
+            raise RuntimeError("Il log delle modifiche richiede registro_modifiche=True")
+    
+    def get_pagina_proprieta(
+        self,
+        *,
+        stato: Optional[str] = None,
+        prezzo_min: Optional[float] = None,
+        prezzo_max: Optional[float] = None,
+        id_agente: Optional[int] = None,
+        id_agenzia: Optional[int] = None,
+        ordina_per: str = "prezzo",
+        decrescente: bool = False,
+        dimensione_pagina: int = 50,
+        cursore: Optional[str] = None,
+    ) -> PaginaProprieta:
+        """Restituisce una pagina di proprietà filtrate e ordinate dal database.
+        
+        La paginazione è per chiave (keyset): il cursore ricorda l'ultima riga
+        restituita e la pagina successiva riparte da lì con una condizione
+        sull'indice, senza OFFSET. Le pagine profonde costano quanto la prima.
+        
+        Parametri
+        ---------
+        stato, prezzo_min, prezzo_max, id_agente, id_agenzia
+            Filtri opzionali (i limiti di prezzo sono inclusi)
+        ordina_per : str
+            "prezzo" oppure "id_proprieta"
+        decrescente : bool
+            Ordina dal valore più alto al più basso
+        dimensione_pagina : int
+            Numero massimo di proprietà nella pagina
+        cursore : str | None
+            Il cursore restituito dalla pagina precedente; None per la prima
+            
+        Ritorno
+        -------
+        PaginaProprieta
+            Le proprietà della pagina e il cursore per quella successiva.
+        """
+        if ordina_per not in _ORDINAMENTI_PROPRIETA:
+            raise ValueError(
+                f"Ordinamento non supportato: {ordina_per!r} "
+                f"(ammessi: {', '.join(_ORDINAMENTI_PROPRIETA)})"
+            )
+        if dimensione_pagina < 1:
+            raise ValueError("dimensione_pagina deve essere positiva")
+        colonna = _ORDINAMENTI_PROPRIETA[ordina_per]
+        verso, confronto = ("DESC", "<") if decrescente else ("ASC", ">")
+        
+        sorgente, condizioni, parametri = _filtri_proprieta(
+            stato, prezzo_min, prezzo_max, id_agente, id_agenzia
+        )
+        if cursore is not None:
+            valore, ultimo_id = _decodifica_cursore(cursore, ordina_per, decrescente)
+            if colonna == "p.id_proprieta":
+                condizioni.append(f"p.id_proprieta {confronto} ?")
+                parametri.append(ultimo_id)
+            else:
+                condizioni.append(f"({colonna}, p.id_proprieta) {confronto} (?, ?)")
+                parametri.extend((valore, ultimo_id))
+        where = f" WHERE {' AND '.join(condizioni)}" if condizioni else ""
+        ordine = f"{colonna} {verso}"
+        if colonna != "p.id_proprieta":
+            ordine += f", p.id_proprieta {verso}"
+        
+        with self._lettura() as conn:
+            elementi = _esegui_mappato(
+                conn,
+                f"SELECT {_SELECT_COLONNE_P} "
+                f"{sorgente}{where} ORDER BY {ordine} LIMIT ?",
+                (*parametri, dimensione_pagina + 1),
+                self._righe_proprieta,
+            ).fetchall()
+        if len(elementi) <= dimensione_pagina:
+            return PaginaProprieta(elementi, None)
+        del elementi[dimensione_pagina:]
+        ultima = elementi[-1]
+        return PaginaProprieta(
+            elementi,
+            _codifica_cursore(
+                ordina_per, decrescente, getattr(ultima, ordina_per), ultima.id_proprieta
+            ),
+        )
+    
+    def get_colonne_proprieta(
+        self,
+        *,
+        id_agenzia: Optional[int] = None,
+        id_agente: Optional[int] = None,
+        stato: Optional[str] = None,
+        prezzo_min: Optional[float] = None,
+        prezzo_max: Optional[float] = None,
+        usa_numpy: Optional[bool] = None,
+        dimensione_batch: int = 10_000,
+    ) -> ColonneProprieta:
+        """Restituisce le proprietà filtrate come colonne parallele, per l'analisi.
+        
+        Non crea un oggetto per riga: ogni gruppo di righe letto dal cursore
+        viene trasposto e accodato agli array tipizzati, quindi un milione di
+        proprietà occupa qualche decina di MB e con NumPy le aggregazioni
+        (media, percentili, ...) sono vettoriali.
+        
+        Parametri
+        ---------
+        id_agenzia, id_agente, stato, prezzo_min, prezzo_max
+            Filtri opzionali, come in get_pagina_proprieta
+        usa_numpy : bool | None
+            True per numpy.ndarray, False per array.array; None sceglie NumPy
+            se è installato
+        dimensione_batch : int
+            Numero di righe lette dal cursore a ogni fetchmany
+            
+        Ritorno
+        -------
+        ColonneProprieta
+            Le colonne id_proprieta, id_agente, prezzo e stato (codificato).
+        """
+        if usa_numpy is None:
+            usa_numpy = numpy is not None
+        elif usa_numpy and numpy is None:
+            raise ImportError("usa_numpy=True richiede il pacchetto numpy")
+        if dimensione_batch < 1:
+            raise ValueError("dimensione_batch deve essere positiva")
+        sorgente, condizioni, parametri = _filtri_proprieta(
+            stato, prezzo_min, prezzo_max, id_agente, id_agenzia
+        )
+        where = f" WHERE {' AND '.join(condizioni)}" if condizioni else ""
+        
+        ids, agenti, prezzi, codici = array("q"), array("q"), array("d"), array("i")
+        categorie: dict[str, int] = {}
+        with self._lettura() as conn:
+            cursor = conn.execute(
+                f"SELECT p.id_proprieta, p.id_agente, p.prezzo, p.stato {sorgente}{where}",
+                parametri,
+            )
+            try:
+                while righe := cursor.fetchmany(dimensione_batch):
+                    colonna_ids, colonna_agenti, colonna_prezzi, colonna_stati = zip(*righe)
+                    ids.extend(colonna_ids)
+                    agenti.extend(colonna_agenti)
+                    prezzi.extend(colonna_prezzi)
+                    # dict.fromkeys, non set: i codici seguono l'ordine di comparsa.
+                    for nuovo in dict.fromkeys(colonna_stati):
+                        if nuovo not in categorie:
+                            categorie[nuovo] = len(categorie)
+                    codici.extend(map(categorie.__getitem__, colonna_stati))
+            finally:
+                cursor.close()
+        
+        if usa_numpy:
+            # frombuffer non copia: gli ndarray condividono la memoria degli array.array.
+            ids = numpy.frombuffer(ids, dtype=numpy.int64)
+            agenti = numpy.frombuffer(agenti, dtype=numpy.int64)
+            prezzi = numpy.frombuffer(prezzi, dtype=numpy.float64)
+            codici = numpy.frombuffer(codici, dtype=numpy.int32)
+        return ColonneProprieta(ids, agenti, prezzi, codici, list(categorie))
     
     def aggiorna_stato_proprieta(self, id_proprieta: int, nuovo_stato: str) -> None:
         """Aggiorna lo stato di una proprietà.
@@ -238,8 +2953,143 @@ class GestoreImmobiliare:
         Aggiorna il campo stato della proprietà specificata.
         Se la proprietà non esiste, non fa nulla.
         """
-        # Placeholder: implementare l'aggiornamento
-        pass
+        with self._scrittura():
+            self.conn.execute(
+                "UPDATE proprieta SET stato = ? WHERE id_proprieta = ?",
+                (nuovo_stato, id_proprieta),
+            )
+        self._invalida_proprieta(id_proprieta)
+    
+    def aggiorna_prezzo_proprieta(self, id_proprieta: int, nuovo_prezzo: float) -> None:
+        """Aggiorna il prezzo di una proprietà.
+        
+        Parametri
+        ---------
+        id_proprieta : int
+            L'ID della proprietà da aggiornare
+        nuovo_prezzo : float
+            Il nuovo prezzo
+            
+        Comportamento
+        -------------
+        Come aggiorna_stato_proprieta; con storico_proprieta=True la variazione
+        viene registrata nello storico.
+        """
+        with self._scrittura():
+            self.conn.execute(
+                "UPDATE proprieta SET prezzo = ? WHERE id_proprieta = ?",
+                (nuovo_prezzo, id_proprieta),
+            )
+        self._invalida_proprieta(id_proprieta)
+    
+    def _invalida_proprieta(self, id_proprieta: int) -> None:
+        """Invalida le voci della cache che contengono la proprietà."""
+        if self._cache is not None:
+            with self._lettura() as conn:
+                riga = conn.execute(
+                    "SELECT p.id_agente, a.id_agenzia "
+                    "FROM proprieta p JOIN agenti a ON p.id_agente = a.id_agente "
+                    "WHERE p.id_proprieta = ?",
+                    (id_proprieta,),
+                ).fetchone()
+            if riga is not None:
+                self._invalida(
+                    ("proprieta_per_agente", riga[0]), ("proprieta_per_agenzia", riga[1])
+                )
+    
+    def aggiorna_stato_proprieta_many(
+        self,
+        aggiornamenti: Iterable[Union[int, tuple[int, str]]],
+        nuovo_stato: Optional[str] = None,
+        dimensione_blocco: int = DIMENSIONE_BLOCCO,
+    ) -> int:
+        """Aggiorna lo stato di molte proprietà in un'unica transazione.
+        
+        Parametri
+        ---------
+        aggiornamenti : Iterable[int] | Iterable[tuple[int, str]]
+            Gli ID delle proprietà se è indicato `nuovo_stato`, altrimenti
+            coppie (id_proprieta, nuovo_stato); se un ID compare più volte
+            vale l'ultima coppia
+        nuovo_stato : str | None
+            Lo stato da assegnare a tutti gli ID
+        dimensione_blocco : int
+            Numero massimo di ID in ogni UPDATE ... WHERE id_proprieta IN (...)
+            
+        Ritorno
+        -------
+        int
+            Numero di proprietà il cui stato è effettivamente cambiato.
+            
+        Comportamento
+        -------------
+        Le coppie vengono raggruppate per stato, quindi si esegue un UPDATE per
+        ogni stato e blocco di ID invece di uno per proprietà. Gli ID inesistenti
+        vengono ignorati, come in aggiorna_stato_proprieta.
+        """
+        if nuovo_stato is not None:
+            ids_per_stato = {nuovo_stato: aggiornamenti}
+        else:
+            ids_per_stato = {}
+            for id_proprieta, stato in dict(aggiornamenti).items():
+                ids_per_stato.setdefault(stato, []).append(id_proprieta)
+        modificate = 0
+        with self.transaction():
+            for stato, ids in ids_per_stato.items():
+                # Due parametri sono lo stato; il resto della lista IN sono ID.
+                for blocco in _blocchi(ids, min(dimensione_blocco, MASSIMO_PARAMETRI_SQL - 2)):
+                    modificate += self.conn.execute(
+                        "UPDATE proprieta SET stato = ? "
+                        f"WHERE stato <> ? AND id_proprieta IN ({', '.join('?' * len(blocco))})",
+                        (stato, stato, *blocco),
+                    ).rowcount
+        self._svuota_cache()
+        return modificate
+    
+    def aggiorna_stato_proprieta_dove(
+        self,
+        nuovo_stato: str,
+        *,
+        stato: Optional[str] = None,
+        prezzo_min: Optional[float] = None,
+        prezzo_max: Optional[float] = None,
+        id_agente: Optional[int] = None,
+        id_agenzia: Optional[int] = None,
+    ) -> int:
+        """Aggiorna lo stato di tutte le proprietà che soddisfano i filtri.
+        
+        Esempio
+        -------
+        # Tutte le proprietà in vendita dell'agente 101 sotto i 200000 euro
+        gestore.aggiorna_stato_proprieta_dove(
+            "Venduto", stato="In vendita", id_agente=101, prezzo_max=200000
+        )
+        
+        Parametri
+        ---------
+        nuovo_stato : str
+            Lo stato da assegnare
+        stato, prezzo_min, prezzo_max, id_agente, id_agenzia
+            Filtri, come in get_pagina_proprieta; almeno uno è obbligatorio
+            
+        Ritorno
+        -------
+        int
+            Numero di proprietà il cui stato è effettivamente cambiato.
+        """
+        sorgente, condizioni, parametri = _filtri_proprieta(
+            stato, prezzo_min, prezzo_max, id_agente, id_agenzia
+        )
+        if not condizioni:
+            raise ValueError("Indicare almeno un filtro sulle proprietà da aggiornare")
+        with self.transaction():
+            modificate = self.conn.execute(
+                "UPDATE proprieta SET stato = ? WHERE stato <> ? AND id_proprieta IN ("
+                f"SELECT p.id_proprieta {sorgente} WHERE {' AND '.join(condizioni)})",
+                (nuovo_stato, nuovo_stato, *parametri),
+            ).rowcount
+        self._svuota_cache()
+        return modificate
     
     def get_best_agente_per_agenzia(self) -> dict:
         """Trova l'agente con più proprietà per ogni agenzia.
@@ -259,8 +3109,253 @@ class GestoreImmobiliare:
             2: Agente(id_agente=205, nome="Laura Bianchi", email="laura@example.com", id_agenzia=2)
         }
         """
-        # Placeholder: implementare la query aggregata
-        return {}
+        if self.conteggi_proprieta:
+            # Una ricerca sull'indice della classifica per ogni agenzia.
+            sql = (
+                "SELECT a.id_agente, a.nome, a.email, a.id_agenzia "
+                "FROM agenzie g JOIN agenti a ON a.id_agente = ("
+                "    SELECT c.id_agente FROM conteggi_agenti c "
+                "    WHERE c.id_agenzia = g.id_agenzia "
+                "    ORDER BY c.conteggio_proprieta DESC, c.id_agente LIMIT 1)"
+            )
+        else:
+            # Una sola riga per agenzia: il primo agente per numero di proprietà.
+            sql = (
+                "SELECT id_agente, nome, email, id_agenzia FROM ("
+                "    SELECT a.id_agente, a.nome, a.email, a.id_agenzia, "
+                "           ROW_NUMBER() OVER ("
+                "               PARTITION BY a.id_agenzia "
+                "               ORDER BY COUNT(p.id_proprieta) DESC, a.id_agente"
+                "           ) AS posizione "
+                "    FROM agenti a LEFT JOIN proprieta p ON a.id_agente = p.id_agente "
+                "    GROUP BY a.id_agente"
+                ") WHERE posizione = 1"
+            )
+        def calcola():
+            with self._lettura() as conn:
+                agenti = _esegui_mappato(conn, sql, (), self._righe_agente).fetchall()
+                return {agente.id_agenzia: agente for agente in agenti}
+        
+        return self._da_cache(("best_agente_per_agenzia",), calcola)
+    
+    def get_statistiche_prezzi(
+        self,
+        raggruppa_per: Union[str, tuple[str, ...]] = "agenzia",
+        *,
+        id_agenzia: Optional[int] = None,
+        id_agente: Optional[int] = None,
+        stato: Optional[str] = None,
+        percentili: Iterable[float] = (0.5,),
+    ) -> dict:
+        """Calcola nel database le statistiche sui prezzi per agenzia, agente o stato.
+        
+        Parametri
+        ---------
+        raggruppa_per : str | tuple[str, ...]
+            Una o più dimensioni tra "agenzia", "agente" e "stato"; ad esempio
+            ("agenzia", "stato") dà le statistiche di ogni stato in ogni agenzia
+        id_agenzia, id_agente, stato
+            Filtri opzionali sulle proprietà considerate
+        percentili : Iterable[float]
+            Percentili da calcolare, tra 0 e 1; per default solo la mediana.
+            Con una sequenza vuota la query sui percentili non viene eseguita.
+            
+        Ritorno
+        -------
+        dict
+            Chiave del gruppo → StatistichePrezzi. Con una sola dimensione la
+            chiave è il suo valore (es. id_agenzia), altrimenti una tupla nello
+            stesso ordine di `raggruppa_per`. I gruppi senza proprietà non compaiono.
+            
+        Comportamento
+        -------------
+        Conteggio, media, minimo e massimo sono un GROUP BY eseguito da SQLite;
+        con riepilogo_prezzi=True aggrega le poche righe della tabella
+        riepilogo_prezzi invece di tutte le proprietà. I percentili usano una
+        funzione finestra (ROW_NUMBER ordinato per prezzo in ogni gruppo) e
+        restituiscono soltanto le due righe attorno a ogni percentile.
+        """
+        dimensioni = (raggruppa_per,) if isinstance(raggruppa_per, str) else tuple(raggruppa_per)
+        if not dimensioni or not set(dimensioni) <= set(_DIMENSIONI_STATISTICHE):
+            raise ValueError(
+                f"raggruppa_per deve contenere una o più tra {', '.join(_DIMENSIONI_STATISTICHE)}"
+            )
+        percentili = tuple(percentili)
+        if any(not 0 <= p <= 1 for p in percentili):
+            raise ValueError("I percentili devono essere compresi tra 0 e 1")
+        
+        def colonne(tabella: str) -> list[str]:
+            mappa = {"agenzia": "a.id_agenzia", "agente": f"{tabella}.id_agente",
+                     "stato": f"{tabella}.stato"}
+            return [mappa[d] for d in dimensioni]
+        
+        def where(condizioni: list[str]) -> str:
+            return f" WHERE {' AND '.join(condizioni)}" if condizioni else ""
+        
+        n = len(dimensioni)
+        
+        def chiave(riga: tuple):
+            return riga[0] if n == 1 else tuple(riga[:n])
+        
+        # Sorgente sulle proprietà: per gli aggregati senza riepilogo e per i percentili.
+        sorgente_p, condizioni_p, parametri_p = _filtri_proprieta(
+            stato, id_agente=id_agente, id_agenzia=id_agenzia
+        )
+        if "agenzia" in dimensioni and id_agenzia is None:
+            sorgente_p += " JOIN agenti a ON p.id_agente = a.id_agente"
+        
+        if self.riepilogo_prezzi:
+            sorgente = "FROM riepilogo_prezzi r"
+            if "agenzia" in dimensioni or id_agenzia is not None:
+                sorgente += " JOIN agenti a ON r.id_agente = a.id_agente"
+            # id_agente e stato hanno lo stesso nome in riepilogo_prezzi.
+            condizioni = [c.replace("p.", "r.") for c in condizioni_p]
+            parametri = parametri_p
+            chiavi = ", ".join(colonne("r"))
+            aggregati = "SUM(r.conteggio), SUM(r.somma), MIN(r.minimo), MAX(r.massimo)"
+        else:
+            sorgente, condizioni, parametri = sorgente_p, condizioni_p, parametri_p
+            chiavi = ", ".join(colonne("p"))
+            aggregati = "COUNT(*), SUM(p.prezzo), MIN(p.prezzo), MAX(p.prezzo)"
+        
+        with self._lettura() as conn:
+            risultato = {
+                chiave(riga): StatistichePrezzi(
+                    riga[n], riga[n + 1] / riga[n], riga[n + 2], riga[n + 3]
+                )
+                for riga in conn.execute(
+                    f"SELECT {chiavi}, {aggregati} {sorgente}{where(condizioni)} "
+                    f"GROUP BY {chiavi} ORDER BY {chiavi}",
+                    parametri,
+                )
+            }
+            if not percentili or not risultato:
+                return risultato
+            
+            alias = ", ".join(f"k{i}" for i in range(n))
+            partizione = ", ".join(colonne("p"))
+            # Per il percentile p servono la posizione floor(p * (totale - 1)) e la successiva.
+            vicine = " OR ".join(
+                "posizione BETWEEN CAST(? * (totale - 1) AS INTEGER) "
+                "AND CAST(? * (totale - 1) AS INTEGER) + 1"
+                for _ in percentili
+            )
+            righe = conn.execute(
+                f"SELECT {alias}, posizione, prezzo FROM ("
+                f"    SELECT {', '.join(f'{c} AS k{i}' for i, c in enumerate(colonne('p')))}, "
+                f"           p.prezzo, ROW_NUMBER() OVER ("
+                f"               PARTITION BY {partizione} ORDER BY p.prezzo) - 1 AS posizione, "
+                f"           COUNT(*) OVER (PARTITION BY {partizione}) AS totale "
+                f"    {sorgente_p}{where(condizioni_p)}"
+                f") WHERE {vicine}",
+                [*parametri_p, *(p for p in percentili for _ in range(2))],
+            ).fetchall()
+        
+        prezzi_vicini: dict = {}
+        for riga in righe:
+            prezzi_vicini.setdefault(chiave(riga), {})[riga[n]] = riga[n + 1]
+        for gruppo, vicini in prezzi_vicini.items():
+            statistiche = risultato[gruppo]
+            for p in percentili:
+                posizione = p * (statistiche.conteggio - 1)
+                sotto = int(posizione)
+                sopra = min(sotto + 1, statistiche.conteggio - 1)
+                statistiche.percentili[p] = vicini[sotto] + (
+                    vicini[sopra] - vicini[sotto]
+                ) * (posizione - sotto)
+        return risultato
+    
+    def analyze(self) -> None:
+        """Ricalcola da zero le statistiche usate dal pianificatore delle query.
+        
+        Comportamento
+        -------------
+        Esegue ANALYZE su tutte le tabelle e gli indici. Utile dopo un
+        caricamento massivo, quando la distribuzione dei dati cambia molto.
+        """
+        with self._scrittura():
+            self.conn.execute("ANALYZE")
+    
+    def optimize(self) -> None:
+        """Aggiorna le statistiche del pianificatore solo dove servono.
+        
+        Comportamento
+        -------------
+        Esegue PRAGMA optimize, che analizza soltanto le tabelle le cui
+        statistiche sono assenti o superate. È economico e può essere chiamato
+        periodicamente o prima di chiudere una connessione di lunga durata.
+        """
+        with self._scrittura():
+            self.conn.execute("PRAGMA analysis_limit = 400")
+            try:
+                self.conn.execute("PRAGMA optimize")
+            finally:
+                # Il limite resta sulla connessione: analyze() deve leggere tutte le righe.
+                self.conn.execute("PRAGMA analysis_limit = 0")
+    
+    def crea_snapshot(
+        self,
+        destinazione: str,
+        *,
+        pagine_per_passo: int = 1024,
+        pausa: float = 0.001,
+        progresso: Optional[Callable[[int, int], None]] = None,
+    ) -> int:
+        """Copia il database in un altro file mentre il servizio continua a scrivere.
+        
+        Parametri
+        ---------
+        destinazione : str
+            Percorso del file di copia; se esiste viene sovrascritto
+        pagine_per_passo : int
+            Pagine copiate a ogni passo dell'API di backup di SQLite
+        pausa : float
+            Secondi di attesa tra un passo e il successivo
+        progresso : Callable[[int, int], None] | None
+            Chiamata dopo ogni passo con (pagine copiate, pagine totali)
+            
+        Ritorno
+        -------
+        int
+            Il numero di pagine del database copiato
+            
+        Comportamento
+        -------------
+        La copia è coerente: corrisponde al database in un singolo istante.
+        Le pagine vengono copiate a blocchi dalla connessione di lettura (dal
+        pool, se c'è) senza mai prendere il lock di scrittura del gestore. In
+        WAL la copia avviene in un'unica transazione di lettura, che non blocca
+        chi scrive; con il journal tradizionale i lock vengono rilasciati tra
+        un passo e l'altro e, se un'altra connessione modifica il database nel
+        frattempo, SQLite ricomincia la copia. Il file prodotto è in
+        journal_mode DELETE, pronto per essere aperto con sola_lettura=True.
+        """
+        if pagine_per_passo < 1:
+            raise ValueError("pagine_per_passo deve essere positivo")
+        if self._thread_transazione == threading.get_ident():
+            # SQLite rifiuta di copiare da una connessione con una scrittura in corso.
+            raise RuntimeError("crea_snapshot non può essere chiamato dentro una transazione")
+        
+        def dopo_passo(stato, rimanenti, totali):
+            if progresso is not None:
+                progresso(totali - rimanenti, totali)
+            if rimanenti and pausa:
+                time.sleep(pausa)
+        
+        wal = self.profilo.journal_mode == "WAL"
+        copia = sqlite3.connect(destinazione)
+        try:
+            with (self._lettura_coerente() if wal else self._lettura()) as conn:
+                if wal:
+                    # BEGIN è differito: senza una lettura ogni passo aprirebbe e
+                    # chiuderebbe la propria transazione e le scritture degli
+                    # altri farebbero ricominciare la copia.
+                    conn.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchall()
+                conn.backup(copia, pages=pagine_per_passo, progress=dopo_passo)
+            copia.execute("PRAGMA journal_mode = DELETE")
+            return copia.execute("PRAGMA page_count").fetchone()[0]
+        finally:
+            copia.close()
     
     def close(self) -> None:
         """Chiude la connessione al database.
@@ -270,5 +3365,6 @@ class GestoreImmobiliare:
         Chiude la connessione SQLite per liberare le risorse.
         Dovrebbe essere chiamato quando si è finito di usare il gestore.
         """
-        # Placeholder: implementare la chiusura
-        pass
+        if self._pool is not None:
+            self._pool.chiudi()
+        self.conn.close()
@@ -0,0 +1,586 @@
+"""
+Partizionamento orizzontale (sharding) di GestoreImmobiliare per agenzia.
+
+GestoreImmobiliareSharded distribuisce i dati su N file SQLite, ognuno
+gestito da un GestoreImmobiliare: l'agenzia `id_agenzia` vive nello shard
+`id_agenzia % N` insieme ai suoi agenti e alle loro proprietà, così le
+chiavi esterne restano valide all'interno di ogni file e le scritture di
+agenzie diverse non si contendono lo stesso lock.
+
+- Le operazioni su una singola agenzia (get_agenti_per_agenzia,
+  get_proprieta_per_agenzia, get_agenzia_completa, ...) interrogano un solo shard.
+- Le operazioni su un agente trovano il suo shard con una ricerca per chiave
+  primaria, il cui risultato resta in memoria.
+- Le operazioni che attraversano le agenzie (get_best_agente_per_agenzia,
+  get_agenzie_complete, get_statistiche_prezzi, ricerche geografiche) vengono
+  eseguite in parallelo su un pool di processi, ognuno con connessioni in sola
+  lettura, e i risultati vengono uniti.
+
+Limiti
+------
+- Il numero e l'ordine dei file non possono cambiare: ogni shard registra la
+  propria posizione e l'apertura con una configurazione diversa fallisce.
+- Gli ID di agenti e proprietà devono essere univoci su tutti gli shard; ogni
+  shard controlla soltanto i propri.
+- `transaction()` apre una transazione su ogni shard: è atomica per shard,
+  ma non tra shard diversi.
+- Paginazione, ricerca full-text, colonne, storico e registro delle modifiche
+  non sono esposti: vanno usati sui singoli `shard`.
+
+Esempio
+-------
+gestore = GestoreImmobiliareSharded([f"shard_{i}.db" for i in range(4)], "balanced")
+gestore.add_agenzia(agenzia)
+gestore.get_proprieta_per_agenzia(agenzia.id_agenzia)   # un solo shard
+gestore.get_best_agente_per_agenzia()                   # tutti gli shard, in parallelo
+gestore.close()
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack, contextmanager
+from itertools import chain, islice
+from typing import Iterable, Iterator, Optional, Sequence, Union
+import heapq
+import multiprocessing
+import os
+
+from immobiliare_manager import (
+    DIMENSIONE_BLOCCO,
+    Agenzia,
+    Agente,
+    AgenziaCompleta,
+    ErroreBlocco,
+    Proprieta,
+    ProfiloPrestazioni,
+    RisultatoCaricamento,
+    GestoreImmobiliare,
+)
+
+
+__all__ = [
+    "GestoreImmobiliareSharded",
+]
+
+
+# Opzioni che riguardano solo il processo principale e non le letture dei worker
+_OPZIONI_SOLO_PRINCIPALE = frozenset({
+    "cache", "cache_ttl", "connessioni_lettura", "attesa_pool",
+    "strumentazione", "soglia_query_lenta", "sola_lettura",
+})
+
+# Gestori in sola lettura aperti da un processo del pool, riusati tra i task
+_GESTORI_WORKER: dict = {}
+
+
+def _esegui_su_shard(percorso: str, profilo, opzioni: tuple, nome: str, args: tuple, kwargs: dict):
+    """Eseguita in un processo del pool: chiama `nome` sullo shard in sola lettura."""
+    chiave = (percorso, profilo, opzioni)
+    gestore = _GESTORI_WORKER.get(chiave)
+    if gestore is None:
+        gestore = _GESTORI_WORKER[chiave] = GestoreImmobiliare(
+            percorso, profilo, sola_lettura=True, **dict(opzioni)
+        )
+    return getattr(gestore, nome)(*args, **kwargs)
+
+
+def _per_agenzia(nome: str):
+    def metodo(self, id_agenzia: int, *args, **kwargs):
+        return getattr(self.shard_di_agenzia(id_agenzia), nome)(id_agenzia, *args, **kwargs)
+
+    metodo.__name__ = nome
+    metodo.__doc__ = f"GestoreImmobiliare.{nome} sullo shard dell'agenzia."
+    return metodo
+
+
+def _per_agente(nome: str, vuoto):
+    def metodo(self, id_agente: int, *args, **kwargs):
+        shard = self.shard_di_agente(id_agente)
+        if shard is None:
+            return vuoto()
+        return getattr(shard, nome)(id_agente, *args, **kwargs)
+
+    metodo.__name__ = nome
+    metodo.__doc__ = (
+        f"GestoreImmobiliare.{nome} sullo shard dell'agente; "
+        "se l'agente non esiste in nessuno shard il risultato è vuoto."
+    )
+    return metodo
+
+
+def _per_proprieta(nome: str):
+    def metodo(self, id_proprieta: int, *args, **kwargs):
+        shard = self._shard_di_proprieta(id_proprieta)
+        if shard is not None:
+            getattr(shard, nome)(id_proprieta, *args, **kwargs)
+
+    metodo.__name__ = nome
+    metodo.__doc__ = (
+        f"GestoreImmobiliare.{nome} sullo shard che contiene la proprietà; "
+        "come nel gestore singolo, una proprietà inesistente non produce errori."
+    )
+    return metodo
+
+
+def _su_tutti(nome: str):
+    def metodo(self, *args, **kwargs) -> None:
+        for shard in self.shard:
+            getattr(shard, nome)(*args, **kwargs)
+
+    metodo.__name__ = nome
+    metodo.__doc__ = f"GestoreImmobiliare.{nome} su ogni shard."
+    return metodo
+
+
+class GestoreImmobiliareSharded:
+    """Stessa interfaccia di GestoreImmobiliare, con i dati ripartiti per agenzia su più file.
+
+    Parametri
+    ---------
+    percorsi : Sequence[str]
+        I file degli shard, sempre nello stesso ordine; l'agenzia `id_agenzia`
+        va nello shard `percorsi[id_agenzia % len(percorsi)]`
+    profilo : str | ProfiloPrestazioni | None
+        Profilo di prestazioni di ogni shard
+    processi : int | None
+        Processi usati per le operazioni su più shard; per default uno per
+        shard, fino al numero di CPU. Con 0 gli shard vengono interrogati uno
+        dopo l'altro nel processo corrente.
+    **opzioni
+        Altri argomenti per ogni GestoreImmobiliare (cache, conteggi_proprieta, ...)
+    """
+
+    def __init__(
+        self,
+        percorsi: Sequence[str],
+        profilo: Union[str, ProfiloPrestazioni, None] = "balanced",
+        *,
+        processi: Optional[int] = None,
+        **opzioni,
+    ):
+        if not percorsi:
+            raise ValueError("Serve almeno uno shard")
+        if processi is not None and processi < 0:
+            raise ValueError("processi non può essere negativo")
+        self.percorsi = list(percorsi)
+        self.profilo = profilo
+        self.shard: list[GestoreImmobiliare] = []
+        try:
+            for indice, percorso in enumerate(self.percorsi):
+                self.shard.append(GestoreImmobiliare(percorso, profilo, **opzioni))
+                self._verifica_posizione(indice)
+        except BaseException:
+            for shard in self.shard:
+                shard.close()
+            raise
+        self._processi = (
+            min(len(self.percorsi), os.cpu_count() or 1) if processi is None else processi
+        )
+        self._opzioni_lettura = tuple(sorted(
+            (nome, valore) for nome, valore in opzioni.items()
+            if nome not in _OPZIONI_SOLO_PRINCIPALE
+        ))
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._shard_agenti: dict[int, int] = {}
+        self._profondita_transazione = 0
+        self._contesti: list = []
+
+    def _verifica_posizione(self, indice: int) -> None:
+        """Registra nello shard la sua posizione, o controlla che non sia cambiata."""
+        shard = self.shard[indice]
+        totale = len(self.percorsi)
+        if shard.sola_lettura:
+            esiste = shard.conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'shard'"
+            ).fetchone()
+            riga = shard.conn.execute("SELECT indice, totale FROM shard").fetchone() if esiste else None
+        else:
+            with shard.transaction():
+                shard.conn.execute(
+                    "CREATE TABLE IF NOT EXISTS shard (indice INTEGER NOT NULL, totale INTEGER NOT NULL)"
+                )
+                riga = shard.conn.execute("SELECT indice, totale FROM shard").fetchone()
+                if riga is None:
+                    shard.conn.execute("INSERT INTO shard VALUES (?, ?)", (indice, totale))
+        if riga is not None and tuple(riga) != (indice, totale):
+            raise ValueError(
+                f"{self.percorsi[indice]} è lo shard {riga[0]} di {riga[1]}, "
+                f"non il {indice} di {totale}: l'elenco dei file è cambiato"
+            )
+
+    def _indice_agenzia(self, id_agenzia: int) -> int:
+        return id_agenzia % len(self.shard)
+
+    def shard_di_agenzia(self, id_agenzia: int) -> GestoreImmobiliare:
+        """Restituisce lo shard in cui vive l'agenzia (anche se non esiste ancora)."""
+        return self.shard[self._indice_agenzia(id_agenzia)]
+
+    def shard_di_agente(self, id_agente: int) -> Optional[GestoreImmobiliare]:
+        """Restituisce lo shard che contiene l'agente, o None se non esiste.
+
+        La prima ricerca interroga gli shard per chiave primaria; il risultato
+        resta in memoria, perché un agente non cambia agenzia (un rollback della
+        transaction() lo dimentica).
+        """
+        indice = self._shard_agenti.get(id_agente)
+        if indice is None:
+            for candidato, shard in enumerate(self.shard):
+                with shard._lettura() as conn:
+                    riga = conn.execute(
+                        "SELECT 1 FROM agenti WHERE id_agente = ?", (id_agente,)
+                    ).fetchone()
+                if riga is not None:
+                    indice = self._shard_agenti[id_agente] = candidato
+                    break
+            else:
+                return None
+        return self.shard[indice]
+
+    def _shard_di_proprieta(self, id_proprieta: int) -> Optional[GestoreImmobiliare]:
+        for shard in self.shard:
+            with shard._lettura() as conn:
+                riga = conn.execute(
+                    "SELECT 1 FROM proprieta WHERE id_proprieta = ?", (id_proprieta,)
+                ).fetchone()
+            if riga is not None:
+                return shard
+        return None
+
+    def _pool_processi(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # "spawn": i figli non ereditano le connessioni SQLite aperte dal padre.
+            self._pool = ProcessPoolExecutor(
+                self._processi, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._pool
+
+    def _distribuisci(self, indici: Sequence[int], nome: str, *args, **kwargs) -> list:
+        """Chiama `nome` con gli stessi argomenti sugli shard `indici` (vedi _esegui)."""
+        return self._esegui(nome, [(i, args, kwargs) for i in indici])
+
+    def _esegui(self, nome: str, chiamate: list[tuple[int, tuple, dict]]) -> list:
+        """Esegue le chiamate (indice dello shard, args, kwargs) e ne restituisce i risultati in ordine.
+
+        Con più di una chiamata vanno ai processi del pool, che leggono i dati
+        confermati. Dentro una transazione (o con processi=0) girano qui, sulle
+        connessioni del gestore, così vedono anche le scritture non ancora
+        confermate.
+        """
+        if len(chiamate) <= 1 or self._processi == 0 or self._profondita_transazione:
+            return [getattr(self.shard[i], nome)(*args, **kwargs) for i, args, kwargs in chiamate]
+        pool = self._pool_processi()
+        futuri = [
+            pool.submit(
+                _esegui_su_shard, self.percorsi[i], self.profilo, self._opzioni_lettura,
+                nome, args, kwargs,
+            )
+            for i, args, kwargs in chiamate
+        ]
+        return [futuro.result() for futuro in futuri]
+
+    def _indici_filtrati(
+        self, id_agenzia: Optional[int] = None, id_agente: Optional[int] = None
+    ) -> list[int]:
+        """Gli shard che possono contenere proprietà con i filtri indicati."""
+        if id_agenzia is not None:
+            return [self._indice_agenzia(id_agenzia)]
+        if id_agente is not None:
+            # Un agente inesistente non ha proprietà: basta interrogare uno shard qualsiasi.
+            return [self._shard_agenti[id_agente] if self.shard_di_agente(id_agente) else 0]
+        return list(range(len(self.shard)))
+
+    @contextmanager
+    def transaction(self) -> Iterator["GestoreImmobiliareSharded"]:
+        """Apre una transazione su ogni shard (vedi GestoreImmobiliare.transaction).
+
+        All'uscita le transazioni vengono confermate una dopo l'altra: ognuna è
+        atomica, ma un errore durante la conferma di uno shard non annulla
+        quelle già confermate sugli altri.
+        """
+        try:
+            with ExitStack() as pila:
+                for shard in self.shard:
+                    pila.enter_context(shard.transaction())
+                self._profondita_transazione += 1
+                try:
+                    yield self
+                finally:
+                    self._profondita_transazione -= 1
+        except BaseException:
+            # Gli agenti ricordati nella transazione potrebbero essere stati annullati.
+            self._shard_agenti.clear()
+            raise
+
+    def __enter__(self) -> "GestoreImmobiliareSharded":
+        """Equivale a `with gestore.transaction():`."""
+        contesto = self.transaction()
+        contesto.__enter__()
+        self._contesti.append(contesto)
+        return self
+
+    def __exit__(self, tipo, valore, traceback) -> Optional[bool]:
+        return self._contesti.pop().__exit__(tipo, valore, traceback)
+
+    def add_agenzia(self, agenzia: Agenzia) -> None:
+        """Aggiunge l'agenzia al suo shard."""
+        self.shard_di_agenzia(agenzia.id_agenzia).add_agenzia(agenzia)
+
+    def add_agente(self, agente: Agente) -> None:
+        """Aggiunge l'agente allo shard della sua agenzia."""
+        indice = self._indice_agenzia(agente.id_agenzia)
+        self.shard[indice].add_agente(agente)
+        self._shard_agenti[agente.id_agente] = indice
+
+    def add_proprieta(self, proprieta: Proprieta) -> None:
+        """Aggiunge la proprietà allo shard del suo agente.
+
+        Se l'agente non esiste solleva sqlite3.IntegrityError, come il gestore singolo.
+        """
+        shard = self.shard_di_agente(proprieta.id_agente)
+        # Senza agente lo shard dell'agenzia 0 rifiuta la riga per chiave esterna.
+        (shard if shard is not None else self.shard[0]).add_proprieta(proprieta)
+
+    def add_agenzie(
+        self, agenzie: Iterable[Agenzia], dimensione_blocco: int = DIMENSIONE_BLOCCO
+    ) -> RisultatoCaricamento:
+        """Versione ripartita di GestoreImmobiliare.add_agenzie.
+
+        Ogni shard riceve blocchi di al più `dimensione_blocco` righe; `blocco`
+        negli errori numera i blocchi nell'ordine in cui sono stati scritti.
+        """
+        return self._carica(
+            agenzie, lambda a: self._indice_agenzia(a.id_agenzia), "add_agenzie", dimensione_blocco
+        )
+
+    def add_agenti(
+        self, agenti: Iterable[Agente], dimensione_blocco: int = DIMENSIONE_BLOCCO
+    ) -> RisultatoCaricamento:
+        """Versione ripartita di GestoreImmobiliare.add_agenti (vedi add_agenzie)."""
+        return self._carica(
+            agenti, lambda a: self._indice_agenzia(a.id_agenzia), "add_agenti", dimensione_blocco,
+            ricorda_agenti=True,
+        )
+
+    def add_proprieta_many(
+        self, proprieta: Iterable[Proprieta], dimensione_blocco: int = DIMENSIONE_BLOCCO
+    ) -> RisultatoCaricamento:
+        """Versione ripartita di GestoreImmobiliare.add_proprieta_many (vedi add_agenzie).
+
+        Le proprietà di agenti inesistenti finiscono in blocchi scartati, con
+        lo stesso messaggio di chiave esterna del gestore singolo.
+        """
+        def indice(p: Proprieta) -> int:
+            shard = self.shard_di_agente(p.id_agente)
+            return self._shard_agenti[p.id_agente] if shard is not None else -1
+
+        return self._carica(proprieta, indice, "add_proprieta_many", dimensione_blocco)
+
+    def _carica(
+        self,
+        elementi: Iterable,
+        indice_di,
+        nome: str,
+        dimensione_blocco: int,
+        ricorda_agenti: bool = False,
+    ) -> RisultatoCaricamento:
+        """Smista gli elementi in un buffer per shard e scrive ogni buffer pieno come un blocco.
+
+        Gli elementi con indice -1 non hanno uno shard: i loro blocchi vengono
+        passati allo shard 0, che li scarta per chiave esterna.
+        """
+        risultato = RisultatoCaricamento()
+        buffer: dict[int, list] = {}
+        blocchi = 0
+
+        def scrivi(indice: int) -> None:
+            nonlocal blocchi
+            blocco = buffer.pop(indice)
+            esito = getattr(self.shard[max(indice, 0)], nome)(blocco, len(blocco))
+            risultato.inseriti += esito.inseriti
+            risultato.scartati += esito.scartati
+            risultato.errori.extend(
+                ErroreBlocco(blocchi, errore.righe, errore.messaggio) for errore in esito.errori
+            )
+            if ricorda_agenti and not esito.scartati:
+                self._shard_agenti.update((agente.id_agente, indice) for agente in blocco)
+            blocchi += 1
+
+        with self.transaction():
+            for elemento in elementi:
+                indice = indice_di(elemento)
+                buffer.setdefault(indice, []).append(elemento)
+                if len(buffer[indice]) >= dimensione_blocco:
+                    scrivi(indice)
+            for indice in sorted(buffer):
+                scrivi(indice)
+        return risultato
+
+    get_agenti_per_agenzia = _per_agenzia("get_agenti_per_agenzia")
+    get_proprieta_per_agenzia = _per_agenzia("get_proprieta_per_agenzia")
+    iter_agenti_per_agenzia = _per_agenzia("iter_agenti_per_agenzia")
+    iter_proprieta_per_agenzia = _per_agenzia("iter_proprieta_per_agenzia")
+    get_agenzia_completa = _per_agenzia("get_agenzia_completa")
+    get_portafoglio_al = _per_agenzia("get_portafoglio_al")
+
+    get_proprieta_per_agente = _per_agente("get_proprieta_per_agente", list)
+    iter_proprieta_per_agente = _per_agente("iter_proprieta_per_agente", lambda: iter(()))
+
+    aggiorna_stato_proprieta = _per_proprieta("aggiorna_stato_proprieta")
+    aggiorna_prezzo_proprieta = _per_proprieta("aggiorna_prezzo_proprieta")
+
+    analyze = _su_tutti("analyze")
+    optimize = _su_tutti("optimize")
+
+    def get_proprieta_per_agenti(self, ids_agenti: Iterable[int]) -> dict[int, list[Proprieta]]:
+        """GestoreImmobiliare.get_proprieta_per_agenti con una query per shard coinvolto."""
+        risultato: dict[int, list[Proprieta]] = {id_: [] for id_ in ids_agenti}
+        per_shard: dict[int, list[int]] = {}
+        for id_agente in risultato:
+            if self.shard_di_agente(id_agente) is not None:
+                per_shard.setdefault(self._shard_agenti[id_agente], []).append(id_agente)
+        for indice, ids in per_shard.items():
+            risultato.update(self.shard[indice].get_proprieta_per_agenti(ids))
+        return risultato
+
+    def get_agenti_per_agenzie(self, ids_agenzie: Iterable[int]) -> dict[int, list[Agente]]:
+        """GestoreImmobiliare.get_agenti_per_agenzie con una query per shard coinvolto."""
+        risultato: dict[int, list[Agente]] = {id_: [] for id_ in ids_agenzie}
+        per_shard: dict[int, list[int]] = {}
+        for id_agenzia in risultato:
+            per_shard.setdefault(self._indice_agenzia(id_agenzia), []).append(id_agenzia)
+        for indice, ids in per_shard.items():
+            risultato.update(self.shard[indice].get_agenti_per_agenzie(ids))
+        return risultato
+
+    def get_agenzie_complete(
+        self, ids_agenzie: Optional[Iterable[int]] = None
+    ) -> dict[int, AgenziaCompleta]:
+        """GestoreImmobiliare.get_agenzie_complete, in parallelo sugli shard coinvolti."""
+        if ids_agenzie is None:
+            chiamate = [(i, (), {}) for i in self._indici_filtrati()]
+        else:
+            per_shard: dict[int, list[int]] = {}
+            for id_agenzia in ids_agenzie:
+                per_shard.setdefault(self._indice_agenzia(id_agenzia), []).append(id_agenzia)
+            chiamate = [(i, (ids,), {}) for i, ids in per_shard.items()]
+        return dict(sorted(self._unisci(self._esegui("get_agenzie_complete", chiamate)).items()))
+
+    def get_best_agente_per_agenzia(self) -> dict:
+        """GestoreImmobiliare.get_best_agente_per_agenzia, in parallelo su tutti gli shard.
+
+        Ogni agenzia sta in un solo shard, quindi i risultati si uniscono
+        senza ricalcoli.
+        """
+        return self._unisci(self._distribuisci(self._indici_filtrati(), "get_best_agente_per_agenzia"))
+
+    def get_statistiche_prezzi(
+        self,
+        raggruppa_per: Union[str, tuple[str, ...]] = "agenzia",
+        *,
+        id_agenzia: Optional[int] = None,
+        id_agente: Optional[int] = None,
+        **filtri,
+    ) -> dict:
+        """GestoreImmobiliare.get_statistiche_prezzi, in parallelo sugli shard.
+
+        Senza id_agenzia né id_agente i gruppi devono includere "agenzia" o
+        "agente", che stanno per intero in un solo shard: i percentili di un
+        gruppo diviso tra più shard non si possono ricomporre.
+        """
+        indici = self._indici_filtrati(id_agenzia, id_agente)
+        dimensioni = (raggruppa_per,) if isinstance(raggruppa_per, str) else tuple(raggruppa_per)
+        if len(indici) > 1 and not {"agenzia", "agente"} & set(dimensioni):
+            raise ValueError(
+                'Senza id_agenzia o id_agente raggruppa_per deve includere "agenzia" o "agente"'
+            )
+        if "percentili" in filtri:
+            filtri["percentili"] = tuple(filtri["percentili"])
+        return self._unisci(self._distribuisci(
+            indici, "get_statistiche_prezzi", raggruppa_per,
+            id_agenzia=id_agenzia, id_agente=id_agente, **filtri,
+        ))
+
+    def get_tempi_sul_mercato(
+        self, *, id_agenzia: Optional[int] = None, id_agente: Optional[int] = None, **filtri
+    ) -> dict[int, float]:
+        """GestoreImmobiliare.get_tempi_sul_mercato, in parallelo sugli shard interessati."""
+        return self._unisci(self._distribuisci(
+            self._indici_filtrati(id_agenzia, id_agente), "get_tempi_sul_mercato",
+            id_agenzia=id_agenzia, id_agente=id_agente, **filtri,
+        ))
+
+    def get_proprieta_in_area(
+        self,
+        *args,
+        id_agenzia: Optional[int] = None,
+        id_agente: Optional[int] = None,
+        **filtri,
+    ) -> list[Proprieta]:
+        """GestoreImmobiliare.get_proprieta_in_area, in parallelo sugli shard interessati."""
+        return list(chain.from_iterable(self._distribuisci(
+            self._indici_filtrati(id_agenzia, id_agente), "get_proprieta_in_area", *args,
+            id_agenzia=id_agenzia, id_agente=id_agente, **filtri,
+        )))
+
+    def get_proprieta_nel_raggio(
+        self,
+        *args,
+        limit: Optional[int] = None,
+        id_agenzia: Optional[int] = None,
+        id_agente: Optional[int] = None,
+        **filtri,
+    ) -> list[tuple[Proprieta, float]]:
+        """GestoreImmobiliare.get_proprieta_nel_raggio: unisce per distanza i risultati degli shard.
+
+        Ogni shard restituisce al più `limit` proprietà già ordinate, quindi
+        le prime `limit` dell'unione sono le più vicine in assoluto.
+        """
+        parziali = self._distribuisci(
+            self._indici_filtrati(id_agenzia, id_agente), "get_proprieta_nel_raggio", *args,
+            limit=limit, id_agenzia=id_agenzia, id_agente=id_agente, **filtri,
+        )
+        unite = heapq.merge(*parziali, key=lambda coppia: coppia[1])
+        return list(islice(unite, limit))
+
+    @staticmethod
+    def _unisci(parziali: Iterable[dict]) -> dict:
+        risultato = {}
+        for parziale in parziali:
+            risultato.update(parziale)
+        return risultato
+
+    def aggiorna_stato_proprieta_many(self, aggiornamenti, *args, **kwargs) -> int:
+        """GestoreImmobiliare.aggiorna_stato_proprieta_many su ogni shard.
+
+        Ogni shard aggiorna le proprietà che contiene; restituisce il totale.
+        """
+        aggiornamenti = list(aggiornamenti)
+        with self.transaction():
+            return sum(
+                shard.aggiorna_stato_proprieta_many(aggiornamenti, *args, **kwargs)
+                for shard in self.shard
+            )
+
+    def aggiorna_stato_proprieta_dove(
+        self,
+        nuovo_stato: str,
+        *,
+        id_agenzia: Optional[int] = None,
+        id_agente: Optional[int] = None,
+        **filtri,
+    ) -> int:
+        """GestoreImmobiliare.aggiorna_stato_proprieta_dove, solo sugli shard interessati."""
+        with self.transaction():
+            return sum(
+                self.shard[i].aggiorna_stato_proprieta_dove(
+                    nuovo_stato, id_agenzia=id_agenzia, id_agente=id_agente, **filtri
+                )
+                for i in self._indici_filtrati(id_agenzia, id_agente)
+            )
+
+    def close(self) -> None:
+        """Ferma il pool di processi e chiude tutti gli shard."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+        for shard in self.shard:
+            shard.close()
@@ -0,0 +1,97 @@
+"""
+Test per get_agenzia_completa e get_agenzie_complete.
+"""
+
+from immobiliare_manager import (
+    Agenzia,
+    Agente,
+    Proprieta,
+    AgenziaCompleta,
+    GestoreImmobiliare,
+)
+
+
+def _popola(gestore):
+    gestore.add_agenzie([
+        Agenzia(1, "Immobiliare Roma", "Via Roma 1"),
+        Agenzia(2, "Casa & Appartamenti", "Piazza Milano 5"),
+        Agenzia(3, "Senza agenti", "Corso Napoli 100"),
+    ])
+    gestore.add_agenti([
+        Agente(101, "Mario Rossi", "mario@example.com", 1),
+        Agente(102, "Laura Bianchi", "laura@example.com", 1),
+        Agente(201, "Giuseppe Verdi", "giuseppe@example.com", 2),
+    ])
+    gestore.add_proprieta_many([
+        Proprieta(1001, "Via A", 100000.0, "In vendita", 101),
+        Proprieta(1002, "Via B", 150000.0, "Venduto", 101),
+        Proprieta(2001, "Via C", 120000.0, "In vendita", 201),
+    ])
+
+
+def test_agenzia_completa(empty_db):
+    """Verifica il grafo di un'agenzia, con istanze di agente condivise e agenti senza proprietà."""
+    gestore = GestoreImmobiliare(empty_db)
+    _popola(gestore)
+    statement = []
+    gestore.conn.set_trace_callback(statement.append)
+
+    completa = gestore.get_agenzia_completa(1)
+
+    assert len([s for s in statement if s.startswith("SELECT")]) == 3
+    assert isinstance(completa, AgenziaCompleta)
+    assert completa.agenzia == Agenzia(1, "Immobiliare Roma", "Via Roma 1")
+    assert list(completa.agenti) == [101, 102]
+    assert completa.agenti[101] == Agente(101, "Mario Rossi", "mario@example.com", 1)
+    assert [p.id_proprieta for p in completa.proprieta[101]] == [1001, 1002]
+    assert completa.proprieta[102] == []
+    assert all(completa.agente_di(p) is completa.agenti[101] for p in completa.tutte_le_proprieta())
+    assert gestore.get_agenzia_completa(99) is None
+
+    gestore.close()
+
+
+def test_agenzie_complete(empty_db):
+    """Verifica la versione per tutte le agenzie e per un elenco di ID."""
+    gestore = GestoreImmobiliare(empty_db)
+    _popola(gestore)
+
+    tutte = gestore.get_agenzie_complete()
+    assert list(tutte) == [1, 2, 3]
+    assert tutte[3].agenti == {} and tutte[3].proprieta == {}
+    for id_agenzia, completa in tutte.items():
+        assert list(completa.agenti.values()) == gestore.get_agenti_per_agenzia(id_agenzia)
+        assert sorted(completa.tutte_le_proprieta(), key=lambda p: p.id_proprieta) == sorted(
+            gestore.get_proprieta_per_agenzia(id_agenzia), key=lambda p: p.id_proprieta
+        )
+
+    scelte = gestore.get_agenzie_complete([2, 99, 1, 2])
+    assert list(scelte) == [1, 2]
+    assert scelte[2] == tutte[2]
+
+    gestore.close()
+
+
+def test_istantanea_coerente(empty_db):
+    """Verifica che una scrittura confermata tra una query e l'altra non venga vista a metà."""
+    gestore = GestoreImmobiliare(empty_db, profilo="balanced", connessioni_lettura=1)
+    _popola(gestore)
+    scrittore = GestoreImmobiliare(empty_db)
+    originale = gestore._righe_agente
+    scrittura_fatta = []
+
+    def scrivi_durante_la_lettura(cursor, riga):
+        if not scrittura_fatta:
+            scrittura_fatta.append(True)
+            scrittore.add_proprieta(Proprieta(1003, "Via D", 1.0, "In vendita", 102))
+        return originale(cursor, riga)
+
+    gestore._righe_agente = scrivi_durante_la_lettura
+    completa = gestore.get_agenzia_completa(1)
+    gestore._righe_agente = originale
+
+    assert completa.proprieta[102] == []
+    assert len(gestore.get_agenzia_completa(1).proprieta[102]) == 1
+
+    scrittore.close()
+    gestore.close()
@@ -0,0 +1,93 @@
+"""
+Test per gli aggiornamenti di stato in blocco (aggiorna_stato_proprieta_many / _dove).
+"""
+
+import pytest
+
+from immobiliare_manager import (
+    Agenzia,
+    Agente,
+    Proprieta,
+    GestoreImmobiliare,
+)
+
+
+def _popola(gestore):
+    gestore.add_agenzie([Agenzia(1, "Immobiliare Roma", "Via Roma 1"), Agenzia(2, "Casa Milano", "Corso Como 5")])
+    gestore.add_agenti([
+        Agente(101, "Mario Rossi", "mario@example.com", 1),
+        Agente(201, "Giuseppe Verdi", "giuseppe@example.com", 2),
+    ])
+    gestore.add_proprieta_many(
+        Proprieta(1000 + i, f"Via {i}", 10000.0 * i, "In vendita", 101 if i < 40 else 201) for i in range(50)
+    )
+
+
+def _stati(gestore):
+    return dict(gestore.conn.execute("SELECT id_proprieta, stato FROM proprieta"))
+
+
+def test_aggiornamento_per_id(empty_db):
+    """Verifica l'aggiornamento da un generatore di ID, a blocchi, con ID inesistenti e ripetuti."""
+    gestore = GestoreImmobiliare(empty_db, cache=10)
+    _popola(gestore)
+    assert gestore.get_proprieta_per_agente(101)[0].stato == "In vendita"
+
+    modificate = gestore.aggiorna_stato_proprieta_many(
+        (1000 + i for i in [*range(25), 3, 999]), "Venduto", dimensione_blocco=7
+    )
+
+    assert modificate == 25
+    stati = _stati(gestore)
+    assert sum(s == "Venduto" for s in stati.values()) == 25
+    assert gestore.get_proprieta_per_agente(101)[0].stato == "Venduto", "La cache va invalidata"
+    assert gestore.aggiorna_stato_proprieta_many([1000, 1001], "Venduto") == 0
+
+    gestore.close()
+
+
+def test_aggiornamento_per_coppie(empty_db):
+    """Verifica le coppie (id, stato): raggruppate per stato, con l'ultima coppia che prevale."""
+    gestore = GestoreImmobiliare(empty_db)
+    _popola(gestore)
+
+    modificate = gestore.aggiorna_stato_proprieta_many(
+        [(1000, "Venduto"), (1001, "In affitto"), (1002, "Venduto"), (1000, "In affitto"), (1003, "In vendita")]
+    )
+
+    assert modificate == 3
+    stati = _stati(gestore)
+    assert (stati[1000], stati[1001], stati[1002], stati[1003]) == ("In affitto", "In affitto", "Venduto", "In vendita")
+
+    gestore.close()
+
+
+def test_aggiornamento_per_filtri(empty_db):
+    """Verifica l'aggiornamento per predicato, anche per agenzia, e il rifiuto senza filtri."""
+    gestore = GestoreImmobiliare(empty_db)
+    _popola(gestore)
+
+    assert gestore.aggiorna_stato_proprieta_dove("Venduto", stato="In vendita", id_agente=101, prezzo_max=95000) == 10
+    assert gestore.aggiorna_stato_proprieta_dove("In affitto", id_agenzia=2) == 10
+    stati = _stati(gestore)
+    assert [stati[1000 + i] for i in (0, 9, 10, 39, 40)] == ["Venduto", "Venduto", "In vendita", "In vendita", "In affitto"]
+
+    with pytest.raises(ValueError):
+        gestore.aggiorna_stato_proprieta_dove("Venduto")
+
+    gestore.close()
+
+
+def test_aggiornamento_atomico(empty_db):
+    """Verifica che l'aggiornamento in blocco entri nella transazione aperta e venga annullato con essa."""
+    gestore = GestoreImmobiliare(empty_db)
+    _popola(gestore)
+
+    with pytest.raises(RuntimeError):
+        with gestore.transaction():
+            gestore.aggiorna_stato_proprieta_many(range(1000, 1050), "Venduto", dimensione_blocco=10)
+            raise RuntimeError("annulla")
+
+    assert set(_stati(gestore).values()) == {"In vendita"}
+
+    gestore.close()
@@ -0,0 +1,183 @@
+"""
+Test per la cache in-process opzionale di GestoreImmobiliare.
+"""
+
+import threading
+import time
+
+import pytest
+
+from immobiliare_manager import (
+    Agenzia,
+    Agente,
+    Proprieta,
+    GestoreImmobiliare,
+)
+
+
+@pytest.fixture
+def gestore(empty_db):
+    gestore = GestoreImmobiliare(empty_db, cache=3)
+    gestore.add_agenzie([
+        Agenzia(1, "Immobiliare Roma", "Via Roma 1"),
+        Agenzia(2, "Casa & Appartamenti", "Piazza Milano 5"),
+    ])
+    gestore.add_agenti([
+        Agente(101, "Mario Rossi", "mario@example.com", 1),
+        Agente(201, "Laura Bianchi", "laura@example.com", 2),
+    ])
+    gestore.add_proprieta(Proprieta(1001, "Via A", 100000.0, "In vendita", 101))
+    yield gestore
+    gestore.close()
+
+
+def test_senza_cache(empty_db):
+    """Verifica che la cache sia disattivata per default."""
+    gestore = GestoreImmobiliare(empty_db)
+    assert gestore.statistiche_cache() is None
+    gestore.close()
+
+
+def test_hit_e_miss(gestore):
+    """Verifica che letture ripetute siano servite dalla cache."""
+    primo = gestore.get_agenti_per_agenzia(1)
+    secondo = gestore.get_agenti_per_agenzia(1)
+
+    assert primo == secondo
+    assert primo is not secondo, "La lista restituita deve essere una copia"
+    statistiche = gestore.statistiche_cache()
+    assert (statistiche.hit, statistiche.miss) == (1, 1)
+
+
+def test_entita_restituite_modificabili(gestore):
+    """Verifica che modificare le entità lette non alteri le letture successive dalla cache."""
+    gestore.get_agenti_per_agenzia(1)[0].nome = "Modificato"
+    gestore.get_agenti_per_agenzia(1)[0].nome = "Modificato"
+    gestore.get_proprieta_per_agenti([101])[101][0].prezzo = 1.0
+    gestore.get_proprieta_per_agenti([101])[101][0].prezzo = 1.0
+    gestore.get_best_agente_per_agenzia()[1].email = "altro@example.com"
+
+    assert gestore.get_agenti_per_agenzia(1)[0].nome == "Mario Rossi"
+    assert gestore.get_proprieta_per_agente(101)[0].prezzo == 100000.0
+    assert gestore.get_best_agente_per_agenzia()[1].email == "mario@example.com"
+    assert gestore.statistiche_cache().hit >= 4
+
+
+def test_invalidazione_mirata(gestore):
+    """Verifica che una scrittura invalidi solo le voci che la riguardano."""
+    gestore.get_proprieta_per_agenzia(1)
+    gestore.get_proprieta_per_agenzia(2)
+    gestore.get_proprieta_per_agente(101)
+
+    gestore.aggiorna_stato_proprieta(1001, "Venduto")
+
+    assert gestore.get_proprieta_per_agente(101)[0].stato == "Venduto"
+    assert gestore.get_proprieta_per_agenzia(1)[0].stato == "Venduto"
+    gestore.get_proprieta_per_agenzia(2)
+    statistiche = gestore.statistiche_cache()
+    assert statistiche.invalidazioni == 2
+    assert statistiche.hit == 1, "L'agenzia 2 non doveva essere invalidata"
+
+    gestore.add_proprieta(Proprieta(2001, "Via B", 150000.0, "In vendita", 201))
+    assert len(gestore.get_proprieta_per_agenzia(2)) == 1
+
+    gestore.add_agente(Agente(102, "Giuseppe Verdi", "giuseppe@example.com", 1))
+    assert len(gestore.get_agenti_per_agenzia(1)) == 2
+
+
+def test_best_agente_invalidato(gestore):
+    """Verifica che la classifica in cache segua gli inserimenti di proprietà."""
+    gestore.add_agente(Agente(102, "Giuseppe Verdi", "giuseppe@example.com", 1))
+    assert gestore.get_best_agente_per_agenzia()[1].id_agente == 101
+
+    gestore.add_proprieta_many([
+        Proprieta(1002, "Via C", 100000.0, "In vendita", 102),
+        Proprieta(1003, "Via D", 100000.0, "In vendita", 102),
+    ])
+
+    assert gestore.get_best_agente_per_agenzia()[1].id_agente == 102
+
+
+def test_espulsione_lru(gestore):
+    """Verifica che oltre la capacità venga espulsa la voce usata meno di recente."""
+    gestore.get_agenti_per_agenzia(1)
+    gestore.get_agenti_per_agenzia(2)
+    gestore.get_proprieta_per_agente(101)
+    gestore.get_agenti_per_agenzia(1)  # ora la meno recente è l'agenzia 2
+    gestore.get_proprieta_per_agente(201)
+
+    assert gestore.statistiche_cache().espulsioni == 1
+    gestore.get_agenti_per_agenzia(1)
+    assert gestore.statistiche_cache().hit == 2
+    gestore.get_agenti_per_agenzia(2)
+    assert gestore.statistiche_cache().miss == 5
+
+
+def test_rollback_svuota_la_cache(gestore):
+    """Verifica che dati letti in una transazione annullata non restino in cache."""
+    with pytest.raises(RuntimeError):
+        with gestore.transaction():
+            gestore.add_agente(Agente(102, "Giuseppe Verdi", "giuseppe@example.com", 1))
+            assert len(gestore.get_agenti_per_agenzia(1)) == 2
+            raise RuntimeError("annulla")
+
+    assert len(gestore.get_agenti_per_agenzia(1)) == 1
+
+
+def test_scadenza_ttl(empty_db):
+    """Verifica che le voci scadute vengano rilette dal database."""
+    gestore = GestoreImmobiliare(empty_db, cache=10, cache_ttl=0.01)
+    gestore.get_agenti_per_agenzia(1)
+    time.sleep(0.02)
+    gestore.get_agenti_per_agenzia(1)
+
+    statistiche = gestore.statistiche_cache()
+    assert (statistiche.hit, statistiche.miss, statistiche.espulsioni) == (0, 2, 1)
+
+    gestore.close()
+
+
+@pytest.fixture
+def gestore_con_pool(empty_db):
+    gestore = GestoreImmobiliare(empty_db, "balanced", cache=10, connessioni_lettura=2)
+    gestore.add_agenzia(Agenzia(1, "Immobiliare Roma", "Via Roma 1"))
+    gestore.add_agente(Agente(101, "Mario Rossi", "mario@example.com", 1))
+    yield gestore
+    gestore.close()
+
+
+def test_letture_concorrenti_durante_la_transazione(gestore_con_pool):
+    """Verifica che una lettura di un altro thread prima del COMMIT non lasci dati vecchi in cache."""
+    gestore = gestore_con_pool
+    letture = []
+
+    def leggi():
+        letture.append(gestore.get_proprieta_per_agente(101))
+
+    with gestore.transaction():
+        gestore.add_proprieta(Proprieta(1001, "Via A", 100000.0, "In vendita", 101))
+        lettore = threading.Thread(target=leggi)
+        lettore.start()
+        lettore.join()
+        assert len(gestore.get_proprieta_per_agente(101)) == 1
+
+    assert letture == [[]]
+    assert len(gestore.get_proprieta_per_agente(101)) == 1
+    assert len(gestore.get_proprieta_per_agenzia(1)) == 1
+
+
+def test_lettura_superata_da_una_scrittura_non_entra_in_cache(gestore_con_pool):
+    """Verifica che un valore letto prima di una scrittura confermata non venga memorizzato."""
+    gestore = gestore_con_pool
+
+    def lettura_lenta():
+        # La lettura avviene prima che un altro thread inserisca e confermi.
+        vecchie = list(gestore.conn.execute("SELECT * FROM proprieta WHERE id_agente = 101"))
+        scrittore = threading.Thread(target=gestore.add_proprieta,
+                                     args=(Proprieta(1001, "Via A", 1.0, "In vendita", 101),))
+        scrittore.start()
+        scrittore.join()
+        return vecchie
+
+    assert gestore._da_cache(("proprieta_per_agente", 101), lettura_lenta) == []
+    assert len(gestore.get_proprieta_per_agente(101)) == 1
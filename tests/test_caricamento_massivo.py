@@ -0,0 +1,67 @@
+"""
+Test per il caricamento massivo (add_agenzie, add_agenti, add_proprieta_many).
+"""
+
+import sqlite3
+
+from immobiliare_manager import (
+    Agenzia,
+    Agente,
+    Proprieta,
+    GestoreImmobiliare,
+)
+
+
+def test_caricamento_da_generatore(empty_db):
+    """Verifica che i metodi massivi accettino generatori e inseriscano tutte le righe."""
+    gestore = GestoreImmobiliare(empty_db)
+
+    esito = gestore.add_agenzie((Agenzia(i, f"Agenzia {i}", f"Via {i}") for i in range(1, 4)))
+    assert esito.inseriti == 3
+    assert esito.errori == []
+
+    gestore.add_agenti(Agente(100 + i, f"Agente {i}", f"a{i}@example.com", 1) for i in range(5))
+    esito = gestore.add_proprieta_many(
+        (Proprieta(1000 + i, f"Via P {i}", 1000.0 * i, "In vendita", 100 + i % 5) for i in range(250)),
+        dimensione_blocco=100,
+    )
+
+    assert esito.inseriti == 250
+    assert len(gestore.get_proprieta_per_agenzia(1)) == 250
+
+    gestore.close()
+
+
+def test_blocchi_con_violazioni_scartati_senza_interrompere(empty_db):
+    """Verifica che un blocco con FK o PK violata venga scartato e gli altri inseriti."""
+    gestore = GestoreImmobiliare(empty_db)
+    gestore.add_agenzia(Agenzia(1, "Immobiliare Roma", "Via Roma 1"))
+
+    agenti = [
+        Agente(101, "Mario Rossi", "mario@example.com", 1),
+        Agente(102, "Laura Bianchi", "laura@example.com", 1),
+        Agente(103, "Agenzia inesistente", "x@example.com", 99),  # FK violata
+        Agente(104, "Giuseppe Verdi", "giuseppe@example.com", 1),
+        Agente(101, "Duplicato", "dup@example.com", 1),  # PK violata
+        Agente(105, "Anna Neri", "anna@example.com", 1),
+    ]
+    esito = gestore.add_agenti(agenti, dimensione_blocco=2)
+
+    assert esito.inseriti == 2
+    assert esito.scartati == 4
+    assert [e.blocco for e in esito.errori] == [1, 2]
+    assert {a.id_agente for a in gestore.get_agenti_per_agenzia(1)} == {101, 102}
+
+    gestore.close()
+
+
+def test_caricamento_visibile_da_altre_connessioni(empty_db):
+    """Verifica che il caricamento venga confermato al termine."""
+    gestore = GestoreImmobiliare(empty_db)
+    gestore.add_agenzie([Agenzia(1, "Immobiliare Roma", "Via Roma 1")])
+
+    conn = sqlite3.connect(empty_db)
+    assert conn.execute("SELECT COUNT(*) FROM agenzie").fetchone()[0] == 1
+    conn.close()
+
+    gestore.close()
@@ -0,0 +1,83 @@
+"""
+Test per get_best_agente_per_agenzia con funzioni finestra e conteggi mantenuti dai trigger.
+"""
+
+import pytest
+
+from immobiliare_manager import (
+    Agenzia,
+    Agente,
+    Proprieta,
+    GestoreImmobiliare,
+)
+
+
+def _popola(gestore):
+    gestore.add_agenzie([
+        Agenzia(1, "Immobiliare Roma", "Via Roma 1"),
+        Agenzia(2, "Casa & Appartamenti", "Piazza Milano 5"),
+        Agenzia(3, "Senza agenti", "Corso Napoli 100"),
+    ])
+    gestore.add_agenti([
+        Agente(101, "Mario Rossi", "mario@example.com", 1),
+        Agente(102, "Laura Bianchi", "laura@example.com", 1),
+        Agente(201, "Giuseppe Verdi", "giuseppe@example.com", 2),
+        Agente(202, "Anna Neri", "anna@example.com", 2),
+    ])
+    gestore.add_proprieta_many([
+        Proprieta(1001, "Via A", 100000.0, "In vendita", 101),
+        Proprieta(1002, "Via B", 150000.0, "In vendita", 102),
+        Proprieta(1003, "Via C", 200000.0, "In vendita", 102),
+        Proprieta(2001, "Via D", 120000.0, "In vendita", 201),
+    ])
+
+
+def _conteggi(gestore):
+    return dict(gestore.conn.execute("SELECT id_agente, conteggio_proprieta FROM conteggi_agenti"))
+
+
+@pytest.mark.parametrize("conteggi", [False, True])
+def test_best_agente_una_riga_per_agenzia(empty_db, conteggi):
+    """Verifica il risultato con e senza conteggi materializzati."""
+    gestore = GestoreImmobiliare(empty_db, conteggi_proprieta=conteggi)
+    _popola(gestore)
+
+    result = gestore.get_best_agente_per_agenzia()
+
+    assert set(result) == {1, 2}
+    assert result[1] == Agente(102, "Laura Bianchi", "laura@example.com", 1)
+    assert result[2].id_agente == 201
+
+    gestore.close()
+
+
+def test_conteggi_popolati_su_database_esistente(empty_db):
+    """Verifica che abilitare i conteggi su dati esistenti li calcoli correttamente."""
+    gestore = GestoreImmobiliare(empty_db)
+    _popola(gestore)
+    gestore.close()
+
+    gestore = GestoreImmobiliare(empty_db, conteggi_proprieta=True)
+
+    assert _conteggi(gestore) == {101: 1, 102: 2, 201: 1, 202: 0}
+
+    gestore.close()
+
+
+def test_conteggi_mantenuti_su_insert_delete_e_riassegnazione(empty_db):
+    """Verifica che i trigger tengano aggiornati i conteggi a ogni modifica."""
+    gestore = GestoreImmobiliare(empty_db, conteggi_proprieta=True)
+    _popola(gestore)
+
+    gestore.add_proprieta(Proprieta(2002, "Via E", 130000.0, "In vendita", 202))
+    gestore.add_proprieta(Proprieta(2003, "Via F", 140000.0, "In vendita", 202))
+    assert gestore.get_best_agente_per_agenzia()[2].id_agente == 202
+
+    with gestore.transaction():
+        gestore.conn.execute("DELETE FROM proprieta WHERE id_proprieta = 1003")
+        gestore.conn.execute("UPDATE proprieta SET id_agente = 101 WHERE id_proprieta = 1002")
+
+    assert _conteggi(gestore) == {101: 2, 102: 0, 201: 1, 202: 2}
+    assert gestore.get_best_agente_per_agenzia()[1].id_agente == 101
+
+    gestore.close()
@@ -0,0 +1,114 @@
+"""
+Test per l'esportazione colonnare delle proprietà (get_colonne_proprieta).
+"""
+
+from array import array
+
+import pytest
+
+import immobiliare_manager
+from immobiliare_manager import (
+    Agenzia,
+    Agente,
+    Proprieta,
+    ColonneProprieta,
+    GestoreImmobiliare,
+)
+
+
+def _popola(gestore):
+    gestore.add_agenzie([Agenzia(1, "Immobiliare Roma", "Via Roma 1"), Agenzia(2, "Casa Milano", "Corso Como 5")])
+    gestore.add_agenti([
+        Agente(101, "Mario Rossi", "mario@example.com", 1),
+        Agente(102, "Laura Bianchi", "laura@example.com", 1),
+        Agente(201, "Giuseppe Verdi", "giuseppe@example.com", 2),
+    ])
+    stati = ["In vendita", "Venduto", "In affitto"]
+    gestore.add_proprieta_many(
+        Proprieta(1000 + i, f"Via {i}", 1000.0 * i, stati[i % 3], (101, 102, 201)[i % 3])
+        for i in range(30)
+    )
+
+
+def test_colonne_array(empty_db):
+    """Verifica le colonne tipizzate senza NumPy e la codifica a dizionario dello stato."""
+    gestore = GestoreImmobiliare(empty_db)
+    _popola(gestore)
+
+    colonne = gestore.get_colonne_proprieta(id_agenzia=1, usa_numpy=False, dimensione_batch=4)
+    attese = gestore.get_proprieta_per_agenzia(1)
+
+    assert isinstance(colonne, ColonneProprieta)
+    assert len(colonne) == len(attese) == 20
+    assert (colonne.id_proprieta.typecode, colonne.id_agente.typecode) == ("q", "q")
+    assert (colonne.prezzo.typecode, colonne.stato.typecode) == ("d", "i")
+    assert sorted(colonne.id_proprieta) == sorted(p.id_proprieta for p in attese)
+    per_id = {p.id_proprieta: p for p in attese}
+    for i, id_proprieta in enumerate(colonne.id_proprieta):
+        assert colonne.id_agente[i] == per_id[id_proprieta].id_agente
+        assert colonne.prezzo[i] == per_id[id_proprieta].prezzo
+        assert colonne.categorie_stato[colonne.stato[i]] == per_id[id_proprieta].stato
+    assert sorted(set(colonne.categorie_stato)) == ["In vendita", "Venduto"]
+
+    gestore.close()
+
+
+def test_colonne_filtri_e_vuoto(empty_db):
+    """Verifica i filtri, il risultato vuoto e la validazione degli argomenti."""
+    gestore = GestoreImmobiliare(empty_db)
+    _popola(gestore)
+
+    colonne = gestore.get_colonne_proprieta(stato="Venduto", prezzo_min=10000, usa_numpy=False)
+    assert colonne.stati() == ["Venduto"] * len(colonne)
+    assert all(p >= 10000 for p in colonne.prezzo)
+
+    vuote = gestore.get_colonne_proprieta(id_agente=999, usa_numpy=False)
+    assert len(vuote) == 0 and vuote.categorie_stato == []
+    assert vuote.prezzo == array("d")
+
+    with pytest.raises(ValueError):
+        gestore.get_colonne_proprieta(dimensione_batch=0)
+
+    gestore.close()
+
+
+def test_colonne_numpy(empty_db, monkeypatch):
+    """Verifica gli ndarray con NumPy e l'errore se NumPy è richiesto ma assente."""
+    gestore = GestoreImmobiliare(empty_db)
+    _popola(gestore)
+
+    if immobiliare_manager.numpy is None:
+        with pytest.raises(ImportError):
+            gestore.get_colonne_proprieta(usa_numpy=True)
+        assert isinstance(gestore.get_colonne_proprieta().prezzo, array)
+    else:
+        colonne = gestore.get_colonne_proprieta()
+        assert str(colonne.id_proprieta.dtype) == "int64"
+        assert str(colonne.prezzo.dtype) == "float64"
+        assert str(colonne.stato.dtype) == "int32"
+        assert colonne.prezzo.sum() == sum(1000.0 * i for i in range(30))
+
+        monkeypatch.setattr(immobiliare_manager, "numpy", None)
+        assert isinstance(gestore.get_colonne_proprieta().prezzo, array)
+
+    gestore.close()
+
+
+def test_categorie_stato_in_ordine_di_comparsa(empty_db):
+    """Verifica che i codici dello stato seguano l'ordine in cui gli stati compaiono."""
+    gestore = GestoreImmobiliare(empty_db)
+    gestore.add_agenzia(Agenzia(1, "Immobiliare Roma", "Via Roma 1"))
+    gestore.add_agente(Agente(101, "Mario Rossi", "mario@example.com", 1))
+    stati = ["Venduto", "In vendita", "Ritirato", "In affitto", "Riservato", "Affittato",
+             "Archiviato", "Bozza", "Sospeso", "Prenotato", "Scaduto", "Compromesso"]
+    gestore.add_proprieta_many(
+        Proprieta(1000 + i, f"Via {i}", 1000.0, stato, 101)
+        for i, stato in enumerate(stati + stati[::-1])
+    )
+
+    colonne = gestore.get_colonne_proprieta(usa_numpy=False, dimensione_batch=5)
+
+    assert colonne.categorie_stato == stati
+    assert list(colonne.stato) == list(range(len(stati))) + list(range(len(stati)))[::-1]
+
+    gestore.close()
@@ -0,0 +1,53 @@
+"""
+Test per il generatore di dati dei benchmark e il confronto dei risultati.
+"""
+
+from collections import Counter
+from dataclasses import astuple
+
+from immobiliare_manager import GestoreImmobiliare
+
+from benchmarks.bench_suite import confronta
+from benchmarks.dati_sintetici import DatiSintetici
+
+
+def test_dati_deterministici_e_asimmetrici():
+    """Verifica che lo stesso seme produca gli stessi dati e che le proprietà si concentrino sui primi agenti."""
+    dati = DatiSintetici(5000, seme=7)
+    proprieta = [astuple(p) for p in dati.proprieta()]
+
+    assert proprieta == [astuple(p) for p in DatiSintetici(5000, seme=7).proprieta()]
+    assert proprieta != [astuple(p) for p in DatiSintetici(5000, seme=8).proprieta()]
+    assert list(map(astuple, dati.agenti())) == list(map(astuple, dati.agenti()))
+    assert (dati.n_agenzie, dati.n_agenti) == (5, 200)
+
+    per_agente = Counter(p[4] for p in proprieta)
+    assert set(per_agente) <= set(range(1, dati.n_agenti + 1))
+    assert per_agente[1] > 10 * len(proprieta) / dati.n_agenti
+    assert per_agente[1] > per_agente[50]
+
+
+def test_dati_caricabili(empty_db):
+    """Verifica che i dati generati rispettino le chiavi esterne del gestore."""
+    dati = DatiSintetici(2000)
+    gestore = GestoreImmobiliare(empty_db)
+
+    scartati = [
+        gestore.add_agenzie(dati.agenzie()).scartati,
+        gestore.add_agenti(dati.agenti()).scartati,
+        gestore.add_proprieta_many(dati.proprieta()).scartati,
+    ]
+
+    assert scartati == [0, 0, 0]
+    assert sum(len(gestore.get_proprieta_per_agenzia(i)) for i in range(1, dati.n_agenzie + 1)) == 2000
+    gestore.close()
+
+
+def test_confronta_segnala_regressioni():
+    """Verifica che il confronto segnali solo le mediane peggiorate oltre la soglia."""
+    def documento(**mediane):
+        return {"risultati": {"1000": {nome: {"mediana_ms": m} for nome, m in mediane.items()}}}
+
+    righe = confronta(documento(a=1.1, b=1.5, c=0.5), documento(a=1.0, b=1.0, d=1.0), soglia=0.2)
+
+    assert [(r[1], r[-1]) for r in righe] == [("a", False), ("b", True)]
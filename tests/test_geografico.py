@@ -0,0 +1,138 @@
+"""
+Test per le coordinate delle proprietà e le ricerche per area e per raggio.
+"""
+
+import sqlite3
+
+import pytest
+
+from immobiliare_manager import (
+    Agenzia,
+    Agente,
+    Proprieta,
+    GestoreImmobiliare,
+)
+
+
+COLOSSEO = (41.8902, 12.4922)
+
+
+def _popola(gestore):
+    gestore.add_agenzie([Agenzia(1, "Immobiliare Roma", "Via Roma 1"), Agenzia(2, "Casa Milano", "Corso Como 5")])
+    gestore.add_agenti([
+        Agente(101, "Mario Rossi", "mario@example.com", 1),
+        Agente(201, "Giuseppe Verdi", "giuseppe@example.com", 2),
+    ])
+    gestore.add_proprieta_many([
+        Proprieta(1001, "Piazza del Colosseo 1", 500000.0, "In vendita", 101, *COLOSSEO),
+        Proprieta(1002, "Via Marsala 1 (Termini)", 300000.0, "Venduto", 101, 41.9010, 12.5016),
+        Proprieta(1003, "Piazza San Pietro", 900000.0, "In vendita", 101, 41.9022, 12.4568),
+        Proprieta(1004, "Piazza del Duomo, Milano", 800000.0, "In vendita", 201, 45.4642, 9.1900),
+        Proprieta(1005, "Senza coordinate", 100000.0, "In vendita", 101),
+    ])
+
+
+def _ids(risultati):
+    return sorted(p.id_proprieta for p in risultati)
+
+
+def test_coordinate_opzionali(empty_db):
+    """Verifica che le coordinate siano salvate e che valgano None se assenti."""
+    gestore = GestoreImmobiliare(empty_db)
+    _popola(gestore)
+
+    per_id = {p.id_proprieta: p for p in gestore.get_proprieta_per_agente(101)}
+    assert (per_id[1001].latitudine, per_id[1001].longitudine) == COLOSSEO
+    assert per_id[1005].latitudine is None and per_id[1005].longitudine is None
+    assert per_id[1005] == Proprieta(1005, "Senza coordinate", 100000.0, "In vendita", 101)
+
+    gestore.close()
+
+
+@pytest.mark.parametrize("indice", [False, True])
+def test_ricerca_per_raggio_e_area(empty_db, indice):
+    """Verifica raggio, ordinamento per distanza, limit, filtri e rettangoli, con e senza R*Tree."""
+    gestore = GestoreImmobiliare(empty_db, indice_geografico=indice)
+    _popola(gestore)
+
+    vicine = gestore.get_proprieta_nel_raggio(*COLOSSEO, 2)
+    assert [p.id_proprieta for p, _ in vicine] == [1001, 1002]
+    assert vicine[0][1] == 0.0
+    assert vicine[1][1] == pytest.approx(1.43, abs=0.01)
+
+    assert [p.id_proprieta for p, _ in gestore.get_proprieta_nel_raggio(*COLOSSEO, 5)] == [1001, 1002, 1003]
+    assert len(gestore.get_proprieta_nel_raggio(*COLOSSEO, 5, limit=1)) == 1
+    assert [p.id_proprieta for p, _ in gestore.get_proprieta_nel_raggio(*COLOSSEO, 5, stato="Venduto")] == [1002]
+    assert [p.id_proprieta for p, _ in gestore.get_proprieta_nel_raggio(*COLOSSEO, 1000, id_agenzia=2)] == [1004]
+
+    assert _ids(gestore.get_proprieta_in_area(41.8, 42.0, 12.4, 12.6)) == [1001, 1002, 1003]
+    assert _ids(gestore.get_proprieta_in_area(41.8, 42.0, 12.4, 12.6, prezzo_min=400000)) == [1001, 1003]
+    assert _ids(gestore.get_proprieta_in_area(-90, 90, -180, 180)) == [1001, 1002, 1003, 1004]
+
+    with pytest.raises(ValueError):
+        gestore.get_proprieta_nel_raggio(*COLOSSEO, -1)
+
+    gestore.close()
+
+
+@pytest.mark.parametrize("indice", [False, True])
+def test_antimeridiano(empty_db, indice):
+    """Verifica i rettangoli e i cerchi che attraversano la longitudine 180."""
+    gestore = GestoreImmobiliare(empty_db, indice_geografico=indice)
+    gestore.add_agenzia(Agenzia(1, "Figi", "Suva"))
+    gestore.add_agente(Agente(101, "Agente", "agente@example.com", 1))
+    gestore.add_proprieta_many([
+        Proprieta(1, "Est", 1.0, "In vendita", 101, -16.5, 179.95),
+        Proprieta(2, "Ovest", 1.0, "In vendita", 101, -16.5, -179.95),
+        Proprieta(3, "Lontana", 1.0, "In vendita", 101, -16.5, 0.0),
+    ])
+
+    assert _ids(gestore.get_proprieta_in_area(-17, -16, 179, -179)) == [1, 2]
+    assert [p.id_proprieta for p, _ in gestore.get_proprieta_nel_raggio(-16.5, 179.99, 20)] == [1, 2]
+
+    gestore.close()
+
+
+def test_indice_aggiornato_dai_trigger(empty_db):
+    """Verifica che l'R*Tree venga costruito sui dati esistenti e segua le modifiche."""
+    gestore = GestoreImmobiliare(empty_db)
+    _popola(gestore)
+    gestore.close()
+
+    gestore = GestoreImmobiliare(empty_db, indice_geografico=True)
+    assert gestore.conn.execute("SELECT COUNT(*) FROM posizioni_proprieta").fetchone()[0] == 4
+
+    with gestore.transaction():
+        gestore.conn.execute("UPDATE proprieta SET latitudine = 41.8986, longitudine = 12.4769 WHERE id_proprieta = 1005")
+        gestore.conn.execute("UPDATE proprieta SET latitudine = NULL WHERE id_proprieta = 1002")
+        gestore.conn.execute("DELETE FROM proprieta WHERE id_proprieta = 1003")
+
+    assert [p.id_proprieta for p, _ in gestore.get_proprieta_nel_raggio(*COLOSSEO, 5)] == [1001, 1005]
+    assert gestore.conn.execute("SELECT COUNT(*) FROM posizioni_proprieta").fetchone()[0] == 3
+
+    gestore.close()
+
+
+def test_migrazione_database_esistente(empty_db):
+    """Verifica che un database senza colonne di coordinate venga aggiornato all'apertura."""
+    conn = sqlite3.connect(empty_db)
+    conn.executescript(
+        """
+        CREATE TABLE agenzie (id_agenzia INTEGER PRIMARY KEY, nome TEXT NOT NULL, indirizzo TEXT NOT NULL);
+        CREATE TABLE agenti (id_agente INTEGER PRIMARY KEY, nome TEXT NOT NULL, email TEXT NOT NULL,
+                             id_agenzia INTEGER NOT NULL);
+        CREATE TABLE proprieta (id_proprieta INTEGER PRIMARY KEY, indirizzo TEXT NOT NULL,
+                                prezzo REAL NOT NULL, stato TEXT NOT NULL, id_agente INTEGER NOT NULL);
+        INSERT INTO agenzie VALUES (1, 'Immobiliare Roma', 'Via Roma 1');
+        INSERT INTO agenti VALUES (101, 'Mario Rossi', 'mario@example.com', 1);
+        INSERT INTO proprieta VALUES (1001, 'Via Garibaldi 10', 250000.0, 'In vendita', 101);
+        """
+    )
+    conn.close()
+
+    gestore = GestoreImmobiliare(empty_db, indice_geografico=True)
+
+    assert gestore.get_proprieta_per_agente(101) == [Proprieta(1001, "Via Garibaldi 10", 250000.0, "In vendita", 101)]
+    assert gestore.get_proprieta_nel_raggio(*COLOSSEO, 1000) == []
+
+    gestore.close()
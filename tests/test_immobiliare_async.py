@@ -0,0 +1,86 @@
+"""
+Test per la facciata asyncio GestoreImmobiliareAsync.
+"""
+
+import asyncio
+
+import pytest
+
+from immobiliare_async import GestoreImmobiliareAsync
+from immobiliare_manager import (
+    Agenzia,
+    Agente,
+    Proprieta,
+    GestoreImmobiliare,
+)
+
+
+async def _popola(gestore):
+    await gestore.add_agenzia(Agenzia(1, "Immobiliare Roma", "Via Roma 1"))
+    await gestore.add_agente(Agente(101, "Mario Rossi", "mario@example.com", 1))
+    esito = await gestore.add_proprieta_many(
+        Proprieta(1000 + i, f"Via {i}", 1000.0 * i, "In vendita", 101) for i in range(30)
+    )
+    assert esito.inseriti == 30
+
+
+def test_richiede_pool(empty_db):
+    """Verifica che la facciata rifiuti un gestore senza pool di lettura."""
+    gestore = GestoreImmobiliare(empty_db)
+    with pytest.raises(ValueError):
+        GestoreImmobiliareAsync(gestore)
+    gestore.close()
+
+
+def test_query_concorrenti_e_streaming(empty_db):
+    """Verifica query concorrenti con gather e iterazione con async for."""
+    async def scenario():
+        gestore = await GestoreImmobiliareAsync.apri(empty_db, connessioni_lettura=3)
+        await _popola(gestore)
+
+        risultati = await asyncio.gather(*(gestore.get_proprieta_per_agenzia(1) for _ in range(10)))
+        assert all(len(r) == 30 for r in risultati)
+
+        ids = [p.id_proprieta async for p in gestore.iter_proprieta_per_agenzia(1, dimensione_batch=7)]
+        assert ids == [p.id_proprieta for p in risultati[0]]
+
+        best = await gestore.get_best_agente_per_agenzia()
+        assert best[1].id_agente == 101
+
+        await gestore.close()
+
+    asyncio.run(scenario())
+
+
+def test_transazione_asincrona(empty_db):
+    """Verifica commit, rollback e isolamento delle scritture tra coroutine."""
+    async def scenario():
+        gestore = await GestoreImmobiliareAsync.apri(empty_db, connessioni_lettura=2)
+        await _popola(gestore)
+
+        with pytest.raises(RuntimeError):
+            async with gestore.transaction():
+                await gestore.aggiorna_stato_proprieta(1000, "Venduto")
+                assert (await gestore.get_proprieta_per_agente(101))[0].stato == "Venduto"
+                raise RuntimeError("annulla")
+        assert (await gestore.get_proprieta_per_agente(101))[0].stato == "In vendita"
+
+        ordine = []
+
+        async def altra_coroutine():
+            await gestore.add_agente(Agente(102, "Laura Bianchi", "laura@example.com", 1))
+            ordine.append("altra")
+
+        async with gestore:
+            attesa = asyncio.create_task(altra_coroutine())
+            await gestore.aggiorna_stato_proprieta(1001, "Venduto")
+            await asyncio.sleep(0.05)
+            ordine.append("transazione")
+        await attesa
+
+        assert ordine == ["transazione", "altra"], "Le altre coroutine attendono il commit"
+        assert len(await gestore.get_agenti_per_agenzia(1)) == 2
+
+        await gestore.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,147 @@
+"""
+Test per l'importazione parallela da CSV e JSONL (immobiliare_import.importa).
+"""
+
+import json
+
+import pytest
+
+from immobiliare_manager import GestoreImmobiliare
+from immobiliare_import import importa
+from immobiliare_sharding import GestoreImmobiliareSharded
+
+
+def _scrivi_feed(cartella, n_proprieta=50):
+    (cartella / "agenzie.csv").write_text(
+        "id_agenzia,nome,indirizzo\n"
+        "1,Immobiliare Roma,Via Roma 1\n"
+        "\n"
+        '2,"Casa, Milano","Corso Buenos Aires 5\nScala B"\n'
+        "x,Senza ID,Via Nessuna\n",
+        encoding="utf-8",
+    )
+    (cartella / "agenti.csv").write_text(
+        "id_agente,nome,email,id_agenzia\n"
+        "101,Mario Rossi,mario@example.com,1\n"
+        "201,Laura Bianchi,laura@example.com,2\n"
+        "301,Senza Agenzia,nessuno@example.com,3\n"
+        "102,Email Errata,errata,1\n",
+        encoding="utf-8",
+    )
+    righe = [
+        {"id_proprieta": i, "indirizzo": f"Via Verdi {i}", "prezzo": 1000.0 * i,
+         "stato": "In vendita", "id_agente": 101 if i % 2 else 201,
+         "latitudine": 41.9, "longitudine": 12.5}
+        for i in range(1, n_proprieta + 1)
+    ]
+    testo = "\n".join(json.dumps(riga) for riga in righe)
+    testo += '\n{"id_proprieta": 9999, "indirizzo": "Via Orfana", "prezzo": 1, "stato": "x", "id_agente": 999}'
+    testo += '\n{"id_proprieta": 9998, "indirizzo": "Via Cara", "prezzo": -5, "stato": "x", "id_agente": 101}'
+    testo += "\nnon è json\n"
+    (cartella / "proprieta.jsonl").write_text(testo, encoding="utf-8")
+
+
+def _indici(gestore):
+    return {r[0] for r in gestore.conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL")}
+
+
+def test_importa_csv_e_jsonl(empty_db, tmp_path):
+    """Verifica righe inserite, righe non valide con il loro numero e blocchi scartati."""
+    _scrivi_feed(tmp_path)
+    gestore = GestoreImmobiliare(empty_db)
+    indici = _indici(gestore)
+
+    risultato = importa(
+        gestore, agenzie=str(tmp_path / "agenzie.csv"), agenti=str(tmp_path / "agenti.csv"),
+        proprieta=str(tmp_path / "proprieta.jsonl"), processi=0, righe_per_lotto=7,
+        dimensione_blocco=1,
+    )
+    agenzie, agenti, proprieta = (risultato.tabelle[t] for t in ("agenzie", "agenti", "proprieta"))
+
+    assert (agenzie.righe_lette, agenzie.inseriti, agenzie.non_valide) == (3, 2, 1)
+    assert agenzie.righe_non_valide[0].riga == 6
+    assert gestore.get_agenzia_completa(2).agenzia.indirizzo == "Corso Buenos Aires 5\nScala B"
+    assert (agenti.inseriti, agenti.scartati, agenti.non_valide) == (2, 1, 1)
+    assert "FOREIGN KEY" in agenti.errori[0].messaggio
+    assert (proprieta.inseriti, proprieta.scartati, proprieta.non_valide) == (50, 1, 2)
+    assert [r.riga for r in proprieta.righe_non_valide] == [52, 53]
+    assert proprieta.errori[0].blocco == 50 // 7
+    assert len(gestore.get_proprieta_per_agente(101)) == 25
+    assert gestore.get_proprieta_nel_raggio(41.9, 12.5, 1, limit=1)
+    assert _indici(gestore) == indici
+    assert risultato.secondi >= risultato.secondi_indici
+
+    gestore.close()
+
+
+def test_importa_con_pool_di_processi(empty_db, tmp_path):
+    """Verifica l'importazione con un pool reale, una coda di un lotto e il progresso."""
+    _scrivi_feed(tmp_path, n_proprieta=2000)
+    gestore = GestoreImmobiliare(empty_db, "bulk-load", conteggi_proprieta=True)
+    avanzamento = []
+
+    risultato = importa(
+        gestore, agenzie=str(tmp_path / "agenzie.csv"), agenti=str(tmp_path / "agenti.csv"),
+        proprieta=str(tmp_path / "proprieta.jsonl"), processi=2, righe_per_lotto=100,
+        lotti_in_coda=1, dimensione_blocco=1, progresso=lambda tabella, esito: avanzamento.append(
+            (tabella, esito.righe_lette, esito.righe_al_secondo)),
+    )
+
+    assert risultato.tabelle["proprieta"].inseriti == 2000
+    lette = [righe for tabella, righe, _ in avanzamento if tabella == "proprieta"]
+    assert lette == list(range(100, 2001, 100)) + [2003]
+    assert all(velocita > 0 for _, _, velocita in avanzamento)
+    assert gestore.get_best_agente_per_agenzia()[1].id_agente == 101
+
+    gestore.close()
+
+
+def test_importa_in_gestore_sharded(tmp_path):
+    """Verifica che gli errori riportino il lotto anche con blocchi ripartiti su più shard."""
+    _scrivi_feed(tmp_path, n_proprieta=25)
+    (tmp_path / "agenti.csv").write_text(
+        "id_agente,nome,email,id_agenzia\n"
+        "101,Mario Rossi,mario@example.com,1\n"
+        "201,Laura Bianchi,laura@example.com,2\n",
+        encoding="utf-8",
+    )
+    gestore = GestoreImmobiliareSharded(
+        [str(tmp_path / f"shard_{i}.db") for i in range(2)], processi=0
+    )
+
+    risultato = importa(
+        gestore, agenzie=str(tmp_path / "agenzie.csv"), agenti=str(tmp_path / "agenti.csv"),
+        proprieta=str(tmp_path / "proprieta.jsonl"), processi=0, righe_per_lotto=10,
+        dimensione_blocco=4,
+    )
+    proprieta = risultato.tabelle["proprieta"]
+
+    # Ogni lotto diventa più blocchi per shard; l'orfana 9999 è nel terzo lotto.
+    assert (proprieta.inseriti, proprieta.scartati, proprieta.non_valide) == (25, 1, 2)
+    assert [(e.blocco, e.righe) for e in proprieta.errori] == [(2, 1)]
+    assert "FOREIGN KEY" in proprieta.errori[0].messaggio
+    assert len(gestore.get_proprieta_per_agente(101)) == 13
+
+    gestore.close()
+
+
+def test_errore_di_lettura_annulla_tutto(empty_db, tmp_path):
+    """Verifica che un file illeggibile annulli l'importazione e ripristini gli indici."""
+    _scrivi_feed(tmp_path)
+    (tmp_path / "proprieta.csv").write_text("id_proprieta,indirizzo\n1,Via A\n", encoding="utf-8")
+    gestore = GestoreImmobiliare(empty_db)
+    indici = _indici(gestore)
+
+    with pytest.raises(ValueError, match="colonne mancanti"):
+        importa(gestore, agenzie=str(tmp_path / "agenzie.csv"),
+                proprieta=str(tmp_path / "proprieta.csv"), processi=0)
+    with pytest.raises(FileNotFoundError):
+        importa(gestore, agenzie=str(tmp_path / "assente.csv"), processi=0)
+    with pytest.raises(ValueError):
+        importa(gestore, agenzie=str(tmp_path / "agenzie.xml"), processi=0)
+
+    assert gestore.get_agenzia_completa(1) is None
+    assert _indici(gestore) == indici
+
+    gestore.close()
@@ -0,0 +1,105 @@
+"""
+Test per gli indici secondari, le migrazioni dello schema e la manutenzione delle statistiche.
+"""
+
+import sqlite3
+
+from immobiliare_manager import (
+    Agenzia,
+    Agente,
+    Proprieta,
+    GestoreImmobiliare,
+)
+
+
+INDICI_ATTESI = {"idx_agenti_id_agenzia", "idx_proprieta_id_agente", "idx_proprieta_stato_prezzo"}
+
+
+def _indici(db_path):
+    conn = sqlite3.connect(db_path)
+    nomi = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='index'")}
+    conn.close()
+    return nomi
+
+
+def test_indici_creati(empty_db):
+    """Verifica che il costruttore crei gli indici sulle chiavi esterne e sullo stato."""
+    gestore = GestoreImmobiliare(empty_db)
+
+    assert INDICI_ATTESI <= _indici(empty_db)
+
+    gestore.close()
+
+
+def test_migrazione_database_esistente(empty_db):
+    """Verifica che un database creato senza indici venga migrato all'apertura."""
+    conn = sqlite3.connect(empty_db)
+    conn.executescript(
+        """
+        CREATE TABLE agenzie (id_agenzia INTEGER PRIMARY KEY, nome TEXT NOT NULL,
+                              indirizzo TEXT NOT NULL);
+        CREATE TABLE agenti (id_agente INTEGER PRIMARY KEY, nome TEXT NOT NULL,
+                             email TEXT NOT NULL, id_agenzia INTEGER NOT NULL,
+                             FOREIGN KEY (id_agenzia) REFERENCES agenzie(id_agenzia));
+        CREATE TABLE proprieta (id_proprieta INTEGER PRIMARY KEY, indirizzo TEXT NOT NULL,
+                                prezzo REAL NOT NULL, stato TEXT NOT NULL,
+                                id_agente INTEGER NOT NULL,
+                                FOREIGN KEY (id_agente) REFERENCES agenti(id_agente));
+        INSERT INTO agenzie VALUES (1, 'Immobiliare Roma', 'Via Roma 1');
+        """
+    )
+    conn.close()
+    assert not INDICI_ATTESI & _indici(empty_db)
+
+    gestore = GestoreImmobiliare(empty_db)
+
+    assert INDICI_ATTESI <= _indici(empty_db)
+    versione = gestore.conn.execute("PRAGMA user_version").fetchone()[0]
+    assert versione >= 1
+    gestore.close()
+
+    # Una seconda apertura non deve rieseguire le migrazioni
+    GestoreImmobiliare(empty_db).close()
+
+
+def test_query_usano_gli_indici(empty_db):
+    """Verifica che le query per agente e per agenzia non scandiscano l'intera tabella."""
+    gestore = GestoreImmobiliare(empty_db)
+
+    piano = " ".join(
+        row[3]
+        for row in gestore.conn.execute(
+            "EXPLAIN QUERY PLAN SELECT id_proprieta FROM proprieta WHERE id_agente = ?", (1,)
+        )
+    )
+    assert "idx_proprieta_id_agente" in piano
+
+    gestore.close()
+
+
+def test_analyze_e_optimize(empty_db):
+    """Verifica che analyze() popoli le statistiche del pianificatore."""
+    gestore = GestoreImmobiliare(empty_db)
+    gestore.add_agenzia(Agenzia(1, "Immobiliare Roma", "Via Roma 1"))
+    gestore.add_agente(Agente(101, "Mario Rossi", "mario@example.com", 1))
+    gestore.add_proprieta(Proprieta(1001, "Via A", 100000.0, "In vendita", 101))
+
+    gestore.analyze()
+    gestore.optimize()
+
+    tabelle = {row[0] for row in gestore.conn.execute("SELECT tbl FROM sqlite_stat1")}
+    assert {"agenti", "proprieta"} <= tabelle
+
+    gestore.close()
+
+
+def test_optimize_non_limita_analyze(empty_db):
+    """Verifica che dopo optimize() analyze() torni a leggere tutte le righe."""
+    gestore = GestoreImmobiliare(empty_db)
+
+    gestore.optimize()
+    assert gestore.conn.execute("PRAGMA analysis_limit").fetchone()[0] == 0
+    gestore.analyze()
+    assert gestore.conn.execute("PRAGMA analysis_limit").fetchone()[0] == 0
+
+    gestore.close()
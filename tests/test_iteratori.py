@@ -0,0 +1,62 @@
+"""
+Test per le varianti a generatore delle query (iter_*).
+"""
+
+import types
+
+import pytest
+
+from immobiliare_manager import (
+    Agenzia,
+    Agente,
+    Proprieta,
+    GestoreImmobiliare,
+)
+
+
+@pytest.fixture
+def gestore(empty_db):
+    gestore = GestoreImmobiliare(empty_db)
+    gestore.add_agenzia(Agenzia(1, "Immobiliare Roma", "Via Roma 1"))
+    gestore.add_agenti([
+        Agente(101, "Mario Rossi", "mario@example.com", 1),
+        Agente(102, "Laura Bianchi", "laura@example.com", 1),
+    ])
+    gestore.add_proprieta_many(
+        Proprieta(1000 + i, f"Via {i}", 1000.0 * i, "In vendita", 101 + i % 2) for i in range(25)
+    )
+    yield gestore
+    gestore.close()
+
+
+def test_iter_equivalenti_alle_liste(gestore):
+    """Verifica che gli iteratori producano gli stessi elementi dei metodi get_*."""
+    risultato = gestore.iter_proprieta_per_agenzia(1, dimensione_batch=4)
+    assert isinstance(risultato, types.GeneratorType)
+    assert list(risultato) == gestore.get_proprieta_per_agenzia(1)
+
+    assert list(gestore.iter_proprieta_per_agente(101, dimensione_batch=3)) == \
+        gestore.get_proprieta_per_agente(101)
+    assert list(gestore.iter_agenti_per_agenzia(1)) == gestore.get_agenti_per_agenzia(1)
+
+
+def test_iter_interruzione_anticipata(gestore):
+    """Verifica che si possa interrompere l'iterazione e continuare a usare il gestore."""
+    iteratore = gestore.iter_proprieta_per_agenzia(1, dimensione_batch=2)
+    primi = [next(iteratore) for _ in range(3)]
+    iteratore.close()
+
+    assert len(primi) == 3
+    gestore.aggiorna_stato_proprieta(primi[0].id_proprieta, "Venduto")
+    assert len(gestore.get_proprieta_per_agenzia(1)) == 25
+
+
+def test_iter_vuoto(gestore):
+    """Verifica che un'agenzia senza proprietà produca un iteratore vuoto."""
+    assert list(gestore.iter_proprieta_per_agenzia(99)) == []
+
+
+def test_iter_dimensione_batch_non_valida(gestore):
+    """Verifica che una dimensione di batch non positiva venga rifiutata."""
+    with pytest.raises(ValueError):
+        gestore.iter_proprieta_per_agente(101, dimensione_batch=0)
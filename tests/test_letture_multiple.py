@@ -0,0 +1,79 @@
+"""
+Test per le letture su più ID (get_proprieta_per_agenti, get_agenti_per_agenzie).
+"""
+
+import immobiliare_manager
+from immobiliare_manager import (
+    Agenzia,
+    Agente,
+    Proprieta,
+    GestoreImmobiliare,
+)
+
+
+def _popola(gestore, agenzie=3, agenti_per_agenzia=4, proprieta_per_agente=3):
+    gestore.add_agenzie(Agenzia(g, f"Agenzia {g}", f"Via {g}") for g in range(1, agenzie + 1))
+    gestore.add_agenti(
+        Agente(g * 100 + i, f"Agente {g}.{i}", f"a{g}.{i}@example.com", g)
+        for g in range(1, agenzie + 1) for i in range(agenti_per_agenzia)
+    )
+    gestore.add_proprieta_many(
+        Proprieta(a.id_agente * 10 + j, f"Via {a.id_agente}/{j}", 1000.0 * j, "In vendita", a.id_agente)
+        for g in range(1, agenzie + 1) for a in gestore.get_agenti_per_agenzia(g)
+        for j in range(proprieta_per_agente)
+    )
+
+
+def test_risultati_uguali_ai_metodi_singoli(empty_db):
+    """Verifica che ogni lista coincida con quella del metodo per singolo ID, anche per ID senza righe."""
+    gestore = GestoreImmobiliare(empty_db)
+    _popola(gestore)
+
+    ids_agenti = [302, 100, 999, 101, 100]
+    proprieta = gestore.get_proprieta_per_agenti(ids_agenti)
+    assert list(proprieta) == [302, 100, 999, 101]
+    assert all(proprieta[i] == gestore.get_proprieta_per_agente(i) for i in proprieta)
+    assert proprieta[999] == []
+
+    agenti = gestore.get_agenti_per_agenzie(range(0, 4))
+    assert list(agenti) == [0, 1, 2, 3]
+    assert all(agenti[i] == gestore.get_agenti_per_agenzia(i) for i in agenti)
+    assert gestore.get_agenti_per_agenzie([]) == {}
+
+    gestore.close()
+
+
+def test_liste_in_spezzate(empty_db, monkeypatch):
+    """Verifica che le liste IN rispettino il limite di parametri per statement."""
+    gestore = GestoreImmobiliare(empty_db)
+    _popola(gestore, agenzie=5)
+    monkeypatch.setattr(immobiliare_manager, "MASSIMO_PARAMETRI_SQL", 3)
+    statement = []
+    gestore.conn.set_trace_callback(statement.append)
+
+    agenti = gestore.get_agenti_per_agenzie(range(1, 6))
+
+    assert sum(len(v) for v in agenti.values()) == 20
+    assert len([s for s in statement if s.startswith("SELECT")]) == 2
+
+    gestore.close()
+
+
+def test_cache_condivisa_con_i_metodi_singoli(empty_db):
+    """Verifica che le letture multiple usino e popolino le voci della cache dei metodi singoli."""
+    gestore = GestoreImmobiliare(empty_db, cache=50)
+    _popola(gestore)
+    gestore.get_proprieta_per_agente(100)
+    statement = []
+    gestore.conn.set_trace_callback(statement.append)
+
+    risultato = gestore.get_proprieta_per_agenti([100, 101])
+    risultato[100].clear()
+    assert len(gestore.get_proprieta_per_agente(100)) == 3, "La cache non deve essere modificata dal chiamante"
+    gestore.get_proprieta_per_agente(101)
+    assert len([s for s in statement if s.startswith("SELECT")]) == 1
+
+    gestore.add_proprieta(Proprieta(5000, "Via Nuova", 1.0, "In vendita", 101))
+    assert len(gestore.get_proprieta_per_agenti([101])[101]) == 4
+
+    gestore.close()
@@ -0,0 +1,53 @@
+"""
+Test per la mappatura riga → entità e le varianti compatte con __slots__.
+"""
+
+from dataclasses import astuple
+
+from immobiliare_manager import (
+    Agenzia,
+    Agente,
+    AgenteCompatto,
+    Proprieta,
+    ProprietaCompatta,
+    GestoreImmobiliare,
+)
+
+
+def _popola(gestore):
+    gestore.add_agenzia(Agenzia(1, "Immobiliare Roma", "Via Roma 1"))
+    gestore.add_agente(Agente(101, "Mario Rossi", "mario@example.com", 1))
+    gestore.add_proprieta(Proprieta(1001, "Via Garibaldi 10", 250000.0, "In vendita", 101))
+
+
+def test_entita_compatte(empty_db):
+    """Verifica che con entita_compatte=True le query restituiscano le varianti con __slots__."""
+    gestore = GestoreImmobiliare(empty_db)
+    _popola(gestore)
+    compatto = GestoreImmobiliare(empty_db, entita_compatte=True)
+
+    agenti = compatto.get_agenti_per_agenzia(1)
+    proprieta = compatto.get_proprieta_per_agenzia(1)
+
+    assert isinstance(agenti[0], AgenteCompatto)
+    assert isinstance(proprieta[0], ProprietaCompatta)
+    assert not hasattr(proprieta[0], "__dict__")
+    assert astuple(agenti[0]) == astuple(gestore.get_agenti_per_agenzia(1)[0])
+    assert astuple(proprieta[0]) == astuple(gestore.get_proprieta_per_agenzia(1)[0])
+    assert isinstance(next(compatto.iter_proprieta_per_agente(101)), ProprietaCompatta)
+    assert isinstance(compatto.get_best_agente_per_agenzia()[1], AgenteCompatto)
+
+    compatto.close()
+    gestore.close()
+
+
+def test_entita_predefinite(empty_db):
+    """Verifica che per default le query restituiscano le dataclass originali."""
+    gestore = GestoreImmobiliare(empty_db)
+    _popola(gestore)
+
+    assert type(gestore.get_proprieta_per_agente(101)[0]) is Proprieta
+    assert type(gestore.get_pagina_proprieta().elementi[0]) is Proprieta
+    assert type(gestore.get_best_agente_per_agenzia()[1]) is Agente
+
+    gestore.close()
@@ -0,0 +1,96 @@
+"""
+Test per il log delle modifiche (registro_modifiche, changes_since).
+"""
+
+import pytest
+
+from immobiliare_manager import (
+    Agenzia,
+    Agente,
+    Proprieta,
+    Modifica,
+    GestoreImmobiliare,
+)
+
+
+def _riassunto(modifiche):
+    return [(m.tabella, m.operazione, m.chiave) for m in modifiche]
+
+
+def test_scritture_registrate_in_ordine(empty_db):
+    """Verifica che inserimenti, aggiornamenti e cancellazioni vengano registrati con i dati della riga."""
+    gestore = GestoreImmobiliare(empty_db, registro_modifiche=True)
+    assert gestore.ultima_modifica() == 0
+
+    gestore.add_agenzia(Agenzia(1, "Immobiliare Roma", "Via Roma 1"))
+    gestore.add_agente(Agente(101, "Mario Rossi", "mario@example.com", 1))
+    gestore.add_proprieta(Proprieta(1001, "Via Garibaldi 10", 250000.0, "In vendita", 101))
+    gestore.aggiorna_stato_proprieta(1001, "Venduto")
+    with gestore.transaction():
+        gestore.conn.execute("UPDATE proprieta SET id_proprieta = 1002 WHERE id_proprieta = 1001")
+        gestore.conn.execute("DELETE FROM proprieta WHERE id_proprieta = 1002")
+
+    modifiche = list(gestore.changes_since())
+
+    assert _riassunto(modifiche) == [
+        ("agenzie", "INSERT", 1),
+        ("agenti", "INSERT", 101),
+        ("proprieta", "INSERT", 1001),
+        ("proprieta", "UPDATE", 1001),
+        ("proprieta", "DELETE", 1001),
+        ("proprieta", "INSERT", 1002),
+        ("proprieta", "DELETE", 1002),
+    ]
+    assert [m.seq for m in modifiche] == list(range(1, 8))
+    assert modifiche[3] == Modifica(4, "proprieta", "UPDATE", 1001, {
+        "id_proprieta": 1001, "indirizzo": "Via Garibaldi 10", "prezzo": 250000.0, "stato": "Venduto",
+        "id_agente": 101, "latitudine": None, "longitudine": None,
+    })
+    assert modifiche[-1].dati is None
+    assert gestore.ultima_modifica() == 7
+
+    gestore.close()
+
+
+def test_lettura_incrementale_e_potatura(empty_db):
+    """Verifica la lettura a partire da un numero di sequenza, il limite e la potatura del log."""
+    gestore = GestoreImmobiliare(empty_db, registro_modifiche=True)
+    gestore.add_agenzia(Agenzia(1, "Immobiliare Roma", "Via Roma 1"))
+    gestore.add_agente(Agente(101, "Mario Rossi", "mario@example.com", 1))
+    gestore.add_proprieta_many(Proprieta(1000 + i, f"Via {i}", 1000.0, "In vendita", 101) for i in range(20))
+
+    prime = list(gestore.changes_since(0, limit=5, dimensione_batch=2))
+    assert [m.seq for m in prime] == [1, 2, 3, 4, 5]
+    successive = list(gestore.changes_since(prime[-1].seq))
+    assert [m.seq for m in successive] == list(range(6, 23))
+
+    assert gestore.pota_modifiche(20) == 20
+    gestore.add_agenzia(Agenzia(2, "Casa Milano", "Corso Como 5"))
+    assert [m.seq for m in gestore.changes_since()] == [21, 22, 23], "I numeri di sequenza non vengono riutilizzati"
+
+    gestore.close()
+
+
+def test_modifiche_annullate_non_registrate(empty_db):
+    """Verifica che il log segua la transazione: le scritture annullate non compaiono."""
+    gestore = GestoreImmobiliare(empty_db, registro_modifiche=True)
+    gestore.add_agenzia(Agenzia(1, "Immobiliare Roma", "Via Roma 1"))
+
+    with pytest.raises(RuntimeError):
+        with gestore.transaction():
+            gestore.add_agente(Agente(101, "Mario Rossi", "mario@example.com", 1))
+            raise RuntimeError("annulla")
+
+    assert _riassunto(gestore.changes_since()) == [("agenzie", "INSERT", 1)]
+
+    gestore.close()
+
+
+def test_richiede_registro(empty_db):
+    """Verifica che senza registro_modifiche i metodi del log sollevino un errore."""
+    gestore = GestoreImmobiliare(empty_db)
+    with pytest.raises(RuntimeError):
+        gestore.changes_since()
+    with pytest.raises(RuntimeError):
+        gestore.ultima_modifica()
+    gestore.close()
@@ -0,0 +1,100 @@
+"""
+Test per la paginazione per chiave con filtri e ordinamento (get_pagina_proprieta).
+"""
+
+import pytest
+
+from immobiliare_manager import (
+    Agenzia,
+    Agente,
+    Proprieta,
+    GestoreImmobiliare,
+)
+
+
+@pytest.fixture
+def gestore(empty_db):
+    gestore = GestoreImmobiliare(empty_db)
+    gestore.add_agenzie([
+        Agenzia(1, "Immobiliare Roma", "Via Roma 1"),
+        Agenzia(2, "Casa & Appartamenti", "Piazza Milano 5"),
+    ])
+    gestore.add_agenti([
+        Agente(101, "Mario Rossi", "mario@example.com", 1),
+        Agente(102, "Laura Bianchi", "laura@example.com", 1),
+        Agente(201, "Giuseppe Verdi", "giuseppe@example.com", 2),
+    ])
+    # Prezzi con molti pareggi per verificare lo spareggio su id_proprieta
+    gestore.add_proprieta_many(
+        Proprieta(
+            1000 + i,
+            f"Via {i}",
+            100000.0 + 10000.0 * (i % 7),
+            "Venduto" if i % 3 == 0 else "In vendita",
+            (101, 102, 201)[i % 3],
+        )
+        for i in range(60)
+    )
+    yield gestore
+    gestore.close()
+
+
+def _tutte_le_pagine(gestore, **parametri):
+    pagine = []
+    cursore = None
+    while True:
+        pagina = gestore.get_pagina_proprieta(cursore=cursore, **parametri)
+        pagine.append(pagina.elementi)
+        cursore = pagina.cursore
+        if cursore is None:
+            return pagine
+
+
+@pytest.mark.parametrize("decrescente", [False, True])
+def test_pagine_coprono_il_risultato_ordinato(gestore, decrescente):
+    """Verifica che le pagine concatenate diano il risultato completo, ordinato e senza duplicati."""
+    pagine = _tutte_le_pagine(gestore, id_agenzia=1, dimensione_pagina=7, decrescente=decrescente)
+    elementi = [p for pagina in pagine for p in pagina]
+
+    attese = sorted(
+        gestore.get_proprieta_per_agenzia(1),
+        key=lambda p: (p.prezzo, p.id_proprieta),
+        reverse=decrescente,
+    )
+    assert elementi == attese
+    assert all(len(pagina) == 7 for pagina in pagine[:-1])
+
+
+def test_filtri_stato_e_prezzo(gestore):
+    """Verifica che filtri per stato e fascia di prezzo vengano applicati dal database."""
+    pagine = _tutte_le_pagine(
+        gestore, stato="In vendita", prezzo_min=120000.0, prezzo_max=150000.0, dimensione_pagina=5
+    )
+    elementi = [p for pagina in pagine for p in pagina]
+
+    assert elementi
+    assert all(p.stato == "In vendita" for p in elementi)
+    assert all(120000.0 <= p.prezzo <= 150000.0 for p in elementi)
+
+
+def test_ordinamento_per_id_e_agente(gestore):
+    """Verifica l'ordinamento per id_proprieta e il filtro per agente."""
+    prima = gestore.get_pagina_proprieta(id_agente=201, ordina_per="id_proprieta", dimensione_pagina=5)
+    seconda = gestore.get_pagina_proprieta(
+        id_agente=201, ordina_per="id_proprieta", dimensione_pagina=5, cursore=prima.cursore
+    )
+
+    ids = [p.id_proprieta for p in prima.elementi + seconda.elementi]
+    assert ids == [1002 + 3 * i for i in range(10)]
+
+
+def test_cursore_di_un_altro_ordinamento_rifiutato(gestore):
+    """Verifica che un cursore non possa essere riusato con un ordinamento diverso."""
+    pagina = gestore.get_pagina_proprieta(dimensione_pagina=5)
+
+    with pytest.raises(ValueError):
+        gestore.get_pagina_proprieta(dimensione_pagina=5, decrescente=True, cursore=pagina.cursore)
+    with pytest.raises(ValueError):
+        gestore.get_pagina_proprieta(cursore="non-un-cursore")
+    with pytest.raises(ValueError):
+        gestore.get_pagina_proprieta(ordina_per="indirizzo")
@@ -0,0 +1,108 @@
+"""
+Test per il pool di connessioni di lettura (GestoreImmobiliare condiviso tra thread).
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from immobiliare_manager import (
+    Agenzia,
+    Agente,
+    Proprieta,
+    GestoreImmobiliare,
+)
+
+
+@pytest.fixture
+def gestore(empty_db):
+    gestore = GestoreImmobiliare(empty_db, profilo="balanced", connessioni_lettura=2, attesa_pool=0.2)
+    gestore.add_agenzia(Agenzia(1, "Immobiliare Roma", "Via Roma 1"))
+    gestore.add_agente(Agente(101, "Mario Rossi", "mario@example.com", 1))
+    gestore.add_proprieta_many(
+        Proprieta(1000 + i, f"Via {i}", 1000.0 * i, "In vendita", 101) for i in range(20)
+    )
+    yield gestore
+    gestore.close()
+
+
+def test_senza_pool(empty_db):
+    """Verifica che il pool sia disattivato per default e rifiutato in memoria."""
+    gestore = GestoreImmobiliare(empty_db)
+    assert gestore.statistiche_pool() is None
+    gestore.close()
+
+    with pytest.raises(ValueError):
+        GestoreImmobiliare(":memory:", connessioni_lettura=2)
+
+
+def test_letture_concorrenti_da_piu_thread(gestore):
+    """Verifica che più thread possano leggere contemporaneamente dallo stesso gestore."""
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        risultati = list(executor.map(lambda _: len(gestore.get_proprieta_per_agenzia(1)), range(40)))
+
+    assert risultati == [20] * 40
+    statistiche = gestore.statistiche_pool()
+    assert statistiche.dimensione == 2
+    assert statistiche.acquisizioni == 40
+    assert statistiche.in_uso == 0
+    assert 1 <= statistiche.picco_in_uso <= 2
+
+
+def test_letture_non_bloccate_da_una_transazione_aperta(gestore):
+    """Verifica che in WAL gli altri thread leggano lo stato confermato durante una scrittura."""
+    scrittura_aperta = threading.Event()
+    lettura_fatta = threading.Event()
+
+    def scrittore():
+        with gestore.transaction():
+            gestore.aggiorna_stato_proprieta(1000, "Venduto")
+            assert gestore.get_proprieta_per_agente(101)[0].stato == "Venduto"
+            scrittura_aperta.set()
+            assert lettura_fatta.wait(2)
+
+    thread = threading.Thread(target=scrittore)
+    thread.start()
+    assert scrittura_aperta.wait(2)
+    stato_letto = gestore.get_proprieta_per_agente(101)[0].stato
+    lettura_fatta.set()
+    thread.join()
+
+    assert stato_letto == "In vendita"
+    assert gestore.get_proprieta_per_agente(101)[0].stato == "Venduto"
+
+
+def test_scritture_di_altri_thread_non_entrano_nella_transazione(gestore):
+    """Verifica che una scrittura di un altro thread attenda la fine della transazione aperta."""
+    with pytest.raises(RuntimeError):
+        with gestore.transaction():
+            thread = threading.Thread(
+                target=gestore.add_agente, args=(Agente(102, "Laura Bianchi", "laura@example.com", 1),)
+            )
+            thread.start()
+            thread.join(0.1)
+            assert thread.is_alive(), "La scrittura deve attendere il lock"
+            raise RuntimeError("annulla la transazione")
+    thread.join()
+
+    assert {a.id_agente for a in gestore.get_agenti_per_agenzia(1)} == {101, 102}
+
+
+def test_pool_saturo(gestore):
+    """Verifica il timeout e le metriche quando tutte le connessioni sono occupate."""
+    primo = gestore.iter_proprieta_per_agenzia(1, dimensione_batch=1)
+    secondo = gestore.iter_proprieta_per_agenzia(1, dimensione_batch=1)
+    next(primo)
+    next(secondo)
+
+    with pytest.raises(TimeoutError):
+        gestore.get_agenti_per_agenzia(1)
+
+    primo.close()
+    secondo.close()
+    statistiche = gestore.statistiche_pool()
+    assert statistiche.timeout == 1
+    assert statistiche.picco_in_uso == 2
+    assert statistiche.in_uso == 0
+    assert len(gestore.get_agenti_per_agenzia(1)) == 1
@@ -0,0 +1,59 @@
+"""
+Test per i profili di prestazioni passati al costruttore di GestoreImmobiliare.
+"""
+
+import pytest
+
+from immobiliare_manager import (
+    Agenzia,
+    GestoreImmobiliare,
+    ProfiloPrestazioni,
+    PROFILI_PRESTAZIONI,
+)
+
+
+def test_profilo_predefinito(empty_db):
+    """Verifica che senza profilo restino le impostazioni di SQLite, comunque ispezionabili."""
+    gestore = GestoreImmobiliare(empty_db)
+
+    assert gestore.profilo.nome == "predefinito"
+    assert gestore.profilo.journal_mode == "DELETE"
+
+    gestore.close()
+
+
+@pytest.mark.parametrize("nome", sorted(PROFILI_PRESTAZIONI))
+def test_profili_predefiniti_applicati(empty_db, nome):
+    """Verifica che ogni profilo con nome venga applicato e riletto dalla connessione."""
+    gestore = GestoreImmobiliare(empty_db, profilo=nome)
+    atteso = PROFILI_PRESTAZIONI[nome]
+
+    assert gestore.profilo.nome == nome
+    assert gestore.profilo.journal_mode == "WAL"
+    assert gestore.profilo.synchronous == atteso.synchronous
+    assert gestore.profilo.cache_size == atteso.cache_size
+    assert gestore.profilo.temp_store == atteso.temp_store
+    assert gestore.profilo.busy_timeout == atteso.busy_timeout
+
+    gestore.add_agenzia(Agenzia(1, "Immobiliare Roma", "Via Roma 1"))
+    assert gestore.get_agenti_per_agenzia(1) == []
+
+    gestore.close()
+
+
+def test_profilo_personalizzato_in_memoria():
+    """Verifica che il profilo restituito rifletta ciò che SQLite ha realmente applicato."""
+    profilo = ProfiloPrestazioni("custom", "WAL", "NORMAL", 0, -1000, "MEMORY", 1000)
+    gestore = GestoreImmobiliare(":memory:", profilo=profilo)
+
+    assert gestore.profilo.nome == "custom"
+    assert gestore.profilo.journal_mode == "MEMORY", "Un database in memoria non usa il WAL"
+    assert gestore.profilo.synchronous == "NORMAL"
+
+    gestore.close()
+
+
+def test_profilo_sconosciuto(empty_db):
+    """Verifica che un nome di profilo sconosciuto venga rifiutato."""
+    with pytest.raises(ValueError):
+        GestoreImmobiliare(empty_db, profilo="velocissimo")
@@ -0,0 +1,92 @@
+"""
+Test per la ricerca full-text sugli indirizzi (cerca_proprieta, cerca_agenzie).
+"""
+
+import pytest
+
+from immobiliare_manager import (
+    Agenzia,
+    Agente,
+    Proprieta,
+    GestoreImmobiliare,
+)
+
+
+def _popola(gestore):
+    gestore.add_agenzie([
+        Agenzia(1, "Immobiliare Roma", "Via Garibaldi 1"),
+        Agenzia(2, "Casa Milano", "Corso Como 5"),
+    ])
+    gestore.add_agenti([
+        Agente(101, "Mario Rossi", "mario@example.com", 1),
+        Agente(201, "Giuseppe Verdi", "giuseppe@example.com", 2),
+    ])
+    gestore.add_proprieta_many([
+        Proprieta(1001, "Via Garibaldi 10", 250000.0, "In vendita", 101),
+        Proprieta(1002, "Piazza Garibaldi 3", 180000.0, "Venduto", 101),
+        Proprieta(1003, "Via Città di Castello 7", 90000.0, "In vendita", 201),
+        Proprieta(1004, "Viale Garibaldi Giuseppe Garibaldi 2", 320000.0, "In vendita", 201),
+    ])
+
+
+def _ids(risultati):
+    return [p.id_proprieta for p in risultati]
+
+
+def test_ricerca_per_prefisso_e_pertinenza(empty_db):
+    """Verifica prefissi, parole multiple, accenti e ordinamento per pertinenza."""
+    gestore = GestoreImmobiliare(empty_db, ricerca_indirizzi=True)
+    _popola(gestore)
+
+    assert _ids(gestore.cerca_proprieta("garibaldi"))[0] == 1004, "Due occorrenze: la più pertinente"
+    assert set(_ids(gestore.cerca_proprieta("GARIB"))) == {1001, 1002, 1004}
+    assert _ids(gestore.cerca_proprieta("piazza gari")) == [1002]
+    assert set(_ids(gestore.cerca_proprieta("via gari"))) == {1001, 1004}, "via è anche il prefisso di viale"
+    assert _ids(gestore.cerca_proprieta("citta")) == [1003]
+    assert len(gestore.cerca_proprieta("garibaldi", limit=2)) == 2
+    assert gestore.cerca_proprieta("  -- ") == []
+    assert gestore.cerca_proprieta('garibaldi OR "como') == []
+
+    assert [a.id_agenzia for a in gestore.cerca_agenzie("cors com")] == [2]
+
+    gestore.close()
+
+
+def test_ricerca_con_filtri(empty_db):
+    """Verifica la combinazione con i filtri su stato, prezzo e agenzia."""
+    gestore = GestoreImmobiliare(empty_db, ricerca_indirizzi=True)
+    _popola(gestore)
+
+    assert set(_ids(gestore.cerca_proprieta("garibaldi", stato="In vendita"))) == {1001, 1004}
+    assert _ids(gestore.cerca_proprieta("garibaldi", prezzo_max=200000)) == [1002]
+    assert _ids(gestore.cerca_proprieta("garibaldi", id_agenzia=2)) == [1004]
+
+    gestore.close()
+
+
+def test_indice_aggiornato_dai_trigger(empty_db):
+    """Verifica che l'indice venga costruito sui dati esistenti e segua inserimenti, modifiche e cancellazioni."""
+    gestore = GestoreImmobiliare(empty_db)
+    _popola(gestore)
+    with pytest.raises(RuntimeError):
+        gestore.cerca_proprieta("garibaldi")
+    gestore.close()
+
+    gestore = GestoreImmobiliare(empty_db, ricerca_indirizzi=True)
+    assert len(gestore.cerca_proprieta("garibaldi")) == 3
+
+    gestore.add_proprieta(Proprieta(1005, "Via Mazzini 4", 100000.0, "In vendita", 101))
+    with gestore.transaction():
+        gestore.conn.execute("UPDATE proprieta SET indirizzo = 'Via Cavour 8' WHERE id_proprieta = 1001")
+        gestore.conn.execute("DELETE FROM proprieta WHERE id_proprieta = 1002")
+        gestore.conn.execute("UPDATE agenzie SET indirizzo = 'Via Mazzini 1' WHERE id_agenzia = 1")
+
+    assert _ids(gestore.cerca_proprieta("garibaldi")) == [1004]
+    assert _ids(gestore.cerca_proprieta("mazz")) == [1005]
+    assert _ids(gestore.cerca_proprieta("cavour")) == [1001]
+    assert [a.id_agenzia for a in gestore.cerca_agenzie("mazzini")] == [1]
+    assert gestore.conn.execute(
+        "INSERT INTO indirizzi_proprieta(indirizzi_proprieta) VALUES ('integrity-check')"
+    ).rowcount == 1
+
+    gestore.close()
@@ -0,0 +1,202 @@
+"""
+Test per GestoreImmobiliareSharded (instradamento per agenzia e operazioni su più shard).
+"""
+
+import sqlite3
+
+import pytest
+
+from immobiliare_manager import (
+    Agenzia,
+    Agente,
+    Proprieta,
+    GestoreImmobiliare,
+)
+from immobiliare_sharding import GestoreImmobiliareSharded
+
+
+N_SHARD = 3
+
+
+def _agenzie():
+    return [Agenzia(i, f"Agenzia {i}", f"Via {i}") for i in range(1, 7)]
+
+
+def _agenti():
+    return [Agente(i * 100 + j, f"Agente {i}.{j}", f"a{i}{j}@example.com", i)
+            for i in range(1, 7) for j in (1, 2)]
+
+
+def _proprieta():
+    # L'agente j=1 di ogni agenzia ha una proprietà in più del j=2.
+    return [
+        Proprieta(i * 1000 + j * 10 + k, f"Via {i}.{j}.{k}", 100000.0 * k + i, "In vendita",
+                  i * 100 + j, 45.0 + i / 10, 9.0 + k / 10)
+        for i in range(1, 7) for j in (1, 2) for k in range(1, 5 - j)
+    ]
+
+
+def _popola(gestore):
+    gestore.add_agenzie(_agenzie())
+    gestore.add_agenti(_agenti())
+    gestore.add_proprieta_many(_proprieta())
+
+
+@pytest.fixture
+def percorsi(tmp_path):
+    return [str(tmp_path / f"shard_{i}.db") for i in range(N_SHARD)]
+
+
+@pytest.fixture
+def singolo(empty_db):
+    gestore = GestoreImmobiliare(empty_db)
+    _popola(gestore)
+    yield gestore
+    gestore.close()
+
+
+def test_instradamento_per_agenzia(percorsi):
+    """Verifica che agenzia, agenti e proprietà finiscano nello shard id_agenzia % N."""
+    gestore = GestoreImmobiliareSharded(percorsi, processi=0)
+    _popola(gestore)
+
+    for indice, shard in enumerate(gestore.shard):
+        agenzie = [r[0] for r in shard.conn.execute("SELECT id_agenzia FROM agenzie")]
+        assert agenzie and all(a % N_SHARD == indice for a in agenzie)
+        assert shard.conn.execute(
+            "SELECT COUNT(*) FROM proprieta p JOIN agenti a ON p.id_agente = a.id_agente "
+            "WHERE a.id_agenzia % ? <> ?", (N_SHARD, indice)
+        ).fetchone()[0] == 0
+    assert gestore.shard_di_agenzia(4) is gestore.shard[1]
+    assert gestore.shard_di_agente(402) is gestore.shard[1]
+    assert gestore.shard_di_agente(999) is None
+
+    gestore.close()
+
+
+def test_letture_come_gestore_singolo(percorsi, singolo):
+    """Verifica che le letture diano gli stessi risultati di un unico database."""
+    gestore = GestoreImmobiliareSharded(percorsi, processi=0)
+    _popola(gestore)
+
+    for id_agenzia in (1, 2, 6, 7):
+        assert gestore.get_proprieta_per_agenzia(id_agenzia) == singolo.get_proprieta_per_agenzia(id_agenzia)
+        assert gestore.get_agenti_per_agenzia(id_agenzia) == singolo.get_agenti_per_agenzia(id_agenzia)
+        assert gestore.get_agenzia_completa(id_agenzia) == singolo.get_agenzia_completa(id_agenzia)
+    for id_agente in (101, 502, 999):
+        assert gestore.get_proprieta_per_agente(id_agente) == singolo.get_proprieta_per_agente(id_agente)
+        assert list(gestore.iter_proprieta_per_agente(id_agente)) == singolo.get_proprieta_per_agente(id_agente)
+    ids = [602, 101, 999, 302]
+    assert list(gestore.get_proprieta_per_agenti(ids).items()) == list(singolo.get_proprieta_per_agenti(ids).items())
+    ids = [5, 1, 9, 3]
+    assert list(gestore.get_agenti_per_agenzie(ids).items()) == list(singolo.get_agenti_per_agenzie(ids).items())
+    assert gestore.get_agenzie_complete() == singolo.get_agenzie_complete()
+    assert list(gestore.get_agenzie_complete(ids)) == list(singolo.get_agenzie_complete(ids))
+    assert gestore.get_best_agente_per_agenzia() == singolo.get_best_agente_per_agenzia()
+    assert gestore.get_statistiche_prezzi() == singolo.get_statistiche_prezzi()
+    assert gestore.get_statistiche_prezzi("stato", id_agenzia=2) == singolo.get_statistiche_prezzi("stato", id_agenzia=2)
+    with pytest.raises(ValueError):
+        gestore.get_statistiche_prezzi("stato")
+    assert gestore.get_proprieta_nel_raggio(45.3, 9.2, 50, limit=5) == singolo.get_proprieta_nel_raggio(45.3, 9.2, 50, limit=5)
+
+    gestore.close()
+
+
+def test_caricamento_massivo_unisce_i_risultati(percorsi):
+    """Verifica conteggi ed errori di un caricamento ripartito su più shard."""
+    gestore = GestoreImmobiliareSharded(percorsi, processi=0)
+    gestore.add_agenzie(_agenzie())
+    gestore.add_agenti(_agenti())
+
+    risultato = gestore.add_proprieta_many(
+        _proprieta() + [Proprieta(1, "Via Orfana", 1.0, "In vendita", 999),
+                        Proprieta(1011, "Via Doppia", 1.0, "In vendita", 101)],
+        dimensione_blocco=2,
+    )
+
+    assert risultato.inseriti == len(_proprieta())
+    assert risultato.scartati == 2
+    assert len(risultato.errori) == 2
+    assert any("FOREIGN KEY" in errore.messaggio for errore in risultato.errori)
+    assert any("UNIQUE" in errore.messaggio for errore in risultato.errori)
+    blocchi = [errore.blocco for errore in risultato.errori]
+    assert blocchi == sorted(set(blocchi))
+
+    gestore.close()
+
+
+def test_aggiornamenti(percorsi):
+    """Verifica che gli aggiornamenti raggiungano lo shard giusto o tutti gli shard."""
+    gestore = GestoreImmobiliareSharded(percorsi, processi=0)
+    _popola(gestore)
+
+    gestore.aggiorna_stato_proprieta(2011, "Venduto")
+    gestore.aggiorna_prezzo_proprieta(3011, 1.0)
+    gestore.aggiorna_stato_proprieta(9999, "Venduto")
+
+    assert gestore.get_proprieta_per_agente(201)[0].stato == "Venduto"
+    assert gestore.get_proprieta_per_agente(301)[0].prezzo == 1.0
+    assert gestore.aggiorna_stato_proprieta_many([1011, 4011, 5011], "Venduto") == 3
+    assert gestore.aggiorna_stato_proprieta_dove("Ritirato", id_agenzia=6) == 5
+    assert gestore.aggiorna_stato_proprieta_dove("Archiviato", stato="Venduto") == 4
+    assert gestore.get_statistiche_prezzi("stato", id_agenzia=6).keys() == {"Ritirato"}
+
+    gestore.close()
+
+
+def test_rollback_dimentica_gli_agenti(percorsi):
+    """Verifica che un rollback non lasci in memoria lo shard di agenti annullati."""
+    gestore = GestoreImmobiliareSharded(percorsi, "balanced", processi=0, connessioni_lettura=2)
+    _popola(gestore)
+
+    with pytest.raises(RuntimeError):
+        with gestore.transaction():
+            gestore.add_agente(Agente(701, "Agente Annullato", "annullato@example.com", 1))
+            gestore.add_proprieta(Proprieta(9001, "Via Nuova", 1.0, "In vendita", 701))
+            assert gestore.shard_di_agente(701) is gestore.shard[1]
+            raise RuntimeError("annulla")
+
+    assert gestore.shard_di_agente(701) is None
+    assert gestore.shard_di_agente(101) is gestore.shard[1]
+    with pytest.raises(sqlite3.IntegrityError):
+        gestore.add_proprieta(Proprieta(9002, "Via Nuova", 1.0, "In vendita", 701))
+    gestore.aggiorna_stato_proprieta(1011, "Venduto")
+    assert gestore.get_proprieta_per_agente(101)[0].stato == "Venduto"
+
+    gestore.close()
+
+
+def test_fan_out_su_pool_di_processi(percorsi, singolo):
+    """Verifica che le operazioni su più shard diano lo stesso risultato nei processi del pool."""
+    gestore = GestoreImmobiliareSharded(percorsi, processi=2, conteggi_proprieta=True)
+    _popola(gestore)
+
+    assert gestore.get_best_agente_per_agenzia() == singolo.get_best_agente_per_agenzia()
+    assert gestore.get_agenzie_complete([4, 2, 3]) == singolo.get_agenzie_complete([4, 2, 3])
+    assert gestore._pool is not None
+
+    # Dentro una transazione le letture vedono le scritture non ancora confermate.
+    with gestore.transaction():
+        gestore.add_proprieta(Proprieta(9001, "Via Nuova", 1.0, "In vendita", 102))
+        gestore.add_proprieta(Proprieta(9002, "Via Nuova", 1.0, "In vendita", 102))
+        assert gestore.get_best_agente_per_agenzia()[1].id_agente == 102
+
+    gestore.close()
+
+
+def test_configurazione_degli_shard_verificata(percorsi):
+    """Verifica che riaprire gli shard in un altro ordine o numero fallisca."""
+    gestore = GestoreImmobiliareSharded(percorsi, processi=0)
+    _popola(gestore)
+    gestore.close()
+
+    with pytest.raises(ValueError):
+        GestoreImmobiliareSharded(list(reversed(percorsi)), processi=0)
+    with pytest.raises(ValueError):
+        GestoreImmobiliareSharded(percorsi[:2], processi=0)
+
+    lettore = GestoreImmobiliareSharded(percorsi, processi=0, sola_lettura=True)
+    assert len(lettore.get_proprieta_per_agenzia(5)) == 5
+    with pytest.raises(sqlite3.OperationalError):
+        lettore.aggiorna_stato_proprieta(5011, "Venduto")
+    lettore.close()
@@ -0,0 +1,121 @@
+"""
+Test per la modalità di sola lettura e per crea_snapshot.
+"""
+
+import math
+import sqlite3
+
+import pytest
+
+from immobiliare_manager import (
+    Agenzia,
+    Agente,
+    Proprieta,
+    GestoreImmobiliare,
+)
+
+
+def _popola(gestore, n_proprieta=3):
+    gestore.add_agenzia(Agenzia(1, "Immobiliare Roma", "Via Roma 1"))
+    gestore.add_agente(Agente(101, "Mario Rossi", "mario@example.com", 1))
+    gestore.add_proprieta_many(
+        Proprieta(i, f"Via Garibaldi {i}", 100000.0 + i, "In vendita", 101)
+        for i in range(1, n_proprieta + 1)
+    )
+
+
+def test_sola_lettura(empty_db):
+    """Verifica che in sola lettura le query funzionino e le scritture falliscano."""
+    gestore = GestoreImmobiliare(empty_db)
+    _popola(gestore)
+    gestore.close()
+
+    lettore = GestoreImmobiliare(empty_db, "balanced", sola_lettura=True)
+
+    assert len(lettore.get_proprieta_per_agenzia(1)) == 3
+    assert lettore.get_best_agente_per_agenzia()[1].id_agente == 101
+    with pytest.raises(sqlite3.OperationalError):
+        lettore.aggiorna_stato_proprieta(1, "Venduto")
+    with pytest.raises(sqlite3.OperationalError):
+        lettore.conn.execute("DELETE FROM proprieta")
+    assert lettore.profilo.journal_mode == "DELETE"
+    assert len(lettore.get_proprieta_per_agenzia(1)) == 3
+
+    lettore.close()
+
+
+def test_sola_lettura_non_crea_ne_migra(tmp_path):
+    """Verifica che la sola lettura non crei il file, le tabelle opzionali né migri lo schema."""
+    with pytest.raises(sqlite3.OperationalError):
+        GestoreImmobiliare(str(tmp_path / "assente.db"), sola_lettura=True)
+    assert not (tmp_path / "assente.db").exists()
+
+    vecchio = str(tmp_path / "vecchio.db")
+    conn = sqlite3.connect(vecchio)
+    conn.execute("CREATE TABLE agenzie (id_agenzia INTEGER PRIMARY KEY)")
+    conn.close()
+    with pytest.raises(RuntimeError):
+        GestoreImmobiliare(vecchio, sola_lettura=True)
+
+    aggiornato = str(tmp_path / "aggiornato.db")
+    GestoreImmobiliare(aggiornato, conteggi_proprieta=True).close()
+    GestoreImmobiliare(aggiornato, conteggi_proprieta=True, sola_lettura=True).close()
+    with pytest.raises(RuntimeError):
+        GestoreImmobiliare(aggiornato, riepilogo_prezzi=True, sola_lettura=True)
+
+    with pytest.raises(ValueError):
+        GestoreImmobiliare(":memory:", sola_lettura=True)
+
+
+def test_snapshot(empty_db, tmp_path):
+    """Verifica che crea_snapshot produca una copia completa e indipendente."""
+    gestore = GestoreImmobiliare(empty_db, "balanced")
+    _popola(gestore, 2000)
+    destinazione = str(tmp_path / "snapshot.db")
+    avanzamento = []
+
+    pagine = gestore.crea_snapshot(
+        destinazione, pagine_per_passo=8, progresso=lambda copiate, totali: avanzamento.append(copiate)
+    )
+    gestore.aggiorna_stato_proprieta(1, "Venduto")
+    copia = GestoreImmobiliare(destinazione, sola_lettura=True)
+
+    assert len(avanzamento) == math.ceil(pagine / 8)
+    assert avanzamento == sorted(avanzamento) and avanzamento[-1] == pagine
+    assert copia.profilo.journal_mode == "DELETE"
+    assert len(copia.get_proprieta_per_agente(101)) == 2000
+    assert copia.get_proprieta_per_agente(101)[0].stato == "In vendita"
+
+    with pytest.raises(RuntimeError):
+        with gestore.transaction():
+            gestore.crea_snapshot(destinazione)
+
+    copia.close()
+    gestore.close()
+
+
+def test_snapshot_coerente_con_scritture_concorrenti(empty_db, tmp_path):
+    """Verifica che in WAL una scrittura durante la copia non la faccia ricominciare né vi entri."""
+    gestore = GestoreImmobiliare(empty_db, "balanced", connessioni_lettura=1)
+    _popola(gestore, 2000)
+    scrittore = GestoreImmobiliare(empty_db, "balanced")
+    passi = []
+
+    def progresso(copiate, totali):
+        passi.append(copiate)
+        if len(passi) == 2:
+            scrittore.aggiorna_stato_proprieta(1, "Venduto")
+            scrittore.add_proprieta(Proprieta(5000, "Via Nuova 1", 1.0, "In vendita", 101))
+
+    pagine = gestore.crea_snapshot(str(tmp_path / "snapshot.db"), pagine_per_passo=4,
+                                   progresso=progresso)
+    copia = GestoreImmobiliare(str(tmp_path / "snapshot.db"), sola_lettura=True)
+
+    assert len(passi) == math.ceil(pagine / 4)
+    assert len(copia.get_proprieta_per_agente(101)) == 2000
+    assert copia.get_proprieta_per_agente(101)[0].stato == "In vendita"
+    assert len(gestore.get_proprieta_per_agente(101)) == 2001
+
+    copia.close()
+    scrittore.close()
+    gestore.close()
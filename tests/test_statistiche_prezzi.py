@@ -0,0 +1,121 @@
+"""
+Test per get_statistiche_prezzi e la tabella riepilogo_prezzi mantenuta dai trigger.
+"""
+
+import statistics
+
+import pytest
+
+from immobiliare_manager import (
+    Agenzia,
+    Agente,
+    Proprieta,
+    GestoreImmobiliare,
+)
+
+
+def _popola(gestore):
+    gestore.add_agenzie([
+        Agenzia(1, "Immobiliare Roma", "Via Roma 1"),
+        Agenzia(2, "Casa & Appartamenti", "Piazza Milano 5"),
+    ])
+    gestore.add_agenti([
+        Agente(101, "Mario Rossi", "mario@example.com", 1),
+        Agente(102, "Laura Bianchi", "laura@example.com", 1),
+        Agente(201, "Giuseppe Verdi", "giuseppe@example.com", 2),
+    ])
+    gestore.add_proprieta_many([
+        Proprieta(1001, "Via A", 100000.0, "In vendita", 101),
+        Proprieta(1002, "Via B", 150000.0, "In vendita", 102),
+        Proprieta(1003, "Via C", 200000.0, "Venduto", 102),
+        Proprieta(1004, "Via D", 400000.0, "In vendita", 102),
+        Proprieta(2001, "Via E", 120000.0, "In affitto", 201),
+    ])
+
+
+def _attese(gestore, *colonne):
+    """Statistiche calcolate in Python a partire da tutte le righe."""
+    gruppi = {}
+    for riga in gestore.conn.execute(
+        f"SELECT {', '.join(colonne)}, p.prezzo FROM proprieta p JOIN agenti a USING (id_agente)"
+    ):
+        chiave = riga[0] if len(colonne) == 1 else riga[:-1]
+        gruppi.setdefault(chiave, []).append(riga[-1])
+    return {
+        chiave: (len(prezzi), statistics.mean(prezzi), min(prezzi), max(prezzi), statistics.median(prezzi))
+        for chiave, prezzi in gruppi.items()
+    }
+
+
+def _confronta(risultato, attese):
+    assert set(risultato) == set(attese)
+    for chiave, s in risultato.items():
+        assert (s.conteggio, s.media, s.minimo, s.massimo, s.mediana) == pytest.approx(attese[chiave])
+
+
+@pytest.mark.parametrize("riepilogo", [False, True])
+def test_statistiche_per_dimensione(empty_db, riepilogo):
+    """Verifica conteggio, media, minimo, massimo e mediana per agenzia, agente, stato e combinazioni."""
+    gestore = GestoreImmobiliare(empty_db, riepilogo_prezzi=riepilogo)
+    _popola(gestore)
+
+    _confronta(gestore.get_statistiche_prezzi(), _attese(gestore, "a.id_agenzia"))
+    _confronta(gestore.get_statistiche_prezzi("agente"), _attese(gestore, "p.id_agente"))
+    _confronta(gestore.get_statistiche_prezzi("stato"), _attese(gestore, "p.stato"))
+    _confronta(
+        gestore.get_statistiche_prezzi(("agenzia", "stato")), _attese(gestore, "a.id_agenzia", "p.stato")
+    )
+
+    filtrate = gestore.get_statistiche_prezzi("agente", id_agenzia=1, stato="In vendita")
+    assert {k: s.conteggio for k, s in filtrate.items()} == {101: 1, 102: 2}
+    assert filtrate[102].mediana == 275000.0
+
+    gestore.close()
+
+
+def test_percentili(empty_db):
+    """Verifica i percentili con interpolazione lineare e la loro esclusione."""
+    gestore = GestoreImmobiliare(empty_db)
+    _popola(gestore)
+
+    agenzia = gestore.get_statistiche_prezzi(percentili=(0, 0.25, 0.9, 1))[1]
+    prezzi = [100000.0, 150000.0, 200000.0, 400000.0]
+    assert agenzia.percentili[0] == 100000.0
+    assert agenzia.percentili[1] == 400000.0
+    assert agenzia.percentili[0.25] == pytest.approx(statistics.quantiles(prezzi, n=4, method="inclusive")[0])
+    assert agenzia.percentili[0.9] == pytest.approx(340000.0)
+    assert agenzia.mediana is None
+
+    assert gestore.get_statistiche_prezzi(percentili=())[2].percentili == {}
+    assert gestore.get_statistiche_prezzi(id_agente=999) == {}
+    with pytest.raises(ValueError):
+        gestore.get_statistiche_prezzi("citta")
+    with pytest.raises(ValueError):
+        gestore.get_statistiche_prezzi(percentili=(1.5,))
+
+    gestore.close()
+
+
+def test_riepilogo_aggiornato_dai_trigger(empty_db):
+    """Verifica che il riepilogo resti coerente dopo inserimenti, modifiche e cancellazioni."""
+    gestore = GestoreImmobiliare(empty_db)
+    _popola(gestore)
+    gestore.close()
+
+    gestore = GestoreImmobiliare(empty_db, riepilogo_prezzi=True)
+    gestore.aggiorna_stato_proprieta(1004, "Venduto")
+    gestore.add_proprieta(Proprieta(1005, "Via F", 50000.0, "Venduto", 102))
+    with gestore.transaction():
+        gestore.conn.execute("UPDATE proprieta SET prezzo = 90000.0 WHERE id_proprieta = 1001")
+        gestore.conn.execute("UPDATE proprieta SET id_agente = 101 WHERE id_proprieta = 1002")
+        gestore.conn.execute("DELETE FROM proprieta WHERE id_proprieta IN (1005, 2001)")
+
+    righe = set(gestore.conn.execute("SELECT * FROM riepilogo_prezzi"))
+    attese = set(gestore.conn.execute(
+        "SELECT id_agente, stato, COUNT(*), SUM(prezzo), MIN(prezzo), MAX(prezzo) "
+        "FROM proprieta GROUP BY id_agente, stato"
+    ))
+    assert righe == attese
+    _confronta(gestore.get_statistiche_prezzi(("agenzia", "stato")), _attese(gestore, "a.id_agenzia", "p.stato"))
+
+    gestore.close()
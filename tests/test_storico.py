@@ -0,0 +1,176 @@
+"""
+Test per lo storico di prezzi e stati (storico_proprieta, get_portafoglio_al, get_tempi_sul_mercato).
+"""
+
+from datetime import date, datetime
+
+import pytest
+
+from immobiliare_manager import (
+    Agenzia,
+    Agente,
+    Proprieta,
+    GestoreImmobiliare,
+)
+
+
+def _data_variazioni(gestore, istante):
+    """Sposta a `istante` le righe dello storico appena scritte (con l'istante reale)."""
+    with gestore.transaction():
+        gestore.conn.execute(
+            "UPDATE storico_proprieta SET istante = ? WHERE istante > '2025'", (istante,)
+        )
+
+
+def _popola(gestore):
+    gestore.add_agenzia(Agenzia(1, "Immobiliare Roma", "Via Roma 1"))
+    gestore.add_agenzia(Agenzia(2, "Casa Milano", "Corso Buenos Aires 5"))
+    gestore.add_agente(Agente(101, "Mario Rossi", "mario@example.com", 1))
+    gestore.add_agente(Agente(201, "Luca Verdi", "luca@example.com", 2))
+    gestore.add_proprieta(Proprieta(1001, "Via Garibaldi 10", 250000.0, "In vendita", 101))
+    gestore.add_proprieta(Proprieta(1002, "Via Mazzini 3", 180000.0, "In vendita", 101))
+    gestore.add_proprieta(Proprieta(2001, "Via Dante 7", 320000.0, "In vendita", 201))
+
+
+@pytest.fixture
+def gestore(empty_db):
+    gestore = GestoreImmobiliare(empty_db, storico_proprieta=True)
+    yield gestore
+    gestore.close()
+
+
+def _fasi(gestore):
+    """Gennaio: inserimenti. Marzo: ribasso e riassegnazione. Maggio: vendita e cancellazione."""
+    _popola(gestore)
+    _data_variazioni(gestore, "2024-01-10T09:00:00.000Z")
+
+    gestore.aggiorna_prezzo_proprieta(1001, 230000.0)
+    with gestore.transaction():
+        gestore.conn.execute("UPDATE proprieta SET id_agente = 201 WHERE id_proprieta = 1002")
+    _data_variazioni(gestore, "2024-03-15T12:00:00.000Z")
+
+    gestore.aggiorna_stato_proprieta(1001, "Venduto")
+    gestore.add_proprieta(Proprieta(1003, "Via Cavour 1", 99000.0, "In vendita", 101))
+    with gestore.transaction():
+        gestore.conn.execute("DELETE FROM proprieta WHERE id_proprieta = 2001")
+    _data_variazioni(gestore, "2024-05-20T08:00:00.000Z")
+
+
+def _riassunto(proprieta):
+    return [(p.id_proprieta, p.prezzo, p.stato, p.id_agente) for p in proprieta]
+
+
+def test_variazioni_registrate(gestore):
+    """Verifica che inserimenti, variazioni e cancellazioni producano le righe attese."""
+    _fasi(gestore)
+
+    righe = gestore.conn.execute(
+        "SELECT id_proprieta, campo, valore_precedente, valore_nuovo FROM storico_proprieta "
+        "WHERE id_proprieta IN (1001, 2001) ORDER BY seq"
+    ).fetchall()
+
+    assert righe == [
+        (1001, "stato", None, "In vendita"),
+        (2001, "stato", None, "In vendita"),
+        (1001, "prezzo", 250000.0, 230000.0),
+        (1001, "stato", "In vendita", "Venduto"),
+        (2001, "indirizzo", "Via Dante 7", None),
+        (2001, "prezzo", 320000.0, None),
+        (2001, "stato", "In vendita", None),
+        (2001, "id_agente", 201, None),
+    ]
+
+
+def test_portafoglio_al(gestore):
+    """Verifica prezzo, stato e agente delle proprietà di un'agenzia a date diverse."""
+    _fasi(gestore)
+
+    assert gestore.get_portafoglio_al(1, "2023-12-31") == []
+    assert _riassunto(gestore.get_portafoglio_al(1, date(2024, 2, 1))) == [
+        (1001, 250000.0, "In vendita", 101),
+        (1002, 180000.0, "In vendita", 101),
+    ]
+    assert _riassunto(gestore.get_portafoglio_al(1, datetime(2024, 4, 1))) == [
+        (1001, 230000.0, "In vendita", 101),
+    ]
+    assert _riassunto(gestore.get_portafoglio_al(1, "2024-06-01T00:00:00Z")) == [
+        (1001, 230000.0, "Venduto", 101),
+        (1003, 99000.0, "In vendita", 101),
+    ]
+    assert _riassunto(gestore.get_portafoglio_al(2, "2024-04-01")) == [
+        (1002, 180000.0, "In vendita", 201),
+        (2001, 320000.0, "In vendita", 201),
+    ]
+    cancellata = gestore.get_portafoglio_al(2, "2024-04-01")[1]
+    assert cancellata.indirizzo == "Via Dante 7"
+    assert _riassunto(gestore.get_portafoglio_al(2, "2024-06-01")) == [
+        (1002, 180000.0, "In vendita", 201),
+    ]
+
+
+def test_data_come_stringa_indica_fine_giorno(gestore):
+    """Verifica che "AAAA-MM-GG" valga come la date corrispondente (fine del giorno)."""
+    _fasi(gestore)
+
+    come_stringa = _riassunto(gestore.get_portafoglio_al(1, "2024-03-15"))
+
+    assert come_stringa == _riassunto(gestore.get_portafoglio_al(1, date(2024, 3, 15)))
+    assert come_stringa == [(1001, 230000.0, "In vendita", 101)]
+
+
+def test_portafoglio_al_proprieta_cancellata_senza_coordinate(gestore):
+    """Verifica che una proprietà cancellata torni con l'indirizzo storico e coordinate None."""
+    _popola(gestore)
+    gestore.add_proprieta(Proprieta(2002, "Via Petrarca 2", 150000.0, "In vendita", 201, 45.46, 9.19))
+    _data_variazioni(gestore, "2024-01-10T09:00:00.000Z")
+    with gestore.transaction():
+        gestore.conn.execute("DELETE FROM proprieta WHERE id_proprieta = 2002")
+
+    cancellata = gestore.get_portafoglio_al(2, "2024-02-01")[1]
+
+    assert (cancellata.id_proprieta, cancellata.indirizzo) == (2002, "Via Petrarca 2")
+    assert (cancellata.latitudine, cancellata.longitudine) == (None, None)
+
+
+def test_tempi_sul_mercato(gestore):
+    """Verifica i giorni trascorsi in vendita, con fine periodo esplicita e filtri."""
+    _fasi(gestore)
+
+    tempi = gestore.get_tempi_sul_mercato(al="2024-06-19T08:00:00Z")
+
+    assert set(tempi) == {1001, 1002, 1003, 2001}
+    assert tempi[1001] == pytest.approx(131 - 1 / 24)
+    assert tempi[2001] == pytest.approx(131 - 1 / 24)
+    assert tempi[1002] == pytest.approx(161 - 1 / 24)
+    assert tempi[1003] == pytest.approx(30.0)
+    assert gestore.get_tempi_sul_mercato(id_agenzia=1, al="2024-06-19T08:00:00Z") == {
+        1001: pytest.approx(131 - 1 / 24),
+        1003: pytest.approx(30.0),
+    }
+    assert gestore.get_tempi_sul_mercato(stato_mercato="Venduto", stato="Venduto",
+                                         al="2024-05-21T08:00:00Z") == {1001: pytest.approx(1.0)}
+
+
+def test_aggiorna_prezzo_invalida_cache(empty_db):
+    """Verifica che aggiorna_prezzo_proprieta aggiorni il prezzo e le letture in cache."""
+    gestore = GestoreImmobiliare(empty_db, cache=True)
+    _popola(gestore)
+    assert gestore.get_proprieta_per_agente(101)[0].prezzo == 250000.0
+
+    gestore.aggiorna_prezzo_proprieta(1001, 240000.0)
+
+    assert gestore.get_proprieta_per_agente(101)[0].prezzo == 240000.0
+    assert gestore.get_proprieta_per_agenzia(1)[0].prezzo == 240000.0
+    gestore.close()
+
+
+def test_storico_richiede_opzione(empty_db):
+    """Verifica che le interrogazioni sullo storico richiedano storico_proprieta=True."""
+    gestore = GestoreImmobiliare(empty_db)
+
+    with pytest.raises(RuntimeError):
+        gestore.get_portafoglio_al(1, "2024-01-01")
+    with pytest.raises(RuntimeError):
+        gestore.get_tempi_sul_mercato()
+
+    gestore.close()
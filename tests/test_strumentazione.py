@@ -0,0 +1,160 @@
+"""
+Test per la strumentazione opzionale di GestoreImmobiliare (stats, query lente).
+"""
+
+import sqlite3
+
+import pytest
+
+from immobiliare_manager import (
+    Agenzia,
+    Agente,
+    Proprieta,
+    GestoreImmobiliare,
+    LIMITI_ISTOGRAMMA,
+)
+
+
+def _popola(gestore):
+    gestore.add_agenzie([
+        Agenzia(1, "Immobiliare Roma", "Via Roma 1"),
+        Agenzia(2, "Casa & Appartamenti", "Piazza Milano 5"),
+    ])
+    gestore.add_agenti([
+        Agente(101, "Mario Rossi", "mario@example.com", 1),
+        Agente(102, "Giulia Verdi", "giulia@example.com", 1),
+        Agente(201, "Laura Bianchi", "laura@example.com", 2),
+    ])
+    gestore.add_proprieta_many([
+        Proprieta(1001, "Via A", 100000.0, "In vendita", 101),
+        Proprieta(1002, "Via B", 200000.0, "Venduto", 101),
+        Proprieta(1003, "Via C", 300000.0, "In vendita", 102),
+        Proprieta(2001, "Via D", 400000.0, "In vendita", 201),
+    ])
+
+
+def test_senza_strumentazione(empty_db):
+    """Verifica che per default connessione e metodi siano quelli normali."""
+    gestore = GestoreImmobiliare(empty_db)
+
+    assert gestore.stats() is None
+    assert type(gestore.conn) is sqlite3.Connection
+    assert "get_proprieta_per_agenzia" not in vars(gestore)
+
+    gestore.close()
+
+
+def test_metodi_e_statement(empty_db):
+    """Verifica chiamate, righe e istogramma per metodo e per statement."""
+    gestore = GestoreImmobiliare(empty_db, strumentazione=True)
+    _popola(gestore)
+
+    gestore.get_proprieta_per_agenzia(1)
+    gestore.get_proprieta_per_agenzia(2)
+    gestore.get_proprieta_per_agenti([101])
+    gestore.get_proprieta_per_agenti([101, 102, 201])
+    stats = gestore.stats()
+
+    metodo = stats.metodi["get_proprieta_per_agenzia"]
+    assert (metodo.chiamate, metodo.righe) == (2, 4)
+    assert sum(metodo.istogramma.values()) == 2
+    assert list(metodo.istogramma)[:-1] == list(LIMITI_ISTOGRAMMA)
+    assert 0 < metodo.tempo_medio <= metodo.tempo_massimo
+    assert metodo.percentile(0.5) <= metodo.tempo_massimo
+    assert stats.metodi["add_proprieta_many"].righe == 4
+
+    per_agenti = [sql for sql in stats.statement if "IN (?, ...)" in sql]
+    assert len(per_agenti) == 1
+    assert stats.statement[per_agenti[0]].chiamate == 2
+    assert stats.statement[per_agenti[0]].righe == 6
+    assert stats.query_lente == []
+
+    gestore.close()
+
+
+def test_righe_di_risultati_composti(empty_db):
+    """Verifica il conteggio delle entità in AgenziaCompleta e nei dizionari di liste."""
+    gestore = GestoreImmobiliare(empty_db, strumentazione=True)
+    _popola(gestore)
+
+    gestore.get_agenzie_complete()
+    assert gestore.stats().metodi["get_agenzie_complete"].righe == (1 + 2 + 3) + (1 + 1 + 1)
+    gestore.get_agenzia_completa(1)
+    gestore.get_agenzia_completa(9)
+    gestore.get_proprieta_per_agenti([101, 102, 201, 999])
+    gestore.get_best_agente_per_agenzia()
+    metodi = gestore.stats().metodi
+
+    assert metodi["get_agenzia_completa"].righe == 1 + 2 + 3
+    assert metodi["get_proprieta_per_agenti"].righe == 4
+    assert metodi["get_best_agente_per_agenzia"].righe == 2
+
+    gestore.close()
+
+
+def test_query_lente_con_piano(empty_db):
+    """Verifica che gli statement oltre la soglia vengano registrati con metodo ed EXPLAIN."""
+    gestore = GestoreImmobiliare(empty_db, strumentazione=True, soglia_query_lenta=0.0)
+    _popola(gestore)
+    gestore.stats(azzera=True)
+
+    gestore.get_proprieta_per_agenzia(1)
+    gestore.get_proprieta_per_agenzia(2)
+    lente = gestore.stats().query_lente
+
+    assert [q.metodo for q in lente] == ["get_proprieta_per_agenzia"] * 2
+    assert lente[0].sql == lente[1].sql
+    assert lente[0].righe == 3
+    assert any("USING" in riga for riga in lente[0].piano)
+    # Il piano è catturato solo la prima volta
+    assert lente[1].piano is lente[0].piano
+
+    gestore.close()
+
+
+def test_iteratori_e_letture_parziali(empty_db):
+    """Verifica che iteratori e cursori letti solo in parte vengano misurati."""
+    gestore = GestoreImmobiliare(empty_db, strumentazione=True)
+    _popola(gestore)
+    gestore.stats(azzera=True)
+
+    iteratore = gestore.iter_proprieta_per_agente(101)
+    assert gestore.stats().metodi == {}
+    assert len(list(iteratore)) == 2
+    gestore.conn.execute("SELECT id_proprieta FROM proprieta").fetchone()
+    stats = gestore.stats()
+
+    assert stats.metodi["iter_proprieta_per_agente"].righe == 2
+    assert stats.statement["SELECT id_proprieta FROM proprieta"].righe == 1
+
+    gestore.close()
+
+
+def test_stats_azzera(empty_db):
+    """Verifica che stats(azzera=True) riparta da zero."""
+    gestore = GestoreImmobiliare(empty_db, strumentazione=True)
+    _popola(gestore)
+
+    assert gestore.stats(azzera=True).metodi
+    assert gestore.stats().metodi == {}
+    assert gestore.stats().statement == {}
+
+    gestore.close()
+
+
+def test_strumentazione_con_pool(empty_db):
+    """Verifica che vengano misurate anche le connessioni di lettura del pool."""
+    gestore = GestoreImmobiliare(
+        empty_db, "balanced", strumentazione=True, connessioni_lettura=2
+    )
+    _popola(gestore)
+
+    gestore.get_agenti_per_agenzia(1)
+
+    assert gestore.stats().metodi["get_agenti_per_agenzia"].righe == 2
+    assert any(sql.startswith("SELECT id_agente") for sql in gestore.stats().statement)
+    with pytest.raises(sqlite3.OperationalError):
+        with gestore._pool.connessione() as conn:
+            conn.execute("DELETE FROM proprieta")
+
+    gestore.close()
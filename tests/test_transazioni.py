@@ -0,0 +1,70 @@
+"""
+Test per le transazioni esplicite (gestore.transaction() e `with gestore:`).
+"""
+
+import sqlite3
+
+import pytest
+
+from immobiliare_manager import (
+    Agenzia,
+    Agente,
+    Proprieta,
+    GestoreImmobiliare,
+)
+
+
+def _conta(db_path, tabella):
+    conn = sqlite3.connect(db_path)
+    count = conn.execute(f"SELECT COUNT(*) FROM {tabella}").fetchone()[0]
+    conn.close()
+    return count
+
+
+def test_transazione_confermata_all_uscita(empty_db):
+    """Verifica che le scritture diventino visibili solo all'uscita dal blocco."""
+    gestore = GestoreImmobiliare(empty_db)
+
+    with gestore.transaction():
+        gestore.add_agenzia(Agenzia(1, "Immobiliare Roma", "Via Roma 1"))
+        gestore.add_agente(Agente(101, "Mario Rossi", "mario@example.com", 1))
+        assert _conta(empty_db, "agenzie") == 0, "Nessun commit prima della fine del blocco"
+
+    assert _conta(empty_db, "agenzie") == 1
+    assert _conta(empty_db, "agenti") == 1
+
+    gestore.close()
+
+
+def test_transazione_annullata_su_eccezione(empty_db):
+    """Verifica che un'eccezione nel blocco annulli tutte le scritture."""
+    gestore = GestoreImmobiliare(empty_db)
+
+    with pytest.raises(RuntimeError):
+        with gestore:
+            gestore.add_agenzia(Agenzia(1, "Immobiliare Roma", "Via Roma 1"))
+            raise RuntimeError("interrotto")
+
+    assert gestore.get_agenti_per_agenzia(1) == []
+    assert _conta(empty_db, "agenzie") == 0
+
+    gestore.close()
+
+
+def test_savepoint_annidato(empty_db):
+    """Verifica che un errore in una transazione annidata annulli solo quel blocco."""
+    gestore = GestoreImmobiliare(empty_db)
+
+    with gestore.transaction():
+        gestore.add_agenzia(Agenzia(1, "Immobiliare Roma", "Via Roma 1"))
+        gestore.add_agente(Agente(101, "Mario Rossi", "mario@example.com", 1))
+        with pytest.raises(sqlite3.IntegrityError):
+            with gestore.transaction():
+                gestore.add_proprieta(Proprieta(1001, "Via A", 100000.0, "In vendita", 101))
+                gestore.add_proprieta(Proprieta(1002, "Via B", 100000.0, "In vendita", 999))
+        gestore.aggiorna_stato_proprieta(1001, "Venduto")
+
+    assert gestore.get_proprieta_per_agente(101) == []
+    assert len(gestore.get_agenti_per_agenzia(1)) == 1
+
+    gestore.close()